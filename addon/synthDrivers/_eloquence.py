@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import heapq
 import itertools
 import logging
 import os
@@ -11,8 +12,12 @@ import queue
 import shlex
 import subprocess
 import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import CancelledError, Future, InvalidStateError
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from dataclasses import dataclass
-from typing import Any, Dict, Optional, Sequence, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
 
 from . import _eloquence_ipc as _ipc
 
@@ -23,8 +28,40 @@ from buildVersion import version_year
 LOGGER = logging.getLogger(__name__)
 
 HOST_EXECUTABLE = "eloquence_host32.exe"
+# PyInstaller --onedir build: skips unpacking the bundle to %TEMP% on every launch.
+HOST_ONEDIR_EXECUTABLE = os.path.join("eloquence_host32", HOST_EXECUTABLE)
 HOST_SCRIPT = "host_eloquence32.py"
-AUTH_KEY_BYTES = 16
+# Seconds to wait for a command's response unless COMMAND_TIMEOUTS says otherwise;
+# None waits without a deadline.
+DEFAULT_COMMAND_TIMEOUT = 5.0
+COMMAND_TIMEOUTS = {
+	# The host answers synthesize once the whole utterance has been rendered,
+	# which under flow control is paced by playback, so no length of speech is
+	# too long.  A hung helper is caught by the watchdog, which cancels the wait.
+	"synthesize": None,
+	"initialize": 15.0,
+	"newDict": 15.0,
+	"reloadDictionaries": 15.0,
+	"updateDict": 15.0,
+	"generatePhonemes": 15.0,
+}
+# Sent over the host's control connection, which it serves on a separate thread.
+CONTROL_COMMANDS = frozenset({"stop", "pause", "ping", "grantCredit"})
+# Audio the host may render ahead of playback (config key eloquence.audio_window_bytes):
+# five seconds of 11025 Hz 16-bit mono.  0 turns flow control off.
+DEFAULT_AUDIO_WINDOW_BYTES = 11025 * 2 * 5
+# Coalescing window in milliseconds (config key eloquence.coalesce_ms).  While
+# cancels arrive closer together than this, an utterance waits up to this long
+# before it is sent, so one superseded by the next cancel never reaches the
+# helper.  0, the default, sends every utterance at once.
+DEFAULT_COALESCE_MS = 0
+# Longest the helper may hang before it is killed and relaunched, in
+# milliseconds (config key eloquence.hang_budget_ms).  0 turns the watchdog off.
+DEFAULT_HANG_BUDGET_MS = 500
+# Heartbeats per hang budget while the helper is busy, and the heartbeat
+# interval in seconds while it is idle (only a crash needs noticing then).
+HEARTBEATS_PER_BUDGET = 5
+IDLE_HEARTBEAT = 2.0
 
 
 # Audio handling -----------------------------------------------------------------
@@ -32,6 +69,7 @@ class AudioWorker(threading.Thread):
 	_CHANNELS = 1
 	_BITS_PER_SAMPLE = 16
 	_SAMPLE_RATE = 11025
+	_SAMPLE_BYTES = 2
 
 	def __init__(
 		self,
@@ -46,6 +84,15 @@ class AudioWorker(threading.Thread):
 		self._running = True
 		self._stopping = False
 		self._player_lock = threading.RLock()
+		# Index marks wait here until playback reaches their sample position:
+		# a heap of (position, order, index).  Positions count samples fed to
+		# the player; _played is how far it has reported playing.
+		self._marks: List[Tuple[int, int, int]] = []
+		self._mark_order = itertools.count()
+		self._marks_lock = threading.Lock()
+		self._marks_seq = 0
+		self._fed = 0
+		self._played = 0
 
 	def run(self) -> None:
 		while self._running:
@@ -55,43 +102,46 @@ class AudioWorker(threading.Thread):
 				continue
 			if chunk is None:
 				break
-			data, index, is_final, seq = chunk
-			if seq < self._client._sequence:
+			data, marks, is_final, seq, generation = chunk
+			if data:
+				# Hand the bytes back to the host's window whether they are played or dropped.
+				self._client.audio_consumed(len(data), generation)
+			# Early exit if stopping - avoids unnecessary lock acquisition
+			if seq < self._client._sequence or self._stopping:
 				self._queue.task_done()
 				continue
+			if seq != self._marks_seq:
+				self._restart_positions(seq)
+			start = self._fed
+			samples = len(data) // self._SAMPLE_BYTES
+			if marks:
+				with self._marks_lock:
+					for offset, index in marks:
+						heapq.heappush(self._marks, (start + offset, next(self._mark_order), index))
+				# Marks at the very start may already have been played.
+				self._fire_due_marks()
 
-			# --- New logic (EARCONS patch) ---
 			if not data:
-				if not self._stopping:
-					if index is not None:
-						self._invoke_index_callback(index)
-					if is_final:
-						self._schedule_idle()
-				self._queue.task_done()
-				continue
-			# ------------------------------------
-
-			on_done = None
-			if index is not None:
-
-				def _callback(i=index):
-					self._invoke_index_callback(i)
-
-				on_done = _callback
-
-			wrapped_on_done = self._make_on_done(on_done, is_final)
-
-			# Early exit if stopping - avoids unnecessary lock acquisition
-			if self._stopping:
+				if is_final:
+					self._schedule_idle()
 				self._queue.task_done()
 				continue
 
-			# Feed directly - blocks if buffer is full
+			# Split the chunk at its marks so the player reports reaching each one.
+			bounds = sorted({0, samples} | {offset for offset, _ in marks if 0 < offset < samples})
 			try:
 				with self._player_lock:
-					if not self._stopping:
-						if self._player:
-							self._player.feed(data, onDone=wrapped_on_done)
+					for begin, end in zip(bounds, bounds[1:]):
+						if self._stopping or not self._player:
+							break
+						self._fed = start + end
+						on_done = self._make_on_done(
+							self._played_callback(start + end), is_final and end == samples
+						)
+						# Feed directly - blocks if buffer is full
+						self._player.feed(
+							data[begin * self._SAMPLE_BYTES : end * self._SAMPLE_BYTES], onDone=on_done
+						)
 			except FileNotFoundError:
 				LOGGER.warning("Sound device not found during feed")
 			except Exception:
@@ -103,6 +153,32 @@ class AudioWorker(threading.Thread):
 		self._running = False
 		self._queue.put(None)
 
+	def _restart_positions(self, seq: int) -> None:
+		"""Forget marks of a stopped utterance; the player dropped whatever it still held."""
+		with self._marks_lock:
+			self._marks.clear()
+			self._marks_seq = seq
+			self._played = self._fed
+
+	def _played_callback(self, position: int):
+		def _on_played() -> None:
+			with self._marks_lock:
+				self._played = max(self._played, position)
+			self._fire_due_marks()
+
+		return _on_played
+
+	def _fire_due_marks(self) -> None:
+		with self._marks_lock:
+			due = []
+			while self._marks and self._marks[0][0] <= self._played:
+				due.append(heapq.heappop(self._marks)[2])
+			seq = self._marks_seq
+		for index in due:
+			if self._stopping or seq < self._client._sequence:
+				return
+			self._invoke_index_callback(index)
+
 	def _make_on_done(self, callback, is_final: bool):
 		def _on_done() -> None:
 			try:
@@ -123,6 +199,8 @@ class AudioWorker(threading.Thread):
 					self._player.idle()
 		except Exception:
 			LOGGER.exception("WavePlayer idle failed")
+		# Everything fed has played by now, so no mark may be left behind.
+		self._played_callback(self._fed)()
 		if not self._stopping:
 			self._invoke_index_callback(None)
 
@@ -137,86 +215,448 @@ class AudioWorker(threading.Thread):
 				LOGGER.exception("Index callback failed")
 
 
-AudioChunk = Tuple[bytes, Optional[int], bool, int]
+# (data, index marks as (sample offset into data, index), final, utterance
+# sequence, flow-control generation)
+AudioChunk = Tuple[bytes, Sequence[Tuple[int, int]], bool, int, int]
+
+
+# Synthesis scheduling -------------------------------------------------------------
+# Priority classes for queued utterances, reported separately in synth_metrics().
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BULK = 2
+PRIORITY_NAMES = {
+	PRIORITY_INTERACTIVE: "interactive",
+	PRIORITY_NORMAL: "normal",
+	PRIORITY_BULK: "bulk",
+}
+# Scheduling rank of each class; lower runs first, equal ranks in arrival order.
+# Interactive feedback overtakes other queued speech, and both overtake bulk
+# speech (say-all and streamed text).
+PRIORITY_RANKS = {
+	PRIORITY_INTERACTIVE: 0,
+	PRIORITY_NORMAL: 1,
+	PRIORITY_BULK: 2,
+}
+# Index the driver appends to every utterance; the host reports it as final.
+FINAL_INDEX = 0xFFFF
+# Latency samples kept per priority class for synth_metrics().
+LATENCY_HISTORY = 256
+
+
+@dataclass
+class ScheduledSpeech:
+	item: Any
+	priority: int
+	queued: float
+	# NVDA indexes (other than the final one) the utterance has still to send.
+	indexes: int = 0
+	started: Optional[float] = None
+	first_audio: Optional[float] = None
+
+
+class SynthScheduler:
+	"""Queue for the synth worker that orders utterances by priority rank, then arrival.
+
+	Keeps the ``put``/``get``/``task_done``/``join`` shape of :class:`queue.Queue`
+	so the worker loop reads the same, but :meth:`get` returns the
+	:class:`ScheduledSpeech` wrapping the item.  A running utterance can hand
+	the worker to waiting higher-priority speech through :meth:`preempting`;
+	streamed text does so between segments.
+	"""
+
+	def __init__(self) -> None:
+		self._heap: List[Tuple[int, int, ScheduledSpeech]] = []
+		self._order = itertools.count()
+		self._cond = threading.Condition()
+		self._unfinished = 0
+		# Utterances being run by the worker, innermost (preempting) last.
+		self._active: List[ScheduledSpeech] = []
+		self._stats = {
+			priority: {
+				"waitMs": deque(maxlen=LATENCY_HISTORY),
+				"firstAudioMs": deque(maxlen=LATENCY_HISTORY),
+				"count": 0,
+				"preempted": 0,
+				"held": 0,
+				"discarded": 0,
+				"cutShort": 0,
+				"preprocessSkipped": 0,
+			}
+			for priority in PRIORITY_NAMES
+		}
+
+	def put(self, item: Any, priority: int = PRIORITY_NORMAL, indexes: int = 0) -> None:
+		entry = ScheduledSpeech(item, priority, time.perf_counter(), indexes)
+		with self._cond:
+			heapq.heappush(self._heap, (PRIORITY_RANKS[priority], next(self._order), entry))
+			self._unfinished += 1
+			self._cond.notify_all()
+
+	def get(self, timeout: Optional[float] = None) -> ScheduledSpeech:
+		with self._cond:
+			if not self._cond.wait_for(lambda: self._heap, timeout):
+				raise queue.Empty
+			return heapq.heappop(self._heap)[2]
+
+	def preempting(self) -> Optional[ScheduledSpeech]:
+		"""Pop the next entry that outranks the running utterance, if one is waiting.
+
+		An entry carrying NVDA indexes waits while a running utterance still has
+		indexes to send: its own would reach NVDA before them, out of order.
+		"""
+		with self._cond:
+			if not self._active or not self._heap:
+				return None
+			if self._heap[0][0] >= PRIORITY_RANKS[self._active[-1].priority]:
+				return None
+			if self._heap[0][2].indexes and any(entry.indexes for entry in self._active):
+				return None
+			self._stats[self._active[-1].priority]["preempted"] += 1
+			return heapq.heappop(self._heap)[2]
+
+	def task_done(self) -> None:
+		with self._cond:
+			self._unfinished -= 1
+			self._cond.notify_all()
+
+	def join(self) -> None:
+		with self._cond:
+			self._cond.wait_for(lambda: self._unfinished <= 0)
+
+	def hold(self, entry: ScheduledSpeech, deadline: float, superseded) -> None:
+		"""Keep *entry* back until *deadline*, newer speech arrives or *superseded* returns true."""
+		with self._cond:
+			self._stats[entry.priority]["held"] += 1
+			self._cond.wait_for(
+				lambda: superseded() or any(other.queued > entry.queued for _p, _o, other in self._heap),
+				max(0.0, deadline - time.perf_counter()),
+			)
+
+	def wake(self) -> None:
+		"""Re-check held utterances; called when speech is cancelled."""
+		with self._cond:
+			self._cond.notify_all()
+
+	def discarded(self, entry: ScheduledSpeech, cut_short: bool, preprocess_skipped: int) -> None:
+		"""Count an utterance dropped after a cancel, before (or while) it was sent."""
+		with self._cond:
+			stats = self._stats[entry.priority]
+			stats["cutShort" if cut_short else "discarded"] += 1
+			stats["preprocessSkipped"] += preprocess_skipped
+
+	def started(self, entry: ScheduledSpeech) -> None:
+		entry.started = time.perf_counter()
+		with self._cond:
+			self._active.append(entry)
+			stats = self._stats[entry.priority]
+			stats["count"] += 1
+			stats["waitMs"].append((entry.started - entry.queued) * 1000.0)
+
+	def finished(self, entry: ScheduledSpeech) -> None:
+		with self._cond:
+			if entry in self._active:
+				self._active.remove(entry)
+
+	def audio_received(self) -> None:
+		"""Note the first audio of the running utterance for its latency figures."""
+		with self._cond:
+			entry = self._active[-1] if self._active else None
+			if entry is None or entry.first_audio is not None:
+				return
+			entry.first_audio = time.perf_counter()
+			self._stats[entry.priority]["firstAudioMs"].append((entry.first_audio - entry.queued) * 1000.0)
+
+	def metrics(self) -> Dict[str, Any]:
+		"""Per-class counts and latencies in milliseconds from queueing."""
+		with self._cond:
+			waiting = {name: 0 for name in PRIORITY_NAMES.values()}
+			for _rank, _order, entry in self._heap:
+				waiting[PRIORITY_NAMES[entry.priority]] += 1
+			return {
+				name: {
+					"count": stats["count"],
+					"waiting": waiting[name],
+					"preempted": stats["preempted"],
+					"held": stats["held"],
+					"discarded": stats["discarded"],
+					"cutShort": stats["cutShort"],
+					"preprocessSkipped": stats["preprocessSkipped"],
+					"waitMs": _latency_summary(stats["waitMs"]),
+					"firstAudioMs": _latency_summary(stats["firstAudioMs"]),
+				}
+				for priority, name in PRIORITY_NAMES.items()
+				for stats in (self._stats[priority],)
+			}
+
+
+def _latency_summary(samples: Iterable[float]) -> Dict[str, Optional[float]]:
+	ordered = sorted(samples)
+	if not ordered:
+		return {"mean": None, "p95": None, "max": None}
+	return {
+		"mean": round(sum(ordered) / len(ordered), 1),
+		"p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+		"max": round(ordered[-1], 1),
+	}
+
+
+# Hang watchdog --------------------------------------------------------------------
+class HostWatchdog(threading.Thread):
+	"""Heartbeat to the helper that replaces it once it hangs or dies.
+
+	The helper reports how long its current ECI call has gone without
+	progress against the deadline it was given at initialization; a
+	heartbeat that goes unanswered for the whole budget counts as a hang too.
+	"""
+
+	def __init__(self, client: "EloquenceHostClient", budget: float, restart: Callable[[str], None]):
+		super().__init__(name="EloquenceWatchdog", daemon=True)
+		self._client = client
+		self._budget = budget
+		self._restart = restart
+		self._stop_event = threading.Event()
+		self._last_beat = 0.0
+		self._restarts = 0
+		self._last_reason: Optional[str] = None
+		self._last_restart_ms: Optional[float] = None
+
+	@property
+	def interval(self) -> float:
+		return self._budget / HEARTBEATS_PER_BUDGET
+
+	def run(self) -> None:
+		while not self._stop_event.wait(self.interval):
+			reason = self._check()
+			if reason is None:
+				continue
+			started = time.perf_counter()
+			self._restarts += 1
+			self._last_reason = reason
+			try:
+				self._restart(reason)
+			except Exception:
+				LOGGER.exception("Failed to restart the Eloquence host")
+			self._last_restart_ms = round((time.perf_counter() - started) * 1000.0, 1)
+
+	def stop(self) -> None:
+		self._stop_event.set()
+		if self is not threading.current_thread():
+			self.join(timeout=self._budget + 1)
+
+	def metrics(self) -> Dict[str, Any]:
+		return {
+			"budgetMs": round(self._budget * 1000.0),
+			"restarts": self._restarts,
+			"lastReason": self._last_reason,
+			"lastRestartMs": self._last_restart_ms,
+		}
+
+	def _check(self) -> Optional[str]:
+		"""Return why the helper needs replacing, or None if it is healthy."""
+		host = self._client._host
+		if host is None:
+			return None
+		if host.process.poll() is not None:
+			return f"exited with code {host.process.returncode}"
+		now = time.perf_counter()
+		if not self._client.busy and now - self._last_beat < IDLE_HEARTBEAT:
+			return None
+		self._last_beat = now
+		try:
+			status = self._client.ping(timeout=self._budget)
+		except RuntimeError:
+			if self._client._host is not host or self._stop_event.is_set():
+				return None  # replaced or shut down meanwhile
+			return "missed its heartbeat"
+		eci = status.get("eci") or {}
+		if eci.get("hung"):
+			return f"stalled in {eci.get('call')} for {eci.get('stalledMs')} ms"
+		return None
 
 
 # RPC client ---------------------------------------------------------------------
+class CommandCancelled(RuntimeError):
+	"""Raised to the caller of a command whose response is no longer wanted."""
+
+
 @dataclass
 class HostProcess:
 	process: subprocess.Popen
 	connection: Any
-	listener: socket.socket
+	transport: str
+	control: Any = None
 
 
 class EloquenceHostClient:
 	def __init__(self) -> None:
 		self._host: Optional[HostProcess] = None
-		self._pending: Dict[int, threading.Event] = {}
-		self._responses: Dict[int, Dict[str, Any]] = {}
+		# Outstanding requests by message id: (command, future resolved with the response).
+		self._pending: Dict[int, Tuple[str, Future]] = {}
+		self._pending_lock = threading.Lock()
 		self._receiver: Optional[threading.Thread] = None
+		self._control_receiver: Optional[threading.Thread] = None
 		self._id_counter = itertools.count(1)
 		self._audio_queue: "queue.Queue[Optional[AudioChunk]]" = queue.Queue()
 		self._player: Optional[nvwave.WavePlayer] = None
 		self._audio_worker: Optional[AudioWorker] = None
 		self._running = threading.Event()
-		self._command_lock = threading.Lock()
 		self._stop_lock = threading.RLock()
 		self._sequence = 0
 		self._current_seq = 0
+		# Text sent since the last synthesize completed, for blaming a helper failure.
+		self._inflight: List[bytes] = []
+		# perf_counter() of the last two stops, oldest first.
+		self._stop_times: "deque[float]" = deque([0.0, 0.0], maxlen=2)
 		self._speaking = False
+		self._audio_window = 0
+		self._queued_audio_bytes = 0
+		self._grant_pending = 0
+		self._grant_generation = 0
+		self._flow_lock = threading.Lock()
+		self._startup_base = 0.0
+		self._startup_marks: Dict[str, float] = {}
+		self._host_startup: Dict[str, Any] = {}
+		self._startup_reported = False
+
+	# ------------------------------------------------------------------
+	def mark_startup(self, name: str) -> None:
+		"""Record milliseconds from helper spawn to *name*; reports once audio arrives."""
+		if not self._startup_base or name in self._startup_marks:
+			return
+		self._startup_marks[name] = round((time.perf_counter() - self._startup_base) * 1000.0, 1)
+		if name == "firstAudio" and not self._startup_reported:
+			self._startup_reported = True
+			LOGGER.info("Eloquence start-up: %s", self.startup_report())
+
+	def set_host_startup(self, report: Dict[str, Any]) -> None:
+		self._host_startup = dict(report or {})
+
+	def startup_report(self) -> Dict[str, Any]:
+		return {
+			"transport": self._host.transport if self._host else None,
+			"client": dict(self._startup_marks),
+			"host": dict(self._host_startup),
+		}
 
 	# ------------------------------------------------------------------
 	def ensure_started(self) -> None:
 		if self._host:
 			return
 		addon_dir = os.path.abspath(os.path.dirname(__file__))
-		authkey = os.urandom(AUTH_KEY_BYTES)
-		listener = _ipc.create_listener()
-		port = listener.getsockname()[1]
 		cmd = list(self._resolve_host_executable(addon_dir))
-		cmd.extend(
-			[
-				"--address",
-				f"127.0.0.1:{port}",
-				"--authkey",
-				authkey.hex(),
-				"--log-dir",
-				addon_dir,
-			]
-		)
-		LOGGER.info("Launching Eloquence host: %s", cmd)
-		proc = subprocess.Popen(cmd, cwd=addon_dir)
+		cmd.extend(["--log-dir", addon_dir])
+		names = _ipc.transport_candidates(_transport_preference())
+		for attempt, name in enumerate(names):
+			try:
+				self._launch(cmd, addon_dir, name)
+				return
+			except RuntimeError as exc:
+				if attempt == len(names) - 1:
+					raise
+				LOGGER.warning("Eloquence %s transport failed (%s), trying %s", name, exc, names[attempt + 1])
+
+	def _launch(self, cmd: List[str], addon_dir: str, transport_name: str) -> None:
+		transport = _ipc.create_transport(transport_name)
+		try:
+			args, popen_kwargs = transport.prepare()
+		except OSError as exc:
+			transport.close()
+			raise RuntimeError(f"{transport_name} transport unavailable: {exc}") from exc
+		cmd = cmd + args
+		LOGGER.info("Launching Eloquence host over %s: %s", transport_name, cmd)
+		self._startup_base = time.perf_counter()
+		self._startup_marks.clear()
+		self._startup_reported = False
+		proc = subprocess.Popen(cmd, cwd=addon_dir, **popen_kwargs)
+		self.mark_startup("spawned")
 		try:
-			conn = _ipc.accept_authenticated(listener, authkey)
+			conn, control = transport.connect(proc)
 		except (TimeoutError, OSError) as exc:
 			LOGGER.error("Eloquence host failed to connect: %s", exc)
-			exit_code = proc.poll()
-			if exit_code is not None:
-				LOGGER.error("Host process already exited with code %s", exit_code)
+			self._kill_host_process(proc)
+			raise RuntimeError(f"Eloquence host process failed to start: {exc}") from exc
+		finally:
+			transport.close()
+		self._host = HostProcess(process=proc, connection=conn, transport=transport_name, control=control)
+		self._receiver = threading.Thread(target=self._receiver_loop, daemon=True)
+		self._receiver.start()
+		self._control_receiver = threading.Thread(target=self._control_receiver_loop, daemon=True)
+		self._control_receiver.start()
+		# A socketpair is connected before the helper runs, so confirm it is actually serving.
+		try:
+			self.ping(timeout=_ipc.RECV_TIMEOUT)
+		except RuntimeError as exc:
+			LOGGER.error("Eloquence host did not answer over %s: %s", transport_name, exc)
+			self._abandon_host()
+			raise RuntimeError(f"Eloquence host process failed to start: {exc}") from exc
+		self.mark_startup("connected")
+
+	def _kill_host_process(self, proc: subprocess.Popen) -> None:
+		exit_code = proc.poll()
+		if exit_code is not None:
+			LOGGER.error("Host process already exited with code %s", exit_code)
+		try:
+			proc.terminate()
+			proc.wait(timeout=2)
+		except Exception:
 			try:
-				proc.terminate()
-				proc.wait(timeout=2)
+				proc.kill()
 			except Exception:
-				try:
-					proc.kill()
-				except Exception:
-					pass
+				pass
+
+	def record_input(self, data: bytes) -> None:
+		self._inflight.append(data)
+
+	def input_rendered(self) -> None:
+		self._inflight = []
+
+	def take_inflight(self) -> List[bytes]:
+		"""Return and forget the text the helper was given but has not finished rendering."""
+		inflight, self._inflight = self._inflight, []
+		return inflight
+
+	@property
+	def busy(self) -> bool:
+		"""Whether any request is waiting for the helper."""
+		with self._pending_lock:
+			return bool(self._pending)
+
+	def discard_host(self) -> None:
+		"""Give up on a hung or crashed helper: stop speech, cancel requests, kill the process."""
+		self.stop()
+		with self._pending_lock:
+			futures = [future for _command, future in self._pending.values()]
+		for future in futures:
+			future.cancel()
+		self._abandon_host()
+		# The interrupted utterance will never finish; end it so NVDA does not wait for it.
+		self._audio_queue.put((b"", (), True, self._sequence, self._sequence))
+
+	def _abandon_host(self) -> None:
+		"""Tear down a helper that never became usable."""
+		host, self._host = self._host, None
+		if host is None:
+			return
+		for connection in (host.connection, host.control):
 			try:
-				listener.close()
+				connection.close()
 			except Exception:
 				pass
-			raise RuntimeError(f"Eloquence host process failed to start: {exc}") from exc
-		self._host = HostProcess(process=proc, connection=conn, listener=listener)
-		self._receiver = threading.Thread(target=self._receiver_loop, daemon=True)
-		self._receiver.start()
+		self._kill_host_process(host.process)
+		for thread in (self._receiver, self._control_receiver):
+			if thread:
+				thread.join(timeout=2)
+		self._receiver = self._control_receiver = None
 
 	def _resolve_host_executable(self, addon_dir: str) -> Sequence[str]:
 		override = os.environ.get("ELOQUENCE_HOST_COMMAND")
 		if override:
 			return shlex.split(override)
-		exe_path = os.path.join(addon_dir, HOST_EXECUTABLE)
-		if os.path.exists(exe_path):
-			return [exe_path]
+		for name in (HOST_ONEDIR_EXECUTABLE, HOST_EXECUTABLE):
+			exe_path = os.path.join(addon_dir, name)
+			if os.path.exists(exe_path):
+				return [exe_path]
 		script_path = os.path.join(addon_dir, HOST_SCRIPT)
 		if os.path.exists(script_path):
 			raise RuntimeError(
@@ -265,50 +705,70 @@ class EloquenceHostClient:
 			except socket.timeout:
 				if self._host and self._host.process.poll() is not None:
 					LOGGER.error("Host process exited (code %s)", self._host.process.returncode)
-					for msg_id, event in list(self._pending.items()):
-						self._responses[msg_id] = {"error": "hostExited"}
-						event.set()
-					self._pending.clear()
+					self._fail_pending("hostExited")
 					break
 				continue  # Host still alive, just busy
 			except (EOFError, ConnectionAbortedError, OSError):
 				LOGGER.info("Host connection closed")
-				for msg_id, event in list(self._pending.items()):
-					self._responses[msg_id] = {"error": "connectionClosed"}
-					event.set()
-				self._pending.clear()
+				self._fail_pending("connectionClosed")
 				break
 			except Exception:
 				LOGGER.exception("Unexpected error in receiver loop")
-				for msg_id, event in list(self._pending.items()):
-					self._responses[msg_id] = {"error": "receiverException"}
-					event.set()
-				self._pending.clear()
+				self._fail_pending("receiverException")
 				break
 			msg_type = message.get("type")
 			if msg_type == "response":
-				msg_id = message["id"]
-				# MEMORY LEAK PATCH: Only save if an event is waiting
-				event = self._pending.pop(msg_id, None)
-				if event:
-					self._responses[msg_id] = message
-					event.set()
+				# Responses nobody waits for (fire-and-forget or cancelled) are dropped.
+				with self._pending_lock:
+					entry = self._pending.pop(message["id"], None)
+				if entry:
+					self._resolve(entry[1], message)
 			elif msg_type == "event":
 				self._handle_event(message["event"], message.get("payload", {}))
 			else:
 				LOGGER.warning("Unknown message type %s", msg_type)
 
+	def _control_receiver_loop(self) -> None:
+		connection = self._host.control if self._host else None
+		if connection is None:
+			return
+		while True:
+			try:
+				message = connection.recv()
+			except socket.timeout:
+				continue
+			except Exception:
+				# The main receiver notices a dead host and fails pending requests.
+				LOGGER.debug("Control connection closed")
+				break
+			if message.get("type") == "response":
+				with self._pending_lock:
+					entry = self._pending.pop(message["id"], None)
+				if entry:
+					self._resolve(entry[1], message)
+
 	def _handle_event(self, event: str, payload: Dict[str, Any]) -> None:
 		if event == "audio":
 			data = payload.get("data", b"")
-			index = payload.get("index")
+			marks = payload.get("marks") or ()
 			is_final = bool(payload.get("final", False))
-			seq = self._current_seq
-			self._audio_queue.put((data, index, is_final, seq))
+			# The generation the helper rendered this under; anything older was stopped.
+			generation = payload.get("generation", self._current_seq)
+			if "startup" in payload:
+				self.set_host_startup(payload["startup"])
+			if generation < self._sequence:
+				return
+			if data and not self._startup_reported:
+				self.mark_startup("firstAudio")
+			if data:
+				synth_queue.audio_received()
+				with self._flow_lock:
+					self._queued_audio_bytes += len(data)
+			self._audio_queue.put((data, marks, is_final, generation, generation))
 		elif event == "stopped":
 			# Don't call player.stop() from this thread to avoid race conditions
 			# The stop() method will handle player cleanup properly
-			LOGGER.debug("Host reported stopped event")
+			LOGGER.debug("Host reported stopped event for generation %s", payload.get("generation"))
 			self._speaking = False
 		else:
 			LOGGER.debug("Unhandled host event %s", event)
@@ -318,59 +778,154 @@ class EloquenceHostClient:
 		if not self._host:
 			return
 		self._sequence += 1
+		self._stop_times.append(time.perf_counter())
+		self._inflight = []
+		synth_queue.wake()
 		# Stop local audio player immediately
 		if self._player:
 			try:
 				self._player.stop()
 			except Exception:
 				LOGGER.exception("WavePlayer stop failed")
-		# Tell the host to stop without blocking
+		# Release the synth worker; the host's answer to synthesize is no longer of interest.
+		self.cancel_commands(("synthesize",))
+		# Tell the host to stop without blocking; it refills the audio window for the new generation.
 		try:
-			self.send_command("stop", wait=False)
+			self.send_command("stop", wait=False, generation=self._sequence)
 		except Exception:
 			pass
 
 	# ------------------------------------------------------------------
-	def send_command(self, command: str, wait: bool = True, **payload: Any) -> Dict[str, Any]:
+	def request(self, command: str, **payload: Any) -> Future:
+		"""Send *command* and return a future resolved with the host's response message.
+
+		Any number of requests may be outstanding; the receiver thread matches
+		responses to futures by message id.  Cancelling the future abandons the
+		response.
+		"""
 		if not self._host:
 			raise RuntimeError("Host not started")
-		with self._command_lock:
-			msg_id = next(self._id_counter)
-			event = threading.Event() if wait else None
-			if wait:
-				self._pending[msg_id] = event
+		msg_id = next(self._id_counter)
+		future: Future = Future()
+		with self._pending_lock:
+			self._pending[msg_id] = (command, future)
+		future.add_done_callback(lambda _f: self._forget(msg_id))
+		try:
+			self._send(msg_id, command, payload)
+		except (ConnectionResetError, BrokenPipeError, OSError):
+			# Patch for termination errors
+			self._resolve(future, {"payload": {}})
+		except Exception as exc:
+			future.set_exception(exc)
+		return future
+
+	def send_command(
+		self, command: str, wait: bool = True, timeout: Optional[float] = None, **payload: Any
+	) -> Dict[str, Any]:
+		if not self._host:
+			raise RuntimeError("Host not started")
+		# If we are not going to wait for the response (e.g. stop command), return blank immediately
+		if not wait:
 			try:
-				self._host.connection.send(
-					{
-						"type": "command",
-						"id": msg_id,
-						"command": command,
-						"payload": payload,
-					}
-				)
+				self._send(next(self._id_counter), command, payload)
 			except (ConnectionResetError, BrokenPipeError, OSError):
-				# Patch for termination errors
-				if wait:
-					self._pending.pop(msg_id, None)
-				return {}
-			except Exception:
-				if wait:
-					self._pending.pop(msg_id, None)
-				raise
-
-			# If we are not going to wait for the response (e.g. stop command), return blank immediately
-			if not wait:
-				return {}
-
-			# Wait for response with timeout to avoid infinite blocking
-			if not event.wait(timeout=5.0):
-				self._pending.pop(msg_id, None)
-				LOGGER.error("Command %s timed out after 5 seconds", command)
-				raise RuntimeError(f"Command {command} timed out")
-			response = self._responses.pop(msg_id, {"error": "no response received"})
-			if "error" in response:
-				raise RuntimeError(response["error"])
-			return response.get("payload", {})
+				pass
+			return {}
+		return self.result(self.request(command, **payload), command, timeout)
+
+	def result(self, future: Future, command: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+		"""Wait for *future* until the command's deadline and return the response payload."""
+		if timeout is None:
+			timeout = COMMAND_TIMEOUTS.get(command, DEFAULT_COMMAND_TIMEOUT)
+		try:
+			response = future.result(timeout=timeout)
+		except FutureTimeoutError:
+			future.cancel()
+			LOGGER.error("Command %s timed out after %s seconds", command, timeout)
+			raise RuntimeError(f"Command {command} timed out") from None
+		except CancelledError:
+			raise CommandCancelled(command) from None
+		if "error" in response:
+			raise RuntimeError(response["error"])
+		return response.get("payload", {})
+
+	def set_audio_window(self, window: int) -> None:
+		with self._flow_lock:
+			self._audio_window = max(0, window)
+			self._grant_pending = 0
+
+	def audio_consumed(self, size: int, generation: int) -> None:
+		"""Return *size* bytes of credit to the host once the audio worker has taken them."""
+		with self._flow_lock:
+			self._queued_audio_bytes -= size
+			# Audio from before the last stop was already written off by the host.
+			if not self._audio_window or generation != self._sequence:
+				return
+			if generation != self._grant_generation:
+				self._grant_generation = generation
+				self._grant_pending = 0
+			self._grant_pending += size
+			# Batch grants, but never sit on credit once the queue has run dry.
+			if self._grant_pending < self._audio_window // 4 and not self._audio_queue.empty():
+				return
+			size, self._grant_pending = self._grant_pending, 0
+		self.send_command("grantCredit", wait=False, size=size, generation=generation)
+
+	def audio_metrics(self) -> Dict[str, Any]:
+		"""Gauges for the audio pipeline: the local queue and the host's window."""
+		with self._flow_lock:
+			metrics: Dict[str, Any] = {
+				"window": self._audio_window,
+				"queuedBytes": self._queued_audio_bytes,
+				"pendingGrant": self._grant_pending,
+			}
+		try:
+			metrics["host"] = self.ping().get("flow", {})
+		except Exception:
+			metrics["host"] = {}
+		return metrics
+
+	def ping(self, timeout: float = 1.0) -> Dict[str, Any]:
+		"""Round-trip over the control connection; answered even while the host is synthesizing."""
+		return self.send_command("ping", timeout=timeout)
+
+	def cancel_commands(self, commands: Iterable[str]) -> int:
+		"""Cancel outstanding requests for any of *commands*; returns how many were cancelled."""
+		commands = set(commands)
+		with self._pending_lock:
+			futures = [future for command, future in self._pending.values() if command in commands]
+		return sum(1 for future in futures if future.cancel())
+
+	def _send(self, msg_id: int, command: str, payload: Dict[str, Any]) -> None:
+		connection = self._host.connection
+		if command in CONTROL_COMMANDS and self._host.control is not None:
+			connection = self._host.control
+		connection.send(
+			{
+				"type": "command",
+				"id": msg_id,
+				"command": command,
+				"payload": payload,
+			}
+		)
+
+	def _forget(self, msg_id: int) -> None:
+		with self._pending_lock:
+			self._pending.pop(msg_id, None)
+
+	@staticmethod
+	def _resolve(future: Future, message: Dict[str, Any]) -> None:
+		try:
+			future.set_result(message)
+		except InvalidStateError:
+			pass  # Cancelled while the response was in flight
+
+	def _fail_pending(self, reason: str) -> None:
+		with self._pending_lock:
+			entries = list(self._pending.values())
+			self._pending.clear()
+		for _command, future in entries:
+			self._resolve(future, {"error": reason})
 
 	# ------------------------------------------------------------------
 	def shutdown(self) -> None:
@@ -394,14 +949,15 @@ class EloquenceHostClient:
 			self._receiver.join(timeout=2)
 			self._receiver = None
 		# Now close connections and terminate process
-		try:
-			self._host.connection.close()
-		except Exception:
-			pass
-		try:
-			self._host.listener.close()
-		except Exception:
-			pass
+		for connection in (self._host.connection, self._host.control):
+			try:
+				if connection is not None:
+					connection.close()
+			except Exception:
+				pass
+		if self._control_receiver:
+			self._control_receiver.join(timeout=2)
+			self._control_receiver = None
 		try:
 			self._host.process.terminate()
 			self._host.process.wait(timeout=2)
@@ -415,7 +971,7 @@ class EloquenceHostClient:
 
 
 _client = EloquenceHostClient()
-synth_queue = queue.Queue()
+synth_queue = SynthScheduler()
 params: Dict[int, int] = {}
 voice_params: Dict[int, int] = {}
 lastindex: Optional[int] = None
@@ -423,6 +979,7 @@ onIndexReached = None
 _synth_worker: Optional[threading.Thread] = None
 _synth_worker_lock = threading.Lock()
 _synth_worker_stop = threading.Event()
+_watchdog: Optional[HostWatchdog] = None
 
 
 # Public API ---------------------------------------------------------------------
@@ -473,51 +1030,439 @@ VOICE_ID_TO_LANG = {voice_id: lang_code for lang_code, (voice_id, _) in langs.it
 # Current language code (updated when voice is set)
 _current_lang = "enu"
 
+# Phoneme strings returned by the host, keyed by (language code, word).
+PHONEME_CACHE_SIZE = 4096
+_phoneme_cache: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+_phoneme_cache_lock = threading.Lock()
+
+# IPA to American English SPR symbols (see "American English SPRs" in tts.txt).
+# Multi-character IPA sequences must be listed before their prefixes.
+IPA_TO_SPR = {
+	"t\u0283": "C",
+	"d\u0292": "J",
+	"e\u026a": "e",
+	"a\u026a": "Y",
+	"\u0254\u026a": "O",
+	"a\u028a": "W",
+	"o\u028a": "o",
+	"\u0259\u028a": "o",
+	"\u025d": "R",
+	"\u025a": "R",
+	"\u0259r": "R",
+	"\u025cr": "R",
+	"\u025c": "R",
+	"\u0251": "a",
+	"\u0252": "a",
+	"\u00e6": "A",
+	"e": "e",
+	"\u025b": "E",
+	"i": "i",
+	"\u026a": "I",
+	"o": "o",
+	"\u0254": "c",
+	"u": "u",
+	"\u028a": "U",
+	"\u028c": "H",
+	"\u0259": "x",
+	"\u0268": "X",
+	"b": "b",
+	"p": "p",
+	"d": "d",
+	"t": "t",
+	"\u0261": "g",
+	"g": "g",
+	"k": "k",
+	"\u00f0": "D",
+	"\u03b8": "T",
+	"v": "v",
+	"f": "f",
+	"z": "z",
+	"s": "s",
+	"\u0292": "Z",
+	"\u0283": "S",
+	"h": "h",
+	"m": "m",
+	"n": "n",
+	"\u014b": "G",
+	"r": "r",
+	"\u0279": "r",
+	"l": "l",
+	"w": "w",
+	"j": "y",
+	"\u0294": "?",
+	"\u027e": "F",
+	"\u02c8": "1",
+	"\u02cc": "2",
+	".": ".",
+}
+# IPA marks that carry no information for Eloquence (length, syllabicity, ties).
+_IPA_IGNORED = set("\u02d0\u02d1\u0329\u0361 /[]")
+_SPR_LANGS = ("enu", "eng")
+
 
 def initialize(indexCallback=None):
-	global onIndexReached, _current_lang
+	global onIndexReached
 	_client.ensure_started()
 	_client.initialize_audio()
 	_ensure_synth_worker()
 	onIndexReached = indexCallback
+	_initialize_host()
+	_start_watchdog()
+	from . import _eloquence_quarantine
+
+	_eloquence_quarantine.load()
+
+
+def _initialize_host() -> None:
+	"""Load the engine in a freshly started helper with the configured voice."""
+	global _current_lang
+	payload = initialize_payload()
+	_current_lang = payload["language"]
+	_client.set_audio_window(payload["audioWindowBytes"])
+	response = _client.send_command("initialize", **payload)
+	_client.mark_startup("initialized")
+	_client.set_host_startup(response.get("startup", {}))
+	params.update(response.get("params", {}))
+	voice_params.update(response.get("voiceParams", {}))
+
+
+def initialize_payload() -> Dict[str, Any]:
+	"""Arguments of the helper's ``initialize`` command for the configured voice."""
 	eci_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "eloquence", "eci.dll"))
 	voice_conf = config.conf.get("speech", {}).get("eci", {})
-	_current_lang = voice_conf.get("voice", "enu")
-	payload = {
+	return {
 		"eciPath": eci_path,
 		"dataDirectory": os.path.join(os.path.dirname(eci_path)),
-		"language": _current_lang,
+		"language": voice_conf.get("voice", "enu"),
 		"enableAbbreviationDict": config.conf.get("speech", {}).get("eci", {}).get("ABRDICT", False),
 		"enablePhrasePrediction": config.conf.get("speech", {}).get("eci", {}).get("phrasePrediction", False),
 		"voiceVariant": int(voice_conf.get("variant", 0) or 0),
+		"audioWindowBytes": _audio_window_bytes(),
+		"generation": _client._sequence,
+		"eciDeadlineMs": _eci_deadline_ms(),
 	}
-	response = _client.send_command("initialize", **payload)
-	params.update(response.get("params", {}))
-	voice_params.update(response.get("voiceParams", {}))
+
+
+def _transport_preference() -> str:
+	"""IPC transport to use: ELOQUENCE_IPC_TRANSPORT, else config eloquence.ipc_transport."""
+	return os.environ.get("ELOQUENCE_IPC_TRANSPORT") or str(
+		config.conf.get("eloquence", {}).get("ipc_transport", _ipc.DEFAULT_TRANSPORT)
+	)
+
+
+def _audio_window_bytes() -> int:
+	value = config.conf.get("eloquence", {}).get("audio_window_bytes", DEFAULT_AUDIO_WINDOW_BYTES)
+	try:
+		return max(0, int(value))
+	except (TypeError, ValueError):
+		LOGGER.warning("Ignoring invalid eloquence.audio_window_bytes %r", value)
+		return DEFAULT_AUDIO_WINDOW_BYTES
+
+
+def _hang_budget() -> float:
+	"""Hang budget in seconds; 0 when the watchdog is off."""
+	value = config.conf.get("eloquence", {}).get("hang_budget_ms", DEFAULT_HANG_BUDGET_MS)
+	try:
+		return max(0, int(value)) / 1000.0
+	except (TypeError, ValueError):
+		LOGGER.warning("Ignoring invalid eloquence.hang_budget_ms %r", value)
+		return DEFAULT_HANG_BUDGET_MS / 1000.0
+
+
+def _eci_deadline_ms() -> float:
+	"""Stall the helper reports as a hang: the budget less one heartbeat, so it is seen in time."""
+	budget = _hang_budget()
+	return budget * (1 - 1 / HEARTBEATS_PER_BUDGET) * 1000.0
+
+
+def _start_watchdog() -> None:
+	global _watchdog
+	budget = _hang_budget()
+	if _watchdog is not None or not budget:
+		return
+	_watchdog = HostWatchdog(_client, budget, _restart_host)
+	_watchdog.start()
+
+
+def _stop_watchdog() -> None:
+	global _watchdog
+	watchdog, _watchdog = _watchdog, None
+	if watchdog is not None:
+		watchdog.stop()
+
+
+def _restart_host(reason: str) -> None:
+	"""Replace a hung or crashed helper and bring the new one to the same voice settings.
+
+	Dictionary entries added at run time are not carried over; the new helper
+	loads the dictionary files as at start-up.
+	"""
+	LOGGER.error("Eloquence host %s; restarting it", reason)
+	saved_params = dict(params)
+	saved_voice_params = dict(voice_params)
+	failed_lang = _current_lang
+	failed_input = _client.take_inflight()
+	_client.discard_host()
+	_client.ensure_started()
+	_initialize_host()
+	voice_id = saved_params.get(9)
+	if voice_id is not None and voice_id != params.get(9):
+		set_voice(voice_id)
+	for pr, value in saved_voice_params.items():
+		setVParam(pr, value)
+	if failed_input and voice_id is not None:
+		from . import _eloquence_quarantine
+
+		_eloquence_quarantine.report_failure(voice_id, failed_lang, failed_input, reason)
+
+
+def watchdog_metrics() -> Dict[str, Any]:
+	return _watchdog.metrics() if _watchdog else {}
+
+
+def _coalesce_window() -> float:
+	"""Coalescing window in seconds; 0 when coalescing is off."""
+	value = config.conf.get("eloquence", {}).get("coalesce_ms", DEFAULT_COALESCE_MS)
+	try:
+		return max(0, int(value)) / 1000.0
+	except (TypeError, ValueError):
+		LOGGER.warning("Ignoring invalid eloquence.coalesce_ms %r", value)
+		return DEFAULT_COALESCE_MS / 1000.0
+
+
+def _hold_deadline(entry: ScheduledSpeech) -> Optional[float]:
+	"""When to send *entry* if it arrived during a burst of cancels, else None."""
+	window = _coalesce_window()
+	if not window:
+		return None
+	previous, latest = _client._stop_times
+	if latest > entry.queued or latest - previous > window:
+		return None
+	return entry.queued + window
+
+
+def audio_metrics() -> Dict[str, Any]:
+	return _client.audio_metrics()
+
+
+def synth_metrics() -> Dict[str, Any]:
+	return synth_queue.metrics()
+
+
+def startup_report() -> Dict[str, Any]:
+	"""Start-up milestones in milliseconds, as measured by the driver and the helper."""
+	return _client.startup_report()
+
+
+def _encode_text(text: str, lang: Optional[str] = None) -> bytes:
+	"""Encode *text* in the code page the engine expects for *lang*."""
+	# Use appropriate encoding for Asian languages
+	encoding = LANG_ENCODINGS.get(lang or _current_lang, "mbcs")
+	if encoding == "mbcs":
+		# Use Windows best-fit mapping so characters like Đ→D, ł→l
+		# instead of becoming '?' (see issue #90).  Text from preprocess() is
+		# already normalized and encodes in a single pass.
+		from ._text_preprocessing import best_fit_table
+
+		return best_fit_table().encode(text)
+	return text.encode(encoding, errors="replace")
 
 
 def speak(text):
 	try:
-		# Use appropriate encoding for Asian languages
-		encoding = LANG_ENCODINGS.get(_current_lang, "mbcs")
-		if encoding == "mbcs":
-			# Use Windows best-fit mapping so characters like Đ→D, ł→l
-			# instead of becoming '?' (see issue #90).
-			from ._text_preprocessing import _wchar_to_mbcs
-
-			text_bytes = _wchar_to_mbcs(text)
-			if text_bytes is None:
-				text_bytes = text.encode("mbcs", errors="replace")
-		else:
-			text_bytes = text.encode(encoding, errors="replace")
-		_client.send_command("addText", text=text_bytes, wait=False)
+		speak_encoded(_encode_text(text))
 	except Exception:
 		LOGGER.exception("Failed to send text to synthesizer")
 
 
+def speak_encoded(data: bytes) -> None:
+	"""Queue text already encoded with :func:`_encode_text`."""
+	try:
+		_client.send_command("addText", text=data, wait=False, generation=_client._current_seq)
+		_client.record_input(data)
+	except Exception:
+		LOGGER.exception("Failed to send text to synthesizer")
+
+
+def generate_phonemes(words: Sequence[str]) -> List[str]:
+	"""Return the engine's SPR phoneme string for each word in *words*.
+
+	Results are cached per language; only words missing from the cache are
+	sent to the host, in a single ``generatePhonemes`` round trip.  Words the
+	engine cannot convert map to an empty string.
+	"""
+	lang = _current_lang
+	results: Dict[str, str] = {}
+	missing: List[str] = []
+	with _phoneme_cache_lock:
+		for word in words:
+			key = (lang, word)
+			if key in _phoneme_cache:
+				_phoneme_cache.move_to_end(key)
+				results[word] = _phoneme_cache[key]
+			elif word not in results:
+				results[word] = ""
+				missing.append(word)
+	if missing:
+		try:
+			response = _client.send_command(
+				"generatePhonemes", words=[_encode_text(word, lang) for word in missing]
+			)
+		except Exception:
+			LOGGER.exception("Failed to generate phonemes")
+			return [results[word] for word in words]
+		phonemes = response.get("phonemes", [])
+		with _phoneme_cache_lock:
+			for word, spr in zip(missing, phonemes):
+				results[word] = spr
+				_phoneme_cache[(lang, word)] = spr
+			while len(_phoneme_cache) > PHONEME_CACHE_SIZE:
+				_phoneme_cache.popitem(last=False)
+	return [results[word] for word in words]
+
+
+# Dictionary volumes (ECIDictVolume) and the id of the live dictionary set.
+DICT_MAIN = 0
+DICT_ROOT = 1
+DICT_ABBR = 2
+LIVE_DICT = 0
+# Entries per updateDict message when inserting in bulk.
+DICT_BATCH_SIZE = 500
+
+
+def text_encoding(lang: Optional[str] = None) -> str:
+	"""Codec of the bytes :func:`_encode_text` produces for *lang*."""
+	encoding = LANG_ENCODINGS.get(lang or _current_lang, "mbcs")
+	if encoding == "mbcs":
+		from ._text_preprocessing import best_fit_table
+
+		return best_fit_table().encoding
+	return encoding
+
+
+def _decode_text(data: Optional[bytes]) -> Optional[str]:
+	if data is None:
+		return None
+	return data.decode(LANG_ENCODINGS.get(_current_lang, "mbcs"), errors="replace")
+
+
+def reload_dictionaries() -> Dict[int, str]:
+	"""Rebuild the engine dictionaries from the .dic files and swap them in.
+
+	Returns the load result for each volume that has a file.
+	"""
+	response = _client.send_command("reloadDictionaries")
+	clear_phoneme_cache()
+	return response.get("results", {})
+
+
+def update_dictionary(
+	entries: Iterable[Tuple[str, Optional[str]]],
+	volume: int = DICT_MAIN,
+	dict_id: int = LIVE_DICT,
+) -> Dict[str, str]:
+	"""Insert, replace or (with a None translation) delete dictionary entries.
+
+	Entries are sent in batches of DICT_BATCH_SIZE.  Returns the keys the
+	engine rejected, mapped to the ECIDictError name.
+	"""
+	failures: Dict[str, str] = {}
+	batch: List[Tuple[bytes, Optional[bytes]]] = []
+
+	def _flush() -> None:
+		response = _client.send_command("updateDict", dictId=dict_id, volume=volume, entries=batch)
+		for key, error in response.get("failures", {}).items():
+			failures[_decode_text(key)] = error
+		batch.clear()
+
+	for key, translation in entries:
+		batch.append((_encode_text(key), None if translation is None else _encode_text(translation)))
+		if len(batch) >= DICT_BATCH_SIZE:
+			_flush()
+	if batch:
+		_flush()
+	if dict_id == LIVE_DICT:
+		clear_phoneme_cache()
+	return failures
+
+
+def lookup_dictionary(
+	keys: Sequence[str], volume: int = DICT_MAIN, dict_id: int = LIVE_DICT
+) -> List[Optional[str]]:
+	response = _client.send_command(
+		"dictLookup", dictId=dict_id, volume=volume, keys=[_encode_text(key) for key in keys]
+	)
+	return [_decode_text(value) for value in response.get("translations", [])]
+
+
+def save_dictionary(path: str, volume: int = DICT_MAIN, dict_id: int = LIVE_DICT) -> str:
+	return _client.send_command("saveDict", dictId=dict_id, volume=volume, path=path).get("result", "")
+
+
+def replace_dictionaries(
+	entries: Dict[int, Iterable[Tuple[str, Optional[str]]]], load_files: bool = True
+) -> Dict[str, str]:
+	"""Build a fresh dictionary set and atomically swap it in as the live set.
+
+	The new set starts from the .dic files when *load_files* is true, then
+	receives *entries* (volume -> pairs).  The previous set stays active until
+	the new one is complete; on failure it is left untouched.
+	"""
+	dict_id = _client.send_command("newDict", loadFiles=load_files)["dictId"]
+	try:
+		failures: Dict[str, str] = {}
+		for volume, pairs in entries.items():
+			failures.update(update_dictionary(pairs, volume=volume, dict_id=dict_id))
+		_client.send_command("activateDict", dictId=dict_id)
+	except Exception:
+		try:
+			_client.send_command("deleteDict", dictId=dict_id)
+		except Exception:
+			LOGGER.exception("Failed to discard dictionary %s", dict_id)
+		raise
+	clear_phoneme_cache()
+	return failures
+
+
+def clear_phoneme_cache() -> None:
+	with _phoneme_cache_lock:
+		_phoneme_cache.clear()
+
+
+def ipa_to_spr(ipa: str, lang: Optional[str] = None) -> Optional[str]:
+	"""Convert an IPA transcription to an Eloquence SPR body, or None.
+
+	Only the English voices have a symbol table; None is also returned when
+	*ipa* contains a symbol without an SPR equivalent, so callers can fall
+	back to speaking the plain text.
+	"""
+	if (lang or _current_lang) not in _SPR_LANGS or not ipa:
+		return None
+	spr = []
+	pos = 0
+	while pos < len(ipa):
+		if ipa[pos] in _IPA_IGNORED:
+			pos += 1
+			continue
+		for size in (2, 1):
+			symbol = IPA_TO_SPR.get(ipa[pos : pos + size])
+			if symbol is not None:
+				spr.append(symbol)
+				pos += size
+				break
+		else:
+			return None
+	if not spr:
+		return None
+	# Multi-syllable SPRs without a primary stress are spelled out by the engine.
+	if "1" not in spr:
+		spr.insert(0, "1")
+	return "".join(spr)
+
+
 def index(idx):
 	try:
-		_client.send_command("insertIndex", value=int(idx), wait=False)
+		_client.send_command("insertIndex", value=int(idx), wait=False, generation=_client._current_seq)
 	except Exception:
 		LOGGER.exception("Failed to insert index")
 
@@ -539,13 +1484,37 @@ def cmdProsody(pr, multiplier, offset=0):
 	setVParam(pr, value, temporary=True)
 
 
-def synth():
+def synth(final=True):
+	"""Render the queued input; *final* False leaves the utterance open for more text."""
 	try:
-		_client.send_command("synthesize")
+		# An empty reply means the request never reached a live helper.
+		if _client.send_command("synthesize", final=final, generation=_client._current_seq):
+			_client.input_rendered()
+	except CommandCancelled:
+		pass  # Speech was stopped; the host is being told to stop as well.
 	except Exception:
 		LOGGER.exception("Failed to start synthesis")
 
 
+def speak_stream(segments: Iterable[bytes]) -> None:
+	"""Feed encoded *segments* one at a time, rendering each before the next is sent.
+
+	Audio for the first segment starts while the rest are still being
+	prepared, and the helper never holds more than one segment of input.
+	Queued speech of a higher priority runs between segments.  The utterance
+	is finished by the usual final index and :func:`synth`.
+	"""
+	seq = _client._current_seq
+	for data in segments:
+		if seq < _client._sequence:
+			return
+		speak_encoded(data)
+		synth(final=False)
+		# Segment boundaries are where higher-priority speech may cut in.
+		yield_to_waiting_speech()
+		_client._current_seq = seq
+
+
 def stop():
 	_client.stop()
 
@@ -553,6 +1522,13 @@ def stop():
 def pause(switch):
 	if _client._player:
 		_client._player.pause(switch)
+	# Also hold the engine so it does not keep rendering into the paused player.
+	if not _client._host:
+		return
+	try:
+		_client.send_command("pause", wait=False, switch=bool(switch))
+	except Exception:
+		LOGGER.exception("Failed to pause the host")
 
 
 def close_audio():
@@ -560,6 +1536,7 @@ def close_audio():
 
 
 def terminate():
+	_stop_watchdog()
 	_client.shutdown()
 	_stop_synth_worker()
 
@@ -629,25 +1606,71 @@ def process():
 def _synth_worker_loop() -> None:
 	while True:
 		try:
-			item = synth_queue.get(timeout=0.1)
+			entry = synth_queue.get(timeout=0.1)
 		except queue.Empty:
 			if _synth_worker_stop.is_set():
 				break
 			continue
-		if item is None:
+		if entry.item is None:
 			synth_queue.task_done()
 			break
-		lst, seq = item
-		if seq < _client._sequence:
+		try:
+			_run_scheduled(entry)
+		finally:
 			synth_queue.task_done()
-			continue
-		_client._current_seq = seq
+
+
+def _run_scheduled(entry: ScheduledSpeech, nested: bool = False) -> None:
+	lst, seq = entry.item
+	deadline = None if nested else _hold_deadline(entry)
+	if deadline is not None:
+		synth_queue.hold(entry, deadline, lambda: seq < _client._sequence)
+	if seq < _client._sequence:
+		synth_queue.discarded(entry, False, _cancel_preprocessing(lst))
+		return
+	_client._current_seq = seq
+	synth_queue.started(entry)
+	try:
+		for func, args in lst:
+			if seq < _client._sequence:
+				# stop() arrived while this utterance was being sent
+				synth_queue.discarded(entry, True, _cancel_preprocessing(lst))
+				break
+			if func is index:
+				if args == (FINAL_INDEX,):
+					if nested:
+						# The preempted utterance is still under way and owns the end of speech.
+						continue
+				else:
+					entry.indexes -= 1
+			if nested and func is synth:
+				args = (False,)
+			try:
+				func(*args)
+			except Exception:
+				LOGGER.exception("Synthesis command failed")
+	finally:
+		synth_queue.finished(entry)
+
+
+def _cancel_preprocessing(lst) -> int:
+	"""Cancel text preparation queued for a dropped utterance; returns how much was skipped."""
+	return sum(1 for _func, args in lst for arg in args if isinstance(arg, Future) and arg.cancel())
+
+
+def yield_to_waiting_speech() -> None:
+	"""Run any queued utterances that outrank the one in progress, then return to it.
+
+	They are rendered inside the running utterance, which keeps its final
+	index, so NVDA sees only one end of speech.  Their own indexes are
+	reported as their audio reaches them, like those of any utterance.
+	"""
+	while True:
+		entry = synth_queue.preempting()
+		if entry is None:
+			return
 		try:
-			for func, args in lst:
-				try:
-					func(*args)
-				except Exception:
-					LOGGER.exception("Synthesis command failed")
+			_run_scheduled(entry, nested=True)
 		finally:
 			synth_queue.task_done()
 
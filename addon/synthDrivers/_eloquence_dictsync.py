@@ -0,0 +1,307 @@
+"""Background sync of the pronunciation dictionaries from a GitHub repository.
+
+The repository archive is downloaded into memory and its ``.dic`` members are
+read straight from it; nothing is extracted to disk.  Each file is decoded
+once from the bytes already in memory, and new entries are appended to the
+add-on's dictionaries in CP1252, which is what the engine reads.
+
+Before downloading, the branch head commit (for GitHub URLs) is compared with
+the one merged last time, and the archive itself comes through the shared
+download cache, so an unchanged archive costs a conditional request.  The
+SHA-256 of the archive merged last is kept, and an archive with the same
+digest is not merged again.  The work runs on a :class:`DictionarySync`
+thread that reports progress through callbacks and can be cancelled.
+
+No NVDA modules are imported, so the sync can be exercised against a local
+HTTP server.
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+import urllib.request
+import zipfile
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from . import _eloquence_download
+
+log = logging.getLogger(__name__)
+
+BRANCH = "master"
+STATE_FILE = "dictsync.json"
+TIMEOUT = 30
+# Decodings tried in order; latin-1 accepts any byte sequence.
+SOURCE_ENCODINGS = ("utf-8-sig", "cp1252", "iso-8859-1")
+LOCAL_ENCODINGS = ("cp1252", "utf-8", "mbcs")
+
+# Progress stages; the detail is the amount downloaded or the file being merged.
+STAGE_CHECKING = "checking"
+STAGE_DOWNLOADING = "downloading"
+STAGE_MERGING = "merging"
+
+_GITHUB_REPO = re.compile(r"https://github\.com/([^/]+)/([^/]+?)(?:\.git)?/?$")
+
+
+class SyncCancelled(Exception):
+	"""Raised inside the worker when :meth:`DictionarySync.cancel` was called."""
+
+
+class SyncResult(NamedTuple):
+	updates: int
+	files: int
+	unchanged: bool = False
+	cancelled: bool = False
+	error: Optional[Exception] = None
+
+
+# --- Entry normalization -------------------------------------------------
+
+
+def clean_key_text(text: str) -> str:
+	"""Return *text* if CP1252 can encode it, otherwise with its accents stripped."""
+	try:
+		text.encode("cp1252")
+		return text
+	except UnicodeEncodeError:
+		return "".join(c for c in unicodedata.normalize("NFD", text) if unicodedata.category(c) != "Mn")
+
+
+def get_key(line: str) -> Optional[str]:
+	"""The CP1252-safe, lower-cased word a dictionary line defines."""
+	parts = line.strip().split(None, 1)
+	if parts:
+		return clean_key_text(parts[0].lower())
+	return None
+
+
+def normalize_entry_format(line: str) -> str:
+	"""Use a tab between word and ``[pronunciation]`` and make the whole line CP1252-safe."""
+	line = line.strip()
+	separator = "\t[" if "\t[" in line else " [" if " [" in line else None
+	if separator:
+		word_part, pronunciation_part = line.split(separator, 1)
+		return f"{clean_key_text(word_part.strip())}\t[{clean_key_text(pronunciation_part)}"
+	return clean_key_text(line)
+
+
+def decode_text(data: bytes, encodings: Tuple[str, ...] = SOURCE_ENCODINGS) -> str:
+	"""Decode *data* with the first of *encodings* that fits it."""
+	for encoding in encodings:
+		try:
+			return data.decode(encoding)
+		except (UnicodeDecodeError, LookupError):
+			continue
+	return data.decode("iso-8859-1", errors="replace")
+
+
+def iter_dictionaries(archive: bytes) -> Iterator[Tuple[str, List[str]]]:
+	"""Yield ``(file name, lines)`` for every ``.dic`` member of the zip *archive*."""
+	with zipfile.ZipFile(io.BytesIO(archive)) as zf:
+		for info in zf.infolist():
+			name = os.path.basename(info.filename)
+			if info.is_dir() or not name.lower().endswith(".dic"):
+				continue
+			yield name, decode_text(zf.read(info)).splitlines()
+
+
+def _encodable(line: str) -> bool:
+	# Letters like Ł have no accent to strip and no CP1252 form; such entries are dropped.
+	try:
+		line.encode("cp1252")
+		return True
+	except UnicodeEncodeError:
+		return False
+
+
+def merge_dictionary(dest_path: str, source_lines: List[str]) -> int:
+	"""Append the entries of *source_lines* whose word *dest_path* lacks; return how many.
+
+	A dictionary that does not exist yet is created with every entry.
+	"""
+	if not os.path.exists(dest_path):
+		lines = [
+			line for line in map(normalize_entry_format, source_lines) if line.strip() and _encodable(line)
+		]
+		with open(dest_path, "w", encoding="cp1252") as f:
+			f.writelines(f"{line}\n" for line in lines)
+		log.info(f"Created new dictionary file: {os.path.basename(dest_path)} ({len(lines)} entries)")
+		return len(lines)
+	with open(dest_path, "rb") as f:
+		local = decode_text(f.read(), LOCAL_ENCODINGS)
+	existing_keys = {key for key in map(get_key, local.splitlines()) if key}
+	lines_to_append = []
+	for line in source_lines:
+		normalized = normalize_entry_format(line)
+		key = get_key(normalized)
+		if key and key not in existing_keys and _encodable(normalized):
+			lines_to_append.append(normalized)
+			existing_keys.add(key)
+	if lines_to_append:
+		with open(dest_path, "a", encoding="cp1252") as f:
+			f.write("\n")
+			f.writelines(f"{line}\n" for line in lines_to_append)
+	return len(lines_to_append)
+
+
+# --- Remote state ---------------------------------------------------------
+
+
+def archive_url(repo_url: str) -> str:
+	return repo_url.rstrip("/") + f"/archive/{BRANCH}.zip"
+
+
+def head_commit(repo_url: str) -> Optional[str]:
+	"""SHA of the branch head for a GitHub *repo_url*; None if unknown or not GitHub."""
+	match = _GITHUB_REPO.match(repo_url)
+	if not match:
+		return None
+	owner, repo = match.groups()
+	request = urllib.request.Request(
+		f"https://api.github.com/repos/{owner}/{repo}/commits/{BRANCH}",
+		headers={"Accept": "application/vnd.github.sha", "User-Agent": "Eloquence-NVDA-Addon"},
+	)
+	try:
+		with urllib.request.urlopen(request, timeout=TIMEOUT) as response:
+			return response.read(100).decode("ascii").strip() or None
+	except (OSError, ValueError, UnicodeDecodeError) as e:
+		log.debug(f"Could not read the head commit of {repo_url}: {e}")
+		return None
+
+
+def load_state(dest_folder: str) -> Dict[str, Dict[str, str]]:
+	try:
+		with open(os.path.join(dest_folder, STATE_FILE), "r", encoding="utf-8") as f:
+			return json.load(f)
+	except (OSError, ValueError):
+		return {}
+
+
+def save_state(dest_folder: str, state: Dict[str, Dict[str, str]]) -> None:
+	try:
+		with open(os.path.join(dest_folder, STATE_FILE), "w", encoding="utf-8") as f:
+			json.dump(state, f, indent=1)
+	except OSError:
+		log.exception("Failed to save the dictionary sync state")
+
+
+# --- Worker ---------------------------------------------------------------
+
+
+class DictionarySync(threading.Thread):
+	"""Download and merge the dictionaries of *repo_url* into *dest_folder*.
+
+	*on_progress(percent, stage, detail)* and *on_done(result)* are called on
+	this thread; a GUI wraps them with ``wx.CallAfter``.  *after_merge* runs on
+	this thread once files changed, e.g. to reload the engine's dictionaries.
+	The archive is cached in *cache_dir*.
+	"""
+
+	def __init__(
+		self,
+		repo_url: str,
+		dest_folder: str,
+		on_progress: Callable[[int, str, str], None],
+		on_done: Callable[[SyncResult], None],
+		after_merge: Optional[Callable[[], object]] = None,
+		archive: Optional[str] = None,
+		cache_dir: str = _eloquence_download.DEFAULT_CACHE_DIR,
+	):
+		super().__init__(name="EloquenceDictionarySync", daemon=True)
+		self.repo_url = repo_url
+		self.dest_folder = dest_folder
+		self.archive_url = archive or archive_url(repo_url)
+		self.cache_dir = cache_dir
+		self._on_progress = on_progress
+		self._on_done = on_done
+		self._after_merge = after_merge
+		self._cancelled = threading.Event()
+
+	def cancel(self) -> None:
+		self._cancelled.set()
+
+	@property
+	def cancelled(self) -> bool:
+		return self._cancelled.is_set()
+
+	def run(self) -> None:
+		try:
+			result = self.sync()
+		except SyncCancelled:
+			result = SyncResult(0, 0, cancelled=True)
+		except Exception as e:
+			log.exception("Dictionary sync failed")
+			result = SyncResult(0, 0, error=e)
+		self._on_done(result)
+
+	def sync(self) -> SyncResult:
+		os.makedirs(self.dest_folder, exist_ok=True)
+		state = load_state(self.dest_folder)
+		previous = state.get(self.repo_url, {})
+		have_files = any(name.lower().endswith(".dic") for name in os.listdir(self.dest_folder))
+		self._on_progress(0, STAGE_CHECKING, "")
+		commit = head_commit(self.repo_url)
+		if have_files and commit and commit == previous.get("commit"):
+			return SyncResult(0, 0, unchanged=True)
+		archive, sha256 = self._download()
+		# Compared by digest: a merge that was cancelled or failed left the new
+		# archive in the download cache, so a 304 alone does not mean it was merged.
+		if have_files and sha256 == previous.get("sha256"):
+			if commit:
+				state[self.repo_url] = dict(previous, commit=commit)
+				save_state(self.dest_folder, state)
+			return SyncResult(0, 0, unchanged=True)
+		updates, files = self._merge(archive)
+		state[self.repo_url] = {"sha256": sha256, **({"commit": commit} if commit else {})}
+		save_state(self.dest_folder, state)
+		if updates and self._after_merge is not None:
+			try:
+				self._after_merge()
+			except Exception:
+				log.exception("Failed to reload dictionaries")
+		return SyncResult(updates, files)
+
+	def _download(self) -> Tuple[bytes, str]:
+		"""Fetch the archive through the download cache; returns it with its SHA-256."""
+
+		def progress(received, total):
+			percent = received * 50 // total if total else 25
+			self._on_progress(percent, STAGE_DOWNLOADING, f"{received // 1024} KB")
+
+		try:
+			result = _eloquence_download.download(
+				self.archive_url,
+				cache_dir=self.cache_dir,
+				progress=progress,
+				cancelled=self._cancelled.is_set,
+			)
+		except _eloquence_download.DownloadCancelled:
+			raise SyncCancelled()
+		with open(result.path, "rb") as f:
+			return f.read(), result.sha256
+
+	def _merge(self, archive: bytes) -> Tuple[int, int]:
+		members = list(iter_dictionaries(archive))
+		updates = 0
+		seen = set()
+		for number, (filename, lines) in enumerate(members):
+			self._check_cancelled()
+			if filename.lower() in seen:
+				continue
+			seen.add(filename.lower())
+			self._on_progress(50 + number * 50 // len(members), STAGE_MERGING, filename)
+			try:
+				updates += merge_dictionary(os.path.join(self.dest_folder, filename), lines)
+			except Exception as e:
+				log.error(f"Failed to merge dictionary {filename}: {e}")
+		files = sum(1 for name in os.listdir(self.dest_folder) if name.lower().endswith(".dic"))
+		return updates, files
+
+	def _check_cancelled(self) -> None:
+		if self._cancelled.is_set():
+			raise SyncCancelled()
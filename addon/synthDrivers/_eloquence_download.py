@@ -0,0 +1,266 @@
+"""Resumable, verified HTTP downloads with a local artifact cache.
+
+Used by the add-on updater, the dictionary sync and ``fetch_eci.py``.  A
+download is written to ``<cache>.part`` in large reads; if the connection
+drops it is resumed with an HTTP Range request (guarded by ``If-Range`` so a
+file that changed meanwhile is fetched from the start), and an interrupted
+or cancelled download picks up where it stopped the next time.  Completed
+files stay in the cache with their ETag, Last-Modified and SHA-256, so the
+next request for the same URL is conditional and a 304 reuses the file, and
+a request that names the expected SHA-256 is served without any request at
+all when the cached file already matches it.
+
+No NVDA modules are imported, so downloads can be tested against a local
+HTTP server.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import http.client
+import json
+import logging
+import os
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from typing import Callable, NamedTuple, Optional
+
+log = logging.getLogger(__name__)
+
+USER_AGENT = "Eloquence-NVDA-Addon"
+CHUNK_SIZE = 256 * 1024
+TIMEOUT = 30
+# Attempts after a dropped connection; each waits twice as long as the last.
+RETRIES = 4
+RETRY_DELAY = 1.0
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "eloquence-downloads")
+# Completed artifacts kept in a cache directory, most recently used first.
+MAX_CACHED = 8
+
+
+class DownloadError(Exception):
+	pass
+
+
+class DownloadCancelled(DownloadError):
+	pass
+
+
+class DownloadResult(NamedTuple):
+	path: str
+	sha256: str
+	# True when the cached copy was used because the server (or the expected hash) said it is current.
+	not_modified: bool = False
+	resumed: bool = False
+	fetched: int = 0
+
+
+def cache_paths(url: str, cache_dir: str = DEFAULT_CACHE_DIR):
+	"""The data and metadata files that cache *url* in *cache_dir*."""
+	key = hashlib.sha256(url.encode("utf-8")).hexdigest()[:32]
+	base = os.path.join(cache_dir, key)
+	return base + ".bin", base + ".json"
+
+
+def _load_meta(path: str) -> dict:
+	try:
+		with open(path, "r", encoding="utf-8") as f:
+			return json.load(f)
+	except (OSError, ValueError):
+		return {}
+
+
+def _save_meta(path: str, meta: dict) -> None:
+	tmp_path = path + ".tmp"
+	with open(tmp_path, "w", encoding="utf-8") as f:
+		json.dump(meta, f)
+	os.replace(tmp_path, path)
+
+
+def _hash_file(path: str) -> str:
+	digest = hashlib.sha256()
+	with open(path, "rb") as f:
+		for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+			digest.update(block)
+	return digest.hexdigest()
+
+
+def download(
+	url: str,
+	sha256: Optional[str] = None,
+	cache_dir: str = DEFAULT_CACHE_DIR,
+	progress: Optional[Callable[[int, int], None]] = None,
+	cancelled: Optional[Callable[[], bool]] = None,
+	headers: Optional[dict] = None,
+) -> DownloadResult:
+	"""Fetch *url* into *cache_dir* and return where it is.
+
+	*progress(received, total)* is called after every read (*total* is 0
+	when the server does not say); *cancelled()* is polled as often and
+	stops the download with :class:`DownloadCancelled`, keeping what was
+	received for a later resume.  When *sha256* is given the file must
+	match it, otherwise :class:`DownloadError` is raised and the bytes are
+	discarded.
+	"""
+	os.makedirs(cache_dir, exist_ok=True)
+	data_path, meta_path = cache_paths(url, cache_dir)
+	part_path = data_path + ".part"
+	meta = _load_meta(meta_path)
+	expected = sha256.lower() if sha256 else None
+	cached = bool(os.path.exists(data_path) and meta.get("sha256"))
+	if cached and expected and meta["sha256"] == expected:
+		os.utime(data_path)
+		return DownloadResult(data_path, expected, not_modified=True)
+
+	fetched = 0
+	resumed = False
+	delay = RETRY_DELAY
+	for attempt in range(RETRIES + 1):
+		offset = _part_size(part_path)
+		request = urllib.request.Request(url, headers=_request_headers(meta, offset, cached, headers))
+		try:
+			response = urllib.request.urlopen(request, timeout=TIMEOUT)
+		except urllib.error.HTTPError as e:
+			if e.code == 304 and cached:
+				os.utime(data_path)
+				return DownloadResult(data_path, meta["sha256"], not_modified=True)
+			if e.code == 416 and offset:
+				# The part file is no prefix of what the server has now.
+				os.remove(part_path)
+				continue
+			# Server errors and rate limiting pass; other client errors will not.
+			if e.code < 500 and e.code != 429:
+				raise
+			delay = _retry_later(url, e, attempt, delay)
+			continue
+		except OSError as e:
+			delay = _retry_later(url, e, attempt, delay)
+			continue
+
+		with response:
+			offset, total = _resume_point(response, offset, meta, meta_path)
+			resumed = resumed or offset > 0
+			try:
+				_receive(url, response, part_path, offset, total, progress, cancelled)
+			except (OSError, http.client.HTTPException) as e:
+				if attempt == RETRIES:
+					raise DownloadError(f"Download of {url} was interrupted: {e}") from e
+				log.warning(f"Download of {url} interrupted at {_part_size(part_path)} bytes ({e}), resuming")
+				time.sleep(delay)
+				delay *= 2
+				continue
+			finally:
+				fetched += _part_size(part_path) - offset
+		break
+	else:
+		raise DownloadError(f"Could not download {url}")
+
+	digest = _finish(url, part_path, data_path, meta, meta_path, expected)
+	_prune(cache_dir)
+	return DownloadResult(data_path, digest, resumed=resumed, fetched=fetched)
+
+
+def _part_size(part_path: str) -> int:
+	return os.path.getsize(part_path) if os.path.exists(part_path) else 0
+
+
+def _request_headers(meta: dict, offset: int, cached: bool, extra: Optional[dict]) -> dict:
+	"""Headers that resume a part file of *offset* bytes, or revalidate the cached copy."""
+	request_headers = {"User-Agent": USER_AGENT, **(extra or {})}
+	partial = meta.get("partial", {})
+	validator = partial.get("etag") or partial.get("lastModified")
+	if offset and validator:
+		request_headers["Range"] = f"bytes={offset}-"
+		request_headers["If-Range"] = validator
+	elif cached:
+		if meta.get("etag"):
+			request_headers["If-None-Match"] = meta["etag"]
+		if meta.get("lastModified"):
+			request_headers["If-Modified-Since"] = meta["lastModified"]
+	return request_headers
+
+
+def _retry_later(url: str, error: Exception, attempt: int, delay: float) -> float:
+	"""Wait *delay* seconds after a failed *attempt* and return the next delay; raise after the last."""
+	if attempt == RETRIES:
+		raise DownloadError(f"Could not download {url}: {error}") from error
+	log.warning(f"Download of {url} failed ({error}), retrying in {delay:.0f} s")
+	time.sleep(delay)
+	return delay * 2
+
+
+def _resume_point(response, offset: int, meta: dict, meta_path: str):
+	"""Return ``(offset, total)`` for *response*: where its body goes in the part file, and the full size.
+
+	A response that is not the requested range starts the part file over,
+	and its validators are recorded so that this download can be resumed.
+	"""
+	content_range = response.headers.get("Content-Range", "")
+	length = int(response.headers.get("Content-Length") or 0)
+	if offset and response.status == 206 and content_range.startswith(f"bytes {offset}-"):
+		return offset, offset + length
+	meta["partial"] = {
+		key: value
+		for key, value in (
+			("etag", response.headers.get("ETag")),
+			("lastModified", response.headers.get("Last-Modified")),
+		)
+		if value
+	}
+	_save_meta(meta_path, meta)
+	return 0, length
+
+
+def _receive(url, response, part_path: str, offset: int, total: int, progress, cancelled) -> None:
+	"""Write the body of *response* to *part_path* from *offset* on."""
+	received = offset
+	with open(part_path, "ab" if offset else "wb") as f:
+		while True:
+			if cancelled is not None and cancelled():
+				raise DownloadCancelled(url)
+			chunk = response.read(CHUNK_SIZE)
+			if not chunk:
+				break
+			f.write(chunk)
+			received += len(chunk)
+			if progress is not None:
+				progress(received, total)
+	if total and received < total:
+		raise http.client.IncompleteRead(b"", total - received)
+
+
+def _finish(
+	url: str, part_path: str, data_path: str, meta: dict, meta_path: str, expected: Optional[str]
+) -> str:
+	"""Verify the completed part file, move it into the cache and return its SHA-256."""
+	digest = _hash_file(part_path)
+	if expected and digest != expected:
+		os.remove(part_path)
+		meta.pop("partial", None)
+		_save_meta(meta_path, meta)
+		raise DownloadError(f"{url} does not match its published SHA-256")
+	os.replace(part_path, data_path)
+	partial = meta.pop("partial", {})
+	meta.update(url=url, sha256=digest, size=os.path.getsize(data_path))
+	meta.pop("etag", None)
+	meta.pop("lastModified", None)
+	meta.update(partial)
+	_save_meta(meta_path, meta)
+	return digest
+
+
+def _prune(cache_dir: str) -> None:
+	"""Keep only the MAX_CACHED most recently used artifacts."""
+	try:
+		entries = sorted(
+			(os.path.join(cache_dir, name) for name in os.listdir(cache_dir) if name.endswith(".bin")),
+			key=os.path.getmtime,
+			reverse=True,
+		)
+		for data_path in entries[MAX_CACHED:]:
+			os.remove(data_path)
+			os.remove(data_path[: -len(".bin")] + ".json")
+	except OSError:
+		log.debug("Could not prune the download cache", exc_info=True)
@@ -1,14 +1,42 @@
-"""Lightweight IPC helpers for the Eloquence host communication."""
+"""Lightweight IPC helpers for the Eloquence host communication.
+
+The driver and the helper talk over two stream sockets, the main connection
+and the control connection.  How those sockets are set up is up to a
+:class:`Transport`:
+
+``socketpair``
+	Connected pairs created before the helper starts and handed to it, so there
+	is no listener and no authentication round trip.  POSIX passes the file
+	descriptors; Windows duplicates the sockets into the helper with
+	``socket.share`` over an inherited pipe, once the helper has reported its
+	pid over a second one.
+``unix``
+	An ``AF_UNIX`` listener in a private temporary directory, where supported.
+``tcp``
+	A loopback TCP listener with an authkey handshake; always available, the
+	default and the fallback.
+
+The helper's side of each transport is ``host_connect.py`` next to the helper.
+"""
 
 from __future__ import annotations
 
+import os
 import pickle
+import shutil
 import socket
 import struct
+import subprocess
+import tempfile
 import threading
-from typing import Any, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 _HEADER_STRUCT = struct.Struct("!I")
+# Receiver threads get socket.timeout after this many seconds of silence.
+RECV_TIMEOUT = 10.0
+# The socket pair transport is not the default until it has been verified on
+# Windows with the frozen --onefile helper; select it with "auto" or "socketpair".
+DEFAULT_TRANSPORT = "tcp"
 
 
 class IpcConnection:
@@ -41,11 +69,218 @@ class IpcConnection:
 		self._sock.close()
 
 
+# (main connection, control connection)
+ConnectionPair = Tuple[IpcConnection, IpcConnection]
+
+
+class Transport:
+	"""Creates the main and control connections to a helper process.
+
+	Use :meth:`prepare` before spawning the helper to get its extra command
+	line arguments and ``Popen`` keyword arguments, then :meth:`connect` once
+	it is running.
+	"""
+
+	name = ""
+
+	@classmethod
+	def available(cls) -> bool:
+		return True
+
+	def prepare(self) -> Tuple[List[str], Dict[str, Any]]:
+		raise NotImplementedError
+
+	def connect(self, process: subprocess.Popen, timeout: float = 10.0) -> ConnectionPair:
+		raise NotImplementedError
+
+	def close(self) -> None:
+		"""Release anything left over from set-up; the connections stay open."""
+
+
+class TcpTransport(Transport):
+	name = "tcp"
+
+	def __init__(self) -> None:
+		self._listener: Optional[socket.socket] = None
+		self._authkey = os.urandom(16)
+
+	def _listen(self) -> socket.socket:
+		return create_listener()
+
+	def _address(self) -> str:
+		host, port = self._listener.getsockname()[:2]
+		return f"{host}:{port}"
+
+	def prepare(self) -> Tuple[List[str], Dict[str, Any]]:
+		self._listener = self._listen()
+		return ["--address", self._address(), "--authkey", self._authkey.hex()], {}
+
+	def connect(self, process: subprocess.Popen, timeout: float = 10.0) -> ConnectionPair:
+		conn = accept_authenticated(self._listener, self._authkey, timeout)
+		try:
+			control = accept_authenticated(self._listener, self._authkey, timeout)
+		except Exception:
+			conn.close()
+			raise
+		return conn, control
+
+	def close(self) -> None:
+		if self._listener is not None:
+			try:
+				self._listener.close()
+			except OSError:
+				pass
+			self._listener = None
+
+
+class UnixTransport(TcpTransport):
+	name = "unix"
+
+	def __init__(self) -> None:
+		super().__init__()
+		self._directory: Optional[str] = None
+
+	@classmethod
+	def available(cls) -> bool:
+		return hasattr(socket, "AF_UNIX")
+
+	def _listen(self) -> socket.socket:
+		# mkdtemp creates the directory readable by the current user only.
+		self._directory = tempfile.mkdtemp(prefix="eloquence-")
+		sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		sock.bind(os.path.join(self._directory, "ipc"))
+		sock.listen(2)
+		return sock
+
+	def _address(self) -> str:
+		return "unix:" + self._listener.getsockname()
+
+	def close(self) -> None:
+		super().close()
+		if self._directory:
+			shutil.rmtree(self._directory, ignore_errors=True)
+			self._directory = None
+
+
+class SocketPairTransport(Transport):
+	name = "socketpair"
+
+	def __init__(self) -> None:
+		self._pairs: List[Tuple[socket.socket, socket.socket]] = []
+		self._pipe: Optional[Tuple[int, int]] = None
+		self._pid_pipe: Optional[Tuple[int, int]] = None
+
+	def prepare(self) -> Tuple[List[str], Dict[str, Any]]:
+		self._pairs = [socket.socketpair() for _ in range(2)]
+		if os.name != "nt":
+			fds = [child.fileno() for _, child in self._pairs]
+			return ["--fds", ",".join(str(fd) for fd in fds)], {"pass_fds": fds}
+		import msvcrt
+
+		# The helper's ends are handed over with socket.share through a pipe whose
+		# read end it inherits.  Sharing needs the pid of the process that will
+		# call fromshare, which the helper writes to a second pipe first.
+		self._pipe = os.pipe()
+		self._pid_pipe = os.pipe()
+		handles = [msvcrt.get_osfhandle(self._pipe[0]), msvcrt.get_osfhandle(self._pid_pipe[1])]
+		for handle in handles:
+			os.set_handle_inheritable(handle, True)
+		startupinfo = subprocess.STARTUPINFO()
+		startupinfo.lpAttributeList = {"handle_list": handles}
+		return ["--share-pipe", ",".join(str(handle) for handle in handles)], {"startupinfo": startupinfo}
+
+	def connect(self, process: subprocess.Popen, timeout: float = 10.0) -> ConnectionPair:
+		if self._pipe is not None:
+			(read_fd, write_fd), (pid_read_fd, pid_write_fd) = self._pipe, self._pid_pipe
+			self._pipe = self._pid_pipe = None
+			os.close(read_fd)
+			os.close(pid_write_fd)
+			try:
+				# Not process.pid: a PyInstaller --onefile helper is a bootloader that
+				# runs the interpreter in a child process of its own.
+				pid = _read_pid(pid_read_fd, timeout)
+				for _, child in self._pairs:
+					data = child.share(pid)
+					os.write(write_fd, _HEADER_STRUCT.pack(len(data)) + data)
+			finally:
+				os.close(write_fd)
+		connections = []
+		for parent, child in self._pairs:
+			child.close()
+			connections.append(_wrap(parent))
+		self._pairs = []
+		return connections[0], connections[1]
+
+	def close(self) -> None:
+		for pair in self._pairs:
+			for sock in pair:
+				sock.close()
+		self._pairs = []
+		for pipe in (self._pipe, self._pid_pipe):
+			if pipe is not None:
+				for fd in pipe:
+					os.close(fd)
+		self._pipe = self._pid_pipe = None
+
+
+def _read_pid(fd: int, timeout: float) -> int:
+	"""Read the pid the helper reports on pipe *fd*, which is closed afterwards."""
+	result: List[int] = []
+
+	def read() -> None:
+		with os.fdopen(fd, "rb") as pipe:
+			data = pipe.read(_HEADER_STRUCT.size)
+		if len(data) == _HEADER_STRUCT.size:
+			result.extend(_HEADER_STRUCT.unpack(data))
+
+	# Pipes cannot be read with a timeout on Windows.  The reader finishes
+	# once the helper writes or exits; a timed-out helper is killed by the caller.
+	reader = threading.Thread(target=read, name="EloquencePidReader", daemon=True)
+	reader.start()
+	reader.join(timeout)
+	if reader.is_alive():
+		raise TimeoutError(f"Eloquence host process did not report its pid within {timeout}s.")
+	if not result:
+		raise ConnectionError("Eloquence host process exited before connecting")
+	return result[0]
+
+
+TRANSPORTS = {cls.name: cls for cls in (SocketPairTransport, UnixTransport, TcpTransport)}
+
+
+def transport_candidates(preference: Optional[str] = None) -> List[str]:
+	"""Transport names to try in order for *preference*, always ending with ``tcp``."""
+	preference = (preference or DEFAULT_TRANSPORT).strip().lower()
+	if preference == "auto":
+		names = ["socketpair", "tcp"]
+	elif preference in TRANSPORTS:
+		names = [preference, "tcp"]
+	else:
+		names = ["tcp"]
+	return [name for name in dict.fromkeys(names) if TRANSPORTS[name].available()]
+
+
+def create_transport(name: str) -> Transport:
+	return TRANSPORTS[name]()
+
+
+def _wrap(sock: socket.socket) -> IpcConnection:
+	_set_nodelay(sock)
+	sock.settimeout(RECV_TIMEOUT)
+	return IpcConnection(sock)
+
+
+def _set_nodelay(sock: socket.socket) -> None:
+	# socket.socketpair() is a loopback TCP pair on Windows.
+	if sock.family in (socket.AF_INET, socket.AF_INET6):
+		sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+
 def create_listener() -> socket.socket:
 	sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 	sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
 	sock.bind(("127.0.0.1", 0))
-	sock.listen(1)
+	sock.listen(2)
 	return sock
 
 
@@ -61,23 +296,15 @@ def accept_authenticated(listener: socket.socket, authkey: bytes, timeout: float
 	finally:
 		listener.settimeout(None)
 	_authenticate_server(conn, authkey)
-	conn.settimeout(10.0)  # Receiver thread will get socket.timeout after 10s of silence
-	return IpcConnection(conn)
-
-
-def connect_to_listener(address: Tuple[str, int], authkey: bytes) -> IpcConnection:
-	sock = socket.create_connection(address)
-	_send_all(sock, authkey)
-	sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
-	return IpcConnection(sock)
+	return _wrap(conn)
 
 
 def _authenticate_server(sock: socket.socket, authkey: bytes) -> None:
+	sock.settimeout(RECV_TIMEOUT)
 	data = _recv_exact(sock, len(authkey))
 	if data != authkey:
 		sock.close()
 		raise ConnectionError("authentication failed")
-	sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
 
 
 def _recv_exact(sock: socket.socket, length: int) -> bytes:
@@ -90,7 +317,3 @@ def _recv_exact(sock: socket.socket, length: int) -> bytes:
 		chunks.append(chunk)
 		remaining -= len(chunk)
 	return b"".join(chunks)
-
-
-def _send_all(sock: socket.socket, data: bytes) -> None:
-	sock.sendall(data)
@@ -0,0 +1,159 @@
+"""SHA-256 file manifests for the add-on, used to update only what changed.
+
+The build writes ``eloquence-files.json`` into the add-on root, listing every
+file of the release with its size and SHA-256.  The updater compares it with
+the same listing of the installed add-on to find the files that were added,
+changed or removed.  Installed files are hashed at most once per change:
+hashes are cached next to the manifest together with each file's size and
+modification time.
+
+No NVDA modules are imported, so SConstruct can use this module too.
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import hashlib
+import json
+import os
+import zipfile
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+MANIFEST_FILE = "eloquence-files.json"
+HASH_CACHE_FILE = "eloquence-files.cache.json"
+MANIFEST_FORMAT = 1
+# Generated at run time or by the build; never part of a release listing.
+EXCLUDE = (
+	MANIFEST_FILE,
+	HASH_CACHE_FILE,
+	"*/__pycache__/*",
+	"*.pyc",
+	"synthDrivers/bestfit/*",
+	"synthDrivers/temp_update/*",
+	"synthDrivers/eloquence-host.log",
+)
+_READ_SIZE = 1024 * 1024
+
+Manifest = Dict[str, Dict[str, object]]
+
+
+class ManifestDiff(NamedTuple):
+	added: List[str]
+	modified: List[str]
+	deleted: List[str]
+	unchanged: List[str]
+
+
+def is_excluded(path: str, exclude: Iterable[str] = EXCLUDE) -> bool:
+	return any(fnmatch.fnmatch(path, pattern) or fnmatch.fnmatch("/" + path, pattern) for pattern in exclude)
+
+
+def hash_stream(f) -> str:
+	digest = hashlib.sha256()
+	for block in iter(lambda: f.read(_READ_SIZE), b""):
+		digest.update(block)
+	return digest.hexdigest()
+
+
+def hash_file(path: str) -> str:
+	with open(path, "rb") as f:
+		return hash_stream(f)
+
+
+def _walk(root: str, exclude: Iterable[str]):
+	for folder, dirs, files in os.walk(root):
+		dirs.sort()
+		for name in sorted(files):
+			full_path = os.path.join(folder, name)
+			rel_path = os.path.relpath(full_path, root).replace(os.sep, "/")
+			if not is_excluded(rel_path, exclude):
+				yield rel_path, full_path
+
+
+def build_manifest(root: str, exclude: Iterable[str] = EXCLUDE) -> Manifest:
+	"""Hash every file under *root*; keys are ``/``-separated paths relative to it."""
+	return {
+		rel_path: {"sha256": hash_file(full_path), "size": os.path.getsize(full_path)}
+		for rel_path, full_path in _walk(root, exclude)
+	}
+
+
+def write_manifest(root: str, path: Optional[str] = None) -> Manifest:
+	"""Write the manifest of *root* to *path* (default: MANIFEST_FILE in *root*)."""
+	files = build_manifest(root)
+	with open(path or os.path.join(root, MANIFEST_FILE), "w", encoding="utf-8") as f:
+		json.dump({"format": MANIFEST_FORMAT, "algorithm": "sha256", "files": files}, f, indent=1)
+	return files
+
+
+def _parse(data: dict) -> Optional[Manifest]:
+	if data.get("format") != MANIFEST_FORMAT or data.get("algorithm") != "sha256":
+		return None
+	return data.get("files")
+
+
+def installed_manifest(root: str, exclude: Iterable[str] = EXCLUDE) -> Manifest:
+	"""Manifest of the add-on installed at *root*, rehashing only files whose size or mtime changed."""
+	cache_path = os.path.join(root, HASH_CACHE_FILE)
+	try:
+		with open(cache_path, "r", encoding="utf-8") as f:
+			cache = json.load(f)
+	except (OSError, ValueError):
+		cache = {}
+	files: Manifest = {}
+	fresh = {}
+	for rel_path, full_path in _walk(root, exclude):
+		st = os.stat(full_path)
+		cached = cache.get(rel_path)
+		if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+			digest = cached[2]
+		else:
+			digest = hash_file(full_path)
+		fresh[rel_path] = [st.st_size, st.st_mtime_ns, digest]
+		files[rel_path] = {"sha256": digest, "size": st.st_size}
+	if fresh != cache:
+		try:
+			with open(cache_path, "w", encoding="utf-8") as f:
+				json.dump(fresh, f)
+		except OSError:
+			pass
+	return files
+
+
+def zip_manifest(zf: zipfile.ZipFile, prefix: str = "", exclude: Iterable[str] = EXCLUDE) -> Manifest:
+	"""Manifest of the add-on in *zf* under *prefix*.
+
+	Uses the MANIFEST_FILE shipped in the archive when there is one, and
+	otherwise hashes the members as they are read, without extracting them.
+	"""
+	try:
+		shipped = _parse(json.loads(zf.read(prefix + MANIFEST_FILE)))
+	except (KeyError, ValueError):
+		shipped = None
+	if shipped is not None:
+		return shipped
+	files: Manifest = {}
+	for info in zf.infolist():
+		if info.is_dir() or not info.filename.startswith(prefix):
+			continue
+		rel_path = info.filename[len(prefix) :]
+		if is_excluded(rel_path, exclude):
+			continue
+		with zf.open(info) as f:
+			files[rel_path] = {"sha256": hash_stream(f), "size": info.file_size}
+	return files
+
+
+def diff(installed: Manifest, release: Manifest) -> ManifestDiff:
+	"""Compare two manifests by content hash."""
+	added, modified, unchanged = [], [], []
+	for path, entry in sorted(release.items()):
+		current = installed.get(path)
+		if current is None:
+			added.append(path)
+		elif current["sha256"] != entry["sha256"]:
+			modified.append(path)
+		else:
+			unchanged.append(path)
+	deleted = sorted(path for path in installed if path not in release)
+	return ManifestDiff(added, modified, deleted, unchanged)
@@ -0,0 +1,299 @@
+"""Learn crash and hang triggers from helper failures.
+
+When the watchdog replaces a helper that died or hung while rendering, the
+text it had been given is passed to :func:`report_failure`.  A background
+thread replays that text against a sacrificial helper of its own, shrinks it
+to a minimal trigger by delta debugging and looks for a rewrite of the
+trigger the engine survives.  Learned rules are kept in NVDA's configuration
+directory and applied by ``_text_preprocessing.preprocess`` after the
+built-in fixes, so the same line does not take the helper down again.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import globalVars
+
+from . import _eloquence
+from . import _text_preprocessing
+
+LOGGER = logging.getLogger(__name__)
+
+QUARANTINE_FILE = "eloquenceQuarantine.json"
+RULES_VERSION = 1
+# Replays spent shrinking one failure; every one that crashes costs a relaunch.
+MAX_TESTS = 150
+# Seconds a replay may take before it counts as a hang.
+REPLAY_TIMEOUT = 3.0
+# Minimal triggers longer than this are too specific to be worth a rule.
+MAX_TRIGGER_CHARS = 80
+# Separate triggers looked for in one failed input.
+MAX_RULES_PER_FAILURE = 3
+
+_rules: List[Dict[str, Any]] = []
+_rules_lock = threading.Lock()
+_loaded = False
+_seen: set = set()
+_failures: "queue.Queue[tuple]" = queue.Queue()
+_worker: Optional[threading.Thread] = None
+_worker_lock = threading.Lock()
+
+
+class _SacrificialClient(_eloquence.EloquenceHostClient):
+	"""Host client that drops audio and index events; only survival matters."""
+
+	def _handle_event(self, event: str, payload: Dict[str, Any]) -> None:
+		pass
+
+
+class SacrificialHost:
+	"""A helper of its own that replays text and reports whether the engine survives it."""
+
+	def __init__(self, voice_id: int, lang: str, encoding: str):
+		self._voice_id = voice_id
+		self._lang = lang
+		self._encoding = encoding
+		self._client: Optional[_SacrificialClient] = None
+		self.replays = 0
+
+	def fails(self, text: str) -> bool:
+		"""Render *text*; True if the helper crashed or hung doing so."""
+		self.replays += 1
+		client = self._ensure_started()
+		try:
+			client.send_command("addText", text=text.encode(self._encoding, errors="replace"), wait=False)
+			client.send_command("synthesize", timeout=REPLAY_TIMEOUT)
+		except RuntimeError:
+			self._discard()
+			return True
+		return False
+
+	def close(self) -> None:
+		client, self._client = self._client, None
+		if client is not None:
+			client.shutdown()
+
+	def _ensure_started(self) -> _SacrificialClient:
+		if self._client is not None:
+			return self._client
+		client = _SacrificialClient()
+		client.ensure_started()
+		payload = _eloquence.initialize_payload()
+		payload.update(language=self._lang, audioWindowBytes=0, generation=0, eciDeadlineMs=0)
+		try:
+			client.send_command("initialize", **payload)
+			client.send_command("setParam", paramId=9, value=self._voice_id)
+		except RuntimeError:
+			client._abandon_host()
+			raise
+		self._client = client
+		return client
+
+	def _discard(self) -> None:
+		client, self._client = self._client, None
+		if client is not None:
+			client._abandon_host()
+
+
+def minimize(text: str, fails: Callable[[str], bool], max_tests: int = MAX_TESTS) -> str:
+	"""Shrink *text* to a substring-free minimum for which *fails* still holds.
+
+	Delta debugging over characters: try each chunk, then each complement,
+	at growing granularity.  Stops early once *max_tests* replays are spent.
+	"""
+	tests = 0
+	granularity = 2
+	while len(text) >= 2 and tests < max_tests:
+		size = -(-len(text) // granularity)
+		chunks = [text[i : i + size] for i in range(0, len(text), size)]
+		candidates = chunks + ["".join(chunks[:i] + chunks[i + 1 :]) for i in range(len(chunks))]
+		for number, candidate in enumerate(candidates):
+			if tests >= max_tests:
+				return text
+			tests += 1
+			if candidate.strip() and fails(candidate):
+				text = candidate
+				granularity = 2 if number < len(chunks) else max(granularity - 1, 2)
+				break
+		else:
+			if granularity >= len(text):
+				break
+			granularity = min(len(text), granularity * 2)
+	return text
+
+
+def trigger_pattern(trigger: str) -> str:
+	r"""Regex matching *trigger* literally, but with any run of whitespace for its spaces."""
+	return r"\s+".join(re.escape(part) for part in trigger.split())
+
+
+def neutralize(trigger: str, fails: Callable[[str], bool]) -> Optional[str]:
+	"""Return a rewrite of *trigger* the engine renders safely, if one is found."""
+	middle = len(trigger) // 2
+	for replacement in (trigger[:middle] + " " + trigger[middle:], " ".join(trigger.replace(" ", "")), " "):
+		if not fails(replacement):
+			return replacement
+	return None
+
+
+def learn(voice_id: int, lang: str, inputs: Sequence[bytes], reason: str) -> List[Dict[str, Any]]:
+	"""Find rules that make the failed *inputs* safe; empty if it cannot be reproduced or contained.
+
+	An input can hold more than one trigger, so after each rule the rewritten
+	input is replayed again, up to MAX_RULES_PER_FAILURE times.
+	"""
+	encoding = _eloquence.text_encoding(lang)
+	text = b"".join(inputs).decode(encoding, errors="replace")
+	host = SacrificialHost(voice_id, lang, encoding)
+	started = time.perf_counter()
+	learned: List[Dict[str, Any]] = []
+	try:
+		for _attempt in range(MAX_RULES_PER_FAILURE):
+			if not host.fails(text):
+				break
+			trigger = minimize(text, host.fails).strip()
+			if not trigger or "`" in trigger or len(trigger) > MAX_TRIGGER_CHARS:
+				LOGGER.warning(
+					"Eloquence failure (%s) has no usable trigger: %r", reason, trigger[:MAX_TRIGGER_CHARS]
+				)
+				break
+			replacement = neutralize(trigger, host.fails)
+			if replacement is None:
+				LOGGER.warning("Eloquence failure trigger %r could not be neutralized", trigger)
+				break
+			pattern = trigger_pattern(trigger)
+			learned.append(
+				{
+					"voice": voice_id,
+					"pattern": pattern,
+					"replacement": replacement,
+					"reason": reason,
+					"learned": time.strftime("%Y-%m-%dT%H:%M:%S"),
+				}
+			)
+			text = re.sub(pattern, lambda _match: replacement, text)
+	finally:
+		host.close()
+	if learned:
+		LOGGER.info(
+			"Learned %d Eloquence trigger(s) after %d replays in %.1f s",
+			len(learned),
+			host.replays,
+			time.perf_counter() - started,
+		)
+	else:
+		LOGGER.info("Nothing learned from Eloquence failure (%s)", reason)
+	return learned
+
+
+def report_failure(voice_id: int, lang: str, inputs: Sequence[bytes], reason: str) -> None:
+	"""Queue the text a failed helper was rendering for offline analysis."""
+	key = (voice_id, b"".join(inputs))
+	if key in _seen:
+		return
+	_seen.add(key)
+	_failures.put((voice_id, lang, list(inputs), reason))
+	_ensure_worker()
+
+
+def rules() -> List[Dict[str, Any]]:
+	with _rules_lock:
+		return list(_rules)
+
+
+def load() -> None:
+	"""Read the learned rules once and hand them to the preprocessor."""
+	global _loaded
+	with _rules_lock:
+		if _loaded:
+			return
+		_loaded = True
+		path = _rules_path()
+		if path is None or not os.path.exists(path):
+			return
+		try:
+			with open(path, "r", encoding="utf-8") as f:
+				data = json.load(f)
+		except (OSError, ValueError):
+			LOGGER.exception("Failed to read %s", path)
+			return
+		if data.get("version") != RULES_VERSION:
+			return
+		_rules[:] = data.get("rules", [])
+		_apply()
+
+
+def forget() -> None:
+	"""Drop every learned rule."""
+	with _rules_lock:
+		_rules.clear()
+		_apply()
+		_save()
+
+
+def _add_rule(rule: Dict[str, Any]) -> None:
+	with _rules_lock:
+		if any(r["voice"] == rule["voice"] and r["pattern"] == rule["pattern"] for r in _rules):
+			return
+		_rules.append(rule)
+		_apply()
+		_save()
+
+
+def _apply() -> None:
+	fixes: Dict[int, Dict[re.Pattern, str]] = {}
+	for rule in _rules:
+		try:
+			pattern = re.compile(rule["pattern"])
+		except (KeyError, re.error):
+			LOGGER.warning("Skipping invalid learned rule %r", rule)
+			continue
+		# Replacements are literal text; keep re.sub from reading escapes in them.
+		fixes.setdefault(rule["voice"], {})[pattern] = rule["replacement"].replace("\\", "\\\\")
+	_text_preprocessing.set_learned_fixes(fixes)
+
+
+def _save() -> None:
+	path = _rules_path()
+	if path is None:
+		return
+	try:
+		with open(path, "w", encoding="utf-8") as f:
+			json.dump({"version": RULES_VERSION, "rules": _rules}, f, indent=1)
+	except OSError:
+		LOGGER.exception("Failed to write %s", path)
+
+
+def _rules_path() -> Optional[str]:
+	# Nothing is written to disk in secure mode; rules then last for the session.
+	if globalVars.appArgs.secure:
+		return None
+	return os.path.join(globalVars.appArgs.configPath, QUARANTINE_FILE)
+
+
+def _ensure_worker() -> None:
+	global _worker
+	with _worker_lock:
+		if _worker and _worker.is_alive():
+			return
+		_worker = threading.Thread(target=_worker_loop, name="EloquenceQuarantine", daemon=True)
+		_worker.start()
+
+
+def _worker_loop() -> None:
+	while True:
+		voice_id, lang, inputs, reason = _failures.get()
+		try:
+			for rule in learn(voice_id, lang, inputs, reason):
+				_add_rule(rule)
+		except Exception:
+			LOGGER.exception("Failed to analyse Eloquence failure")
+		_failures.task_done()
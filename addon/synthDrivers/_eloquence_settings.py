@@ -0,0 +1,522 @@
+"""Eloquence category of NVDA's settings dialog.
+
+Kept apart from the synth driver so that enumerating and loading synths does
+not pay for the GUI, the dictionary downloader or the updater.
+"""
+
+import ctypes
+import logging
+import os
+import winsound
+
+import addonHandler
+import config
+import globalVars
+import gui
+import wx
+
+from . import _eloquence
+
+addonHandler.initTranslation()
+
+log = logging.getLogger(__name__)
+
+ADDON_DIR = os.path.abspath(os.path.dirname(__file__))
+UPDATE_CHECK_FILE = "eloquenceUpdateCheck.json"
+
+
+def _import_updater():
+	# Imported on first use; it pulls in the download and manifest helpers.
+	from . import _eloquence_updater
+
+	return _eloquence_updater
+
+
+def _update_check_path():
+	return os.path.join(globalVars.appArgs.configPath, UPDATE_CHECK_FILE)
+
+
+def start_update_check():
+	"""Start the periodic add-on update check if ``update_check_hours`` in ``[eloquence]`` is set.
+
+	Returns the running check, or None when it is off.
+	"""
+	value = config.conf.get("eloquence", {}).get("update_check_hours", 0)
+	try:
+		hours = float(value)
+	except (TypeError, ValueError):
+		log.warning(f"Ignoring invalid eloquence.update_check_hours {value!r}")
+		return None
+	if hours <= 0 or globalVars.appArgs.secure:
+		return None
+	updater = _import_updater()
+	check = updater.PeriodicUpdateCheck(
+		updater.EloquenceUpdateManager(ADDON_DIR, state_path=_update_check_path()),
+		# Unauthenticated GitHub clients get 60 requests an hour; stay well below that.
+		max(hours, 1) * 3600,
+		on_update=lambda version, changelog: wx.CallAfter(_announce_update, version),
+	)
+	check.start()
+	return check
+
+
+def _announce_update(version):
+	import ui
+
+	ui.message(
+		# Translators: Reported when the background check finds a new version of the add-on
+		_(
+			"Eloquence {version} is available. "
+			"Use Check for Add-on Updates in the Eloquence settings to install it."
+		).format(version=version)
+	)
+
+
+class EloquenceSettingsPanel(gui.settingsDialogs.SettingsPanel):
+	# Translators: Name of the category for this add-on in the settings dialog
+	title = _("Eloquence")
+
+	def makeSettings(self, settings):
+		try:
+			sHelper = gui.guiHelper.BoxSizerHelper(self, sizer=settings)
+
+			self.dictionarySources = {
+				"https://github.com/mohamed00/AltIBMTTSDictionaries": "Alternative IBM TTS Dictionaries",
+				"https://github.com/eigencrow/IBMTTSDictionaries": "IBM TTS Dictionaries",
+			}
+
+			self.dictionaryChoice = sHelper.addLabeledControl(
+				# Translators: Label of a combobox in the Eloquence category of the settings dialog
+				_("Dictionary:"),
+				wx.Choice,
+				choices=list(self.dictionarySources.values()),
+			)
+			self.dictionaryChoice.SetStringSelection(
+				config.conf.get("eloquence", {}).get("dictionary_name", "Alternative IBM TTS Dictionaries")
+			)
+
+			self.updateButton = sHelper.addItem(wx.Button(self, label=_("Check for updates")))
+			self.Bind(wx.EVT_BUTTON, self.onUpdate, self.updateButton)
+			# When NVDA is running in secure mode, one should not be able to save any setting to disk.
+			if globalVars.appArgs.secure:
+				self.updateButton.Disable()
+
+			# Tool to automate copying eloquence_host32.exe for 64-bit NVDA secure screens
+			self.copyHelperButton = sHelper.addItem(
+				# Translators: Label of a button in the Eloquence category of the settings dialog
+				wx.Button(self, label=_("Copy Helper to System Config (for Logon Screen)"))
+			)
+			self.Bind(wx.EVT_BUTTON, self.onCopyHelper, self.copyHelperButton)
+			# Copying helper from secure mode is not allowed, following "Use NVDA during sign-in" button behaviour in
+			# NVDA's General settings category.
+			if globalVars.appArgs.secure:
+				self.copyHelperButton.Disable()
+
+			# NEW: Auto-update addon button
+			# Translators: Label of a button in the Eloquence category of the settings dialog
+			self.addonUpdateButton = sHelper.addItem(wx.Button(self, label=_("Check for Add-on Updates")))
+			self.Bind(wx.EVT_BUTTON, self.onCheckAddonUpdate, self.addonUpdateButton)
+			# Add-on updates are not allowed in secure mode.
+			if globalVars.appArgs.secure:
+				self.addonUpdateButton.Disable()
+		except Exception as e:
+			log.error(f"Error creating Eloquence settings panel: {e}")
+			# Panel creation failed, but don't crash - synth will still work
+
+	def onCopyHelper(self, evt):
+		"""Copies eloquence_host32.exe with UAC elevation support and definitive feedback."""
+		source_file = os.path.normpath(os.path.join(os.path.dirname(__file__), "eloquence_host32.exe"))
+		# --onedir builds ship the helper as a folder rather than a single exe.
+		source_onedir = os.path.normpath(os.path.join(os.path.dirname(__file__), "eloquence_host32"))
+		is_onedir = os.path.isdir(source_onedir)
+		if is_onedir:
+			source_file = source_onedir
+		prog_files = os.environ.get("ProgramFiles", "C:\\Program Files")
+		target_addon_dir = os.path.normpath(
+			os.path.join(prog_files, "NVDA", "systemConfig", "addons", "Eloquence")
+		)
+
+		# Security check: Ensure the target addon directory exists in systemConfig
+		if not os.path.isdir(target_addon_dir):
+			wx.MessageBox(
+				_(
+					# Translators: Text of a message dialog when copying the helper to system config
+					"Eloquence folder not found in systemConfig.\n\nPlease go to NVDA Settings > General and click 'Use currently saved settings during sign-in' first to initialize folders."
+				),
+				# Translators: Title of a message dialog when copying the helper to system config
+				_("Folder Missing"),
+				wx.OK | wx.ICON_WARNING,
+			)
+			return
+
+		dest_dir = os.path.normpath(os.path.join(target_addon_dir, "synthDrivers"))
+		dest_file = os.path.normpath(
+			os.path.join(dest_dir, "eloquence_host32" if is_onedir else "eloquence_host32.exe")
+		)
+
+		if not os.path.exists(source_file):
+			wx.MessageBox(
+				# Translators: Text of a message dialog when copying the helper to system config
+				_("Source file not found at:\n{source_file}").format(source_file=source_file),
+				# Translators: Title of a message dialog when copying the helper to system config
+				_("Error"),
+				wx.OK | wx.ICON_ERROR,
+			)
+			return
+
+		# Prepare elevated command: ensure subdirectory exists and copy the helper
+		if is_onedir:
+			cmd_params = f'/c mkdir "{dest_dir}" 2>nul & xcopy /e /i /y /q "{source_file}" "{dest_file}"'
+		else:
+			cmd_params = f'/c mkdir "{dest_dir}" 2>nul & copy /y "{source_file}" "{dest_file}"'
+
+		try:
+			# Triggering UAC Elevation using ShellExecuteW's "runas" verb
+			ret = ctypes.windll.shell32.ShellExecuteW(None, "runas", "cmd.exe", cmd_params, None, 0)
+
+			if ret > 32:
+				# Play Windows Asterisk sound for confirmation of successful launch
+				winsound.MessageBeep(winsound.MB_ICONASTERISK)
+				wx.MessageBox(
+					_(
+						# Translators: text of a message dialog when copying the helper to system config
+						"Successfully copied eloquence_host32.exe to systemConfig!\n\nEloquence should now load normally on logon screen, start-up, and other secure screens."
+					),
+					# Translators: Title of a message dialog when copying the helper to system config
+					_("Success"),
+					wx.OK | wx.ICON_INFORMATION,
+				)
+			elif ret == 5:
+				# SE_ERR_ACCESSDENIED: Elevation prompt was declined
+				wx.MessageBox(
+					# Translators: Text of a message dialog when copying the helper to system config
+					_("Copy process was cancelled or permission was denied by the user."),
+					# Translators: Title of a message dialog when copying the helper to system config
+					_("Cancelled"),
+					wx.OK | wx.ICON_ERROR,
+				)
+			else:
+				wx.MessageBox(
+					# Translators: Text of a message dialog when copying the helper to system config
+					_("An error occurred while attempting to copy the file. (Error Code: {ret})").format(
+						ret=ret
+					),
+					# Translators: Title of a message dialog when copying the helper to system config
+					_("Error"),
+					wx.OK | wx.ICON_ERROR,
+				)
+		except Exception as e:
+			wx.MessageBox(
+				# Translators: Text of a message dialog when copying the helper to system config
+				_("An unexpected error occurred: {e}").format(e=str(e)),
+				# Translators: Title of a message dialog when copying the helper to system config
+				_("Error"),
+				wx.OK | wx.ICON_ERROR,
+			)
+
+	def onCheckAddonUpdate(self, evt):
+		"""Check for and apply addon updates from GitHub.
+
+		Checking, downloading and applying run on background tasks; only the
+		dialogs run here, so NVDA keeps responding and speaking meanwhile.
+		"""
+		# Check if updater exists
+		if not os.path.exists(os.path.join(ADDON_DIR, "_eloquence_updater.py")):
+			wx.MessageBox(
+				# Translators: Text of a message dialog when updating the add-on
+				_("Update manager not found. Please reinstall the add-on."),
+				# Translators: Title of a message dialog when updating the add-on
+				_("Error"),
+				wx.OK | wx.ICON_ERROR,
+			)
+			return
+
+		try:
+			updater = _import_updater()
+		except ImportError as e:
+			wx.MessageBox(
+				# Translators: Text of a message dialog when updating the add-on
+				_("Failed to load update manager: {e}").format(e=e),
+				# Translators: Title of a message dialog when updating the add-on
+				_("Error"),
+				wx.OK | wx.ICON_ERROR,
+			)
+			return
+
+		manager = updater.EloquenceUpdateManager(ADDON_DIR, state_path=_update_check_path())
+		self.addonUpdateButton.Disable()
+
+		def check(task):
+			# Translators: Message of a progress dialog when updating the add-on
+			task.progress(10, _("Checking for updates..."))
+			return manager.check_for_updates()
+
+		self._runUpdateTask(
+			updater,
+			check,
+			# Translators: Title of a progress dialog when updating the add-on
+			_("Checking for Updates"),
+			# Translators: Message of a progress dialog when updating the add-on
+			_("Connecting to GitHub..."),
+			lambda result: self._offerUpdate(updater, manager, *result),
+		)
+
+	def _runUpdateTask(self, updater, work, title, message, on_success, can_abort=True):
+		"""Run *work* on an UpdateTask behind a progress dialog, then *on_success(value)* here."""
+		progress = wx.ProgressDialog(
+			title,
+			message,
+			maximum=100,
+			parent=self,
+			style=(wx.PD_CAN_ABORT if can_abort else 0) | wx.PD_AUTO_HIDE,
+		)
+
+		# The settings dialog, and the progress dialog with it, may be closed mid-task.
+		def show_progress(percent, message):
+			if task.cancelled or not progress:
+				task.cancel()
+				return
+			cont, _skip = progress.Update(percent, message)
+			if not cont:
+				task.cancel()
+
+		def done(result):
+			if progress:
+				progress.Destroy()
+			if not self:
+				# The settings dialog was closed; the update ends with this step.
+				return
+			if result.error is not None:
+				self._finishAddonUpdate()
+				wx.MessageBox(
+					_(
+						# Translators: Text of a message dialog when updating the add-on
+						"Update failed: {e}\n\nYour addon has not been modified."
+					).format(e=str(result.error)),
+					# Translators: Title of a message dialog when updating the add-on
+					_("Update Failed"),
+					wx.OK | wx.ICON_ERROR,
+				)
+			elif result.cancelled:
+				self._finishAddonUpdate()
+				wx.MessageBox(
+					# Translators: Text of a message dialog when updating the add-on
+					_("Update cancelled."),
+					# Translators: Text of a message dialog when updating the add-on
+					_("Cancelled"),
+					wx.OK | wx.ICON_INFORMATION,
+				)
+			else:
+				on_success(result.value)
+
+		task = updater.UpdateTask(
+			work,
+			on_progress=lambda *args: wx.CallAfter(show_progress, *args),
+			on_done=lambda result: wx.CallAfter(done, result),
+		)
+		task.start()
+
+	def _finishAddonUpdate(self):
+		self.addonUpdateButton.Enable()
+
+	def _offerUpdate(self, updater, manager, has_update, latest_version, download_url, changelog):
+		if not has_update:
+			self._finishAddonUpdate()
+			wx.MessageBox(
+				# Translators: Text of a message dialog when updating the add-on
+				_("You are using the latest version!"),
+				# Translators: Title of a message dialog when updating the add-on
+				_("Up to Date"),
+				wx.OK | wx.ICON_INFORMATION,
+			)
+			return
+
+		changelog_dialog = wx.MessageDialog(
+			self,
+			_(
+				# Translators: Text of a message dialog when updating the add-on
+				"New version available: {latest_version}\n\n"
+				"Current version: {currVersion}\n\n"
+				"Changelog:\n{changelog}\n\n"
+				"Would you like to download and review the update?"
+			).format(
+				latest_version=latest_version,
+				currVersion=manager.CURRENT_VERSION,
+				changelog=changelog[:500],
+			),
+			# Translators: Title of a message dialog when updating the add-on
+			_("Update Available"),
+			wx.YES_NO | wx.ICON_INFORMATION,
+		)
+		answer = changelog_dialog.ShowModal()
+		changelog_dialog.Destroy()
+		if answer != wx.ID_YES:
+			self._finishAddonUpdate()
+			return
+
+		def prepare(task):
+			return manager.prepare_update(download_url, task.progress, cancelled=lambda: task.cancelled)
+
+		self._runUpdateTask(
+			updater,
+			prepare,
+			# Translators: Title of a progress dialog when updating the add-on
+			_("Downloading Update"),
+			# Translators: Message of a progress dialog when updating the add-on
+			_("Downloading..."),
+			lambda changes: self._reviewUpdate(updater, manager, latest_version, changes),
+		)
+
+	def _reviewUpdate(self, updater, manager, latest_version, changes):
+		# Show update dialog with detailed changes
+		apply_update, decisions = updater.show_update_dialog(self, changes, latest_version)
+
+		if not apply_update:
+			manager.cleanup()
+			self._finishAddonUpdate()
+			wx.MessageBox(
+				# Translators: Text of a message dialog when updating the add-on
+				_("Update cancelled."),
+				# Translators: Text of a message dialog when updating the add-on
+				_("Cancelled"),
+				wx.OK | wx.ICON_INFORMATION,
+			)
+			return
+
+		def apply(task):
+			manager.smart_merge(changes, decisions, task.progress)
+			manager.cleanup()
+
+		def applied(value):
+			self._finishAddonUpdate()
+			# Success!
+			wx.MessageBox(
+				_(
+					# Translators: Text of a message dialog when updating the add-on
+					"Update to {latest_version} applied successfully!\n\n"
+					"Please restart NVDA for changes to take effect."
+				).format(latest_version=latest_version),
+				# Translators: Title of a message dialog when updating the add-on
+				_("Update Successful"),
+				wx.OK | wx.ICON_INFORMATION,
+			)
+
+		# Files are swapped all or nothing, so applying is not interrupted once it started.
+		self._runUpdateTask(
+			updater,
+			apply,
+			# Translators: Text of a progress dialog when updating the add-on
+			_("Applying Update"),
+			# Translators: Text of a progress dialog when updating the add-on
+			_("Please wait..."),
+			applied,
+			can_abort=False,
+		)
+
+	def onSave(self):
+		if "eloquence" not in config.conf:
+			config.conf["eloquence"] = {}
+		selection = self.dictionaryChoice.GetStringSelection()
+		for url, name in self.dictionarySources.items():
+			if name == selection:
+				config.conf["eloquence"]["dictionary_name"] = name
+				config.conf["eloquence"]["dictionary_url"] = url
+				break
+
+	def onUpdate(self, evt):
+		from . import _eloquence_dictsync as dictsync
+
+		self.onSave()
+		dictionary_url = config.conf.get("eloquence", {}).get("dictionary_url")
+		if not dictionary_url:
+			wx.MessageBox(
+				# Translators: Text of a message dialog when updating a dictionary
+				_("Please select a dictionary first."),
+				# Translators: Title of a message dialog when updating a dictionary
+				_("Error"),
+				wx.OK | wx.ICON_ERROR,
+			)
+			return
+
+		stage_messages = {
+			# Translators: Message of a progress dialog when updating a dictionary
+			dictsync.STAGE_CHECKING: _("Checking for dictionary changes..."),
+			# Translators: Message of a progress dialog when updating a dictionary;
+			# {detail} is the amount downloaded so far
+			dictsync.STAGE_DOWNLOADING: _("Downloading dictionaries ({detail})..."),
+			# Translators: Message of a progress dialog when updating a dictionary; {detail} is a file name
+			dictsync.STAGE_MERGING: _("Merging {detail}..."),
+		}
+		progress = wx.ProgressDialog(
+			# Translators: Title of a progress dialog when updating a dictionary
+			_("Updating Dictionaries"),
+			stage_messages[dictsync.STAGE_CHECKING],
+			maximum=100,
+			parent=self,
+			style=wx.PD_CAN_ABORT | wx.PD_AUTO_HIDE,
+		)
+		self.updateButton.Disable()
+
+		# The settings dialog, and the progress dialog with it, may be closed mid-sync.
+		def show_progress(percent, stage, detail):
+			if sync.cancelled or not progress:
+				sync.cancel()
+				return
+			cont, _skip = progress.Update(percent, stage_messages[stage].format(detail=detail))
+			if not cont:
+				sync.cancel()
+
+		def done(result):
+			if progress:
+				progress.Destroy()
+			if self:
+				self.updateButton.Enable()
+			self._showDictionaryResult(result)
+
+		sync = dictsync.DictionarySync(
+			dictionary_url,
+			os.path.join(os.path.abspath(os.path.dirname(__file__)), "eloquence"),
+			on_progress=lambda *args: wx.CallAfter(show_progress, *args),
+			on_done=lambda result: wx.CallAfter(done, result),
+			after_merge=_eloquence.reload_dictionaries,
+		)
+		sync.start()
+
+	def _showDictionaryResult(self, result):
+		if result.error is not None:
+			wx.MessageBox(
+				# Translators: Text of a message dialog when updating a dictionary
+				_("An error occurred while updating the dictionary: {e}").format(e=result.error),
+				# Translators: Title of a message dialog when updating a dictionary
+				_("Error"),
+				wx.OK | wx.ICON_ERROR,
+			)
+		elif result.cancelled:
+			wx.MessageBox(
+				# Translators: Text of a message dialog when updating a dictionary
+				_("Dictionary update cancelled."),
+				# Translators: Title of a message dialog when updating a dictionary
+				_("Cancelled"),
+				wx.OK | wx.ICON_INFORMATION,
+			)
+		elif result.updates > 0:
+			wx.MessageBox(
+				_(
+					# Translators: Text of a message dialog when updating a dictionary
+					"Dictionary update successful!\n\n"
+					"• Total updates: {updates_count}\n"
+					"• Dictionary files: {new_files}\n\n"
+					"Note: CP1252 encoding enforced; some accents may have been stripped for compatibility."
+				).format(updates_count=result.updates, new_files=result.files),
+				# Translators: Title of a message dialog when updating a dictionary
+				_("Success"),
+				wx.OK | wx.ICON_INFORMATION,
+			)
+		else:
+			wx.MessageBox(
+				# Translators: Text of a message dialog when updating a dictionary
+				_("No new updates found. Your dictionaries are already up to date."),
+				# Translators: Title of a message dialog when updating a dictionary
+				_("Eloquence"),
+				wx.OK | wx.ICON_INFORMATION,
+			)
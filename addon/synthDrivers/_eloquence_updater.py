@@ -1,5 +1,9 @@
 import os
+import hashlib
 import json
+import threading
+import time
+import urllib.error
 import urllib.request
 import zipfile
 import shutil
@@ -7,11 +11,141 @@ import logging
 import wx
 import re
 import addonHandler
+from typing import NamedTuple, Optional
+
+from . import _eloquence_download
+from . import _eloquence_manifest
 
 addonHandler.initTranslation()
 
 log = logging.getLogger(__name__)
 
+TIMEOUT = 30
+# How long to back off when GitHub refuses a request without saying for how long.
+RATE_LIMIT_WAIT = 15 * 60
+
+
+class UpdateCancelled(Exception):
+	pass
+
+
+class UpdateRateLimited(Exception):
+	"""GitHub's API rate limit is exhausted and no earlier result is cached."""
+
+	def __init__(self, retry_at):
+		super().__init__(f"GitHub rate limit reached; retry after {time.ctime(retry_at)}")
+		self.retry_at = retry_at
+
+
+class TaskResult(NamedTuple):
+	value: object = None
+	cancelled: bool = False
+	error: Optional[Exception] = None
+
+
+class UpdateTask(threading.Thread):
+	"""Runs one step of the update pipeline off the GUI thread.
+
+	*work(task)* does the step and returns its result; it reports through
+	:meth:`progress`, which returns False once the task was cancelled.
+	*on_progress(percent, message)* and *on_done(result)* are called on this
+	thread; a GUI wraps them with ``wx.CallAfter``.
+	"""
+
+	def __init__(self, work, on_progress, on_done):
+		super().__init__(name="EloquenceUpdate", daemon=True)
+		self._work = work
+		self._on_progress = on_progress
+		self._on_done = on_done
+		self._cancelled = threading.Event()
+
+	def cancel(self):
+		self._cancelled.set()
+
+	@property
+	def cancelled(self):
+		return self._cancelled.is_set()
+
+	def progress(self, percent, message):
+		if not self.cancelled:
+			self._on_progress(percent, message)
+		return not self.cancelled
+
+	def run(self):
+		try:
+			result = TaskResult(self._work(self))
+		except (UpdateCancelled, _eloquence_download.DownloadCancelled):
+			result = TaskResult(cancelled=True)
+		except Exception as e:
+			log.error(f"Update step failed: {e}")
+			result = TaskResult(error=e)
+		self._on_done(result)
+
+
+class PeriodicUpdateCheck(threading.Thread):
+	"""Checks for a newer release every *interval* seconds in the background.
+
+	*on_update(latest_version, changelog)* is called on this thread, once per
+	version.  The manager's cached result is used while it is younger than
+	*interval*, so restarting NVDA does not mean another request.
+	"""
+
+	# Seconds to wait after start-up before the first check.
+	FIRST_CHECK_DELAY = 60
+
+	def __init__(self, manager, interval, on_update):
+		super().__init__(name="EloquenceUpdateCheck", daemon=True)
+		self.manager = manager
+		self.interval = interval
+		self._on_update = on_update
+		self._stop_event = threading.Event()
+
+	def stop(self):
+		self._stop_event.set()
+
+	def run(self):
+		delay = self.FIRST_CHECK_DELAY
+		while not self._stop_event.wait(delay):
+			delay = self.interval
+			try:
+				has_update, latest_version, download_url, changelog = self.manager.check_for_updates(
+					max_age=self.interval
+				)
+			except UpdateRateLimited as e:
+				delay = min(max(e.retry_at - time.time(), self.FIRST_CHECK_DELAY), self.interval)
+				continue
+			except Exception as e:
+				log.debug(f"Background update check failed: {e}")
+				continue
+			if has_update and self.manager.mark_announced(latest_version):
+				self._on_update(latest_version, changelog)
+
+
+def _retry_at(headers, now):
+	"""When GitHub takes requests again, or None if *headers* do not hold them back."""
+	retry_after = headers.get("Retry-After")
+	if retry_after and retry_after.isdigit():
+		return now + int(retry_after)
+	if headers.get("X-RateLimit-Remaining") == "0":
+		try:
+			return float(headers.get("X-RateLimit-Reset"))
+		except (TypeError, ValueError):
+			return now + RATE_LIMIT_WAIT
+	return None
+
+
+def _trim_release(data):
+	"""The parts of a GitHub release that the updater reads, for the check cache."""
+	return {
+		"tag_name": data.get("tag_name"),
+		"body": data.get("body"),
+		"zipball_url": data.get("zipball_url"),
+		"assets": [
+			{key: asset.get(key) for key in ("name", "browser_download_url", "digest")}
+			for asset in data.get("assets", [])
+		],
+	}
+
 
 class UpdateChangesDialog(wx.Dialog):
 	def __init__(self, parent, changes, latest_version):
@@ -94,10 +228,26 @@ class EloquenceUpdateManager:
 	REPO_OWNER = "fastfinge"
 	REPO_NAME = "eloquence_64"
 
-	def __init__(self, addon_dir):
+	# Local files an update leaves alone, as paths relative to the add-on root.
+	PRESERVE = ("synthDrivers/eloquence/ECI.INI", "synthDrivers/eloquence/*.dic")
+	# Local files that are never deleted even though a release does not ship them.
+	KEEP_LOCAL = ("synthDrivers/eloquence/*", ".git/*", ".venv/*")
+
+	def __init__(self, addon_dir, state_path=None):
 		self.addon_dir = os.path.abspath(addon_dir)
+		self.root_dir = os.path.dirname(self.addon_dir)
 		self.temp_dir = os.path.join(self.addon_dir, "temp_update")
-		self.extract_dir = os.path.join(self.temp_dir, "extracted")
+		self.staging_dir = os.path.join(self.temp_dir, "staged")
+		self.backup_dir = os.path.join(self.temp_dir, "backup")
+		self.journal_path = os.path.join(self.temp_dir, "journal.json")
+		self.release_manifest = {}
+		self.update_zip = None
+		self.download_sha256 = None
+		self.update_prefix = ""
+		# Cache of the last release check; kept in memory only when there is no path.
+		self.state_path = state_path
+		self._check_state = None
+		self.recover()
 		self.CURRENT_VERSION = self._get_current_version()
 
 	def _get_current_version(self):
@@ -114,41 +264,122 @@ class EloquenceUpdateManager:
 			log.error(f"Error reading manifest: {e}")
 		return "0.0.0"
 
-	def check_for_updates(self):
+	def check_for_updates(self, max_age=0):
 		"""
 		Checks GitHub for the latest release.
 		Returns (has_update, latest_version, download_url, changelog)
+
+		The release is cached: no request is made within *max_age* seconds of
+		the last one, later requests are conditional on its ETag, and while
+		GitHub's rate limit is exhausted the cached release is used instead
+		(UpdateRateLimited is raised if there is none).
 		"""
+		state = self._load_check_state()
+		release = state.get("release")
+		now = time.time()
+		if release is not None and now - state.get("checked", 0) < max_age:
+			return self._parse_release(release)
+		retry_at = state.get("retryAt", 0)
+		if now < retry_at:
+			if release is not None:
+				return self._parse_release(release)
+			raise UpdateRateLimited(retry_at)
+
 		api_url = f"https://api.github.com/repos/{self.REPO_OWNER}/{self.REPO_NAME}/releases/latest"
+		headers = {"User-Agent": "NVDA-Eloquence-Updater", "Accept": "application/vnd.github+json"}
+		if release is not None and state.get("etag"):
+			headers["If-None-Match"] = state["etag"]
 		try:
-			headers = {"User-Agent": "NVDA-Eloquence-Updater"}
 			req = urllib.request.Request(api_url, headers=headers)
-			with urllib.request.urlopen(req) as response:
-				data = json.loads(response.read().decode())
-
-			latest_version = data.get("tag_name", "0.0.0").lstrip("v")
-			download_url = None
-
-			# Look for .nvda-addon or .zip in assets
-			assets = data.get("assets", [])
-			for asset in assets:
-				if asset["name"].endswith(".nvda-addon"):
-					download_url = asset["browser_download_url"]
-					break
-
-			# If no assets, use the source zip
-			if not download_url:
-				download_url = data.get("zipball_url")
-
-			changelog = data.get("body", "No changelog provided.")
-
-			has_update = self._is_newer(latest_version, self.CURRENT_VERSION)
-			return has_update, latest_version, download_url, changelog
-
+			with urllib.request.urlopen(req, timeout=TIMEOUT) as response:
+				release = _trim_release(json.loads(response.read().decode()))
+				state["etag"] = response.headers.get("ETag")
+				retry_at = _retry_at(response.headers, now)
+		except urllib.error.HTTPError as e:
+			retry_at = _retry_at(e.headers, now)
+			if e.code == 429 and retry_at is None:
+				retry_at = now + RATE_LIMIT_WAIT
+			if e.code == 304 and release is not None:
+				pass
+			elif e.code in (403, 429) and retry_at is not None:
+				log.warning(f"GitHub rate limit reached; next update check after {time.ctime(retry_at)}")
+				state["retryAt"] = retry_at
+				self._save_check_state(state)
+				if release is not None:
+					return self._parse_release(release)
+				raise UpdateRateLimited(retry_at) from e
+			else:
+				log.error(f"Error checking for updates: {e}")
+				raise
 		except Exception as e:
 			log.error(f"Error checking for updates: {e}")
 			raise
 
+		state.update(release=release, checked=now)
+		if retry_at is not None:
+			state["retryAt"] = retry_at
+		else:
+			state.pop("retryAt", None)
+		self._save_check_state(state)
+		return self._parse_release(release)
+
+	def _parse_release(self, data):
+		latest_version = (data.get("tag_name") or "0.0.0").lstrip("v")
+		download_url = None
+
+		# Look for .nvda-addon or .zip in assets
+		assets = data.get("assets", [])
+		self.download_sha256 = None
+		for asset in assets:
+			if asset["name"].endswith(".nvda-addon"):
+				download_url = asset["browser_download_url"]
+				# Published as "sha256:<hex>"; missing on older releases.
+				digest = asset.get("digest") or ""
+				if digest.startswith("sha256:"):
+					self.download_sha256 = digest[len("sha256:") :]
+				break
+
+		# If no assets, use the source zip
+		if not download_url:
+			download_url = data.get("zipball_url")
+
+		changelog = data.get("body") or "No changelog provided."
+
+		has_update = self._is_newer(latest_version, self.CURRENT_VERSION)
+		return has_update, latest_version, download_url, changelog
+
+	def _load_check_state(self):
+		if self._check_state is None:
+			self._check_state = {}
+			if self.state_path is not None:
+				try:
+					with open(self.state_path, "r", encoding="utf-8") as f:
+						self._check_state = json.load(f)
+				except (OSError, ValueError):
+					pass
+		return self._check_state
+
+	def _save_check_state(self, state):
+		self._check_state = state
+		if self.state_path is None:
+			return
+		tmp_path = self.state_path + ".tmp"
+		try:
+			with open(tmp_path, "w", encoding="utf-8") as f:
+				json.dump(state, f)
+			os.replace(tmp_path, self.state_path)
+		except OSError as e:
+			log.error(f"Could not save the update check cache: {e}")
+
+	def mark_announced(self, version):
+		"""Records that the user was told about *version*; False if they already were."""
+		state = self._load_check_state()
+		if state.get("announced") == version:
+			return False
+		state["announced"] = version
+		self._save_check_state(state)
+		return True
+
 	def _is_newer(self, latest, current):
 		# Simple version comparison
 		# Handles date-based versions like 0.20250420.01
@@ -160,185 +391,195 @@ class EloquenceUpdateManager:
 		except Exception:
 			return latest != current
 
-	def download_update(self, download_url, progress_callback):
-		"""Downloads the update and returns the path to the zip file"""
-		if not os.path.exists(self.temp_dir):
-			os.makedirs(self.temp_dir)
+	def download_update(self, download_url, progress_callback, cancelled=None):
+		"""Downloads the update and returns the path to the zip file.
+
+		The file is kept in the download cache: an interrupted download resumes
+		where it stopped, and one already fetched is not fetched again.  It is
+		checked against the SHA-256 GitHub publishes for the release asset.
+		*cancelled()* is polled between reads as well as *progress_callback*.
+		"""
+		stopped = []
 
-		zip_path = os.path.join(self.temp_dir, "update.zip")
+		def progress(received, total):
+			if total > 0:
+				percent = int(received * 100 / total)
+				# Translators: Text in the progress dialog used during add-on update.
+				message = _("Downloading update... {percent}%").format(percent=percent)
+				if not progress_callback(percent, message):
+					stopped.append(True)
 
 		try:
-			headers = {"User-Agent": "NVDA-Eloquence-Updater"}
-			req = urllib.request.Request(download_url, headers=headers)
-			with urllib.request.urlopen(req) as response:
-				total_size = int(response.info().get("Content-Length", 0))
-				downloaded = 0
-				block_size = 8192
-
-				with open(zip_path, "wb") as f:
-					while True:
-						buffer = response.read(block_size)
-						if not buffer:
-							break
-						downloaded += len(buffer)
-						f.write(buffer)
-						if total_size > 0:
-							percent = int(downloaded * 100 / total_size)
-							# Translators: Text in the progress dialog used during add-on update.
-							if not progress_callback(
-								percent, _("Downloading update... {percent}%").format(percent=percent)
-							):
-								raise Exception("Download cancelled by user")
-			return zip_path
+			result = _eloquence_download.download(
+				download_url,
+				sha256=self.download_sha256,
+				progress=progress,
+				cancelled=lambda: bool(stopped) or (cancelled is not None and cancelled()),
+				headers={"User-Agent": "NVDA-Eloquence-Updater"},
+			)
+			return result.path
+		except _eloquence_download.DownloadCancelled:
+			raise UpdateCancelled("Download cancelled by user")
 		except Exception as e:
 			log.error(f"Error downloading update: {e}")
 			raise
 
 	def extract_update(self, zip_path, progress_callback):
-		"""Extracts the zip file to a temporary directory"""
-		if os.path.exists(self.extract_dir):
-			shutil.rmtree(self.extract_dir)
-		os.makedirs(self.extract_dir)
+		"""Reads the file manifest of the downloaded update.
 
+		Nothing is written to disk yet: the manifest shipped in the archive is
+		used when present, otherwise its members are hashed as they are read.
+		Files are only unpacked by smart_merge, and only those that changed.
+		"""
+		# Translators: Text in the progress dialog used during add-on update.
+		if not progress_callback(0, _("Reading update contents...")):
+			raise UpdateCancelled("Extraction cancelled by user")
 		try:
 			with zipfile.ZipFile(zip_path, "r") as zip_ref:
-				files = zip_ref.namelist()
-				total_files = len(files)
-				for i, file in enumerate(files):
-					zip_ref.extract(file, self.extract_dir)
-					percent = int((i + 1) * 100 / total_files)
-					# Translators: Text in the progress dialog used during add-on update.
-					if not progress_callback(percent, _("Extracting... {percent}%").format(percent=percent)):
-						raise Exception("Extraction cancelled by user")
-
-			# If it's a GitHub zipball, it extracts into a subfolder
-			contents = os.listdir(self.extract_dir)
-			if len(contents) == 1 and os.path.isdir(os.path.join(self.extract_dir, contents[0])):
-				# Move everything up one level
-				subfolder = os.path.join(self.extract_dir, contents[0])
-				for item in os.listdir(subfolder):
-					dest = os.path.join(self.extract_dir, item)
-					if os.path.exists(dest):
-						if os.path.isdir(dest):
-							shutil.rmtree(dest)
-						else:
-							os.remove(dest)
-					shutil.move(os.path.join(subfolder, item), self.extract_dir)
-				os.rmdir(subfolder)
-
+				names = [name for name in zip_ref.namelist() if not name.endswith("/")]
+				# A GitHub zipball keeps everything in one top-level folder.
+				top = {name.split("/", 1)[0] for name in names}
+				prefix = top.pop() + "/" if len(top) == 1 and all("/" in name for name in names) else ""
+				self.release_manifest = _eloquence_manifest.zip_manifest(zip_ref, prefix)
+			self.update_zip = zip_path
+			self.update_prefix = prefix
 		except Exception as e:
 			log.error(f"Error extracting update: {e}")
 			raise
+		# Translators: Text in the progress dialog used during add-on update.
+		progress_callback(100, _("Extracting... {percent}%").format(percent=100))
 
 	def analyze_changes(self, progress_callback):
 		"""
-		Analyzes differences between current install and update.
-		Returns a dictionary of changes.
+		Compares the installed files with the update by content hash.
+		Returns a dictionary of changes; files that are identical are left out.
 		"""
+		installed = _eloquence_manifest.installed_manifest(self.root_dir)
+		diff = _eloquence_manifest.diff(installed, self.release_manifest)
 		changes = {
 			"added": [],
 			"modified": [],
 			"deleted": [],
 			"preserved": [],  # Files we want to keep as is
+			"unchanged": diff.unchanged,
 		}
-
-		# Files to always preserve (don't overwrite if exist)
-		preserve_list = ["ECI.INI", "synthDrivers\\eloquence\\"]  # Custom dictionaries
-
-		# Walk through the update files
-		for root, dirs, files in os.walk(self.extract_dir):
-			rel_path = os.path.relpath(root, self.extract_dir)
-			if rel_path == ".":
-				rel_path = ""
-
-			for file in files:
-				file_rel_path = os.path.join(rel_path, file)
-				current_path = os.path.join(self.addon_dir, "../", file_rel_path)
-
-				# Check if it should be preserved
-				is_preserved = False
-				for p in preserve_list:
-					if file_rel_path.startswith(p):
-						is_preserved = True
-						break
-
-				if is_preserved and os.path.exists(current_path):
-					changes["preserved"].append(file_rel_path)
-					continue
-
-				if not os.path.exists(current_path):
-					changes["added"].append(file_rel_path)
-				else:
-					changes["modified"].append(file_rel_path)
-
-		# Check for deleted files
-		exclude_from_deletion = [".git", "temp_update", ".venv", "__pycache__", "eloquence"]
-		for root, dirs, files in os.walk(self.addon_dir):
-			rel_path = os.path.relpath(root, self.addon_dir)
-			if rel_path == ".":
-				rel_path = ""
-
-			if any(rel_path.startswith(e) for e in exclude_from_deletion):
+		for path in diff.added:
+			changes["added"].append(path)
+		for path in diff.modified:
+			changes["preserved" if self._is_preserved(path) else "modified"].append(path)
+		for path in diff.deleted:
+			if self._is_preserved(path) or _eloquence_manifest.is_excluded(path, self.KEEP_LOCAL):
 				continue
-
-			for file in files:
-				file_rel_path = os.path.join(rel_path, file)
-				if any(file_rel_path.startswith(e) for e in exclude_from_deletion):
-					continue
-
-				update_path = os.path.join(self.extract_dir, file_rel_path)
-				if not os.path.exists(update_path):
-					# Check if it's in preserve list
-					is_preserved = False
-					for p in preserve_list:
-						if file_rel_path.startswith(p):
-							is_preserved = True
-							break
-					if not is_preserved:
-						changes["deleted"].append(file_rel_path)
+			changes["deleted"].append(path)
 
 		# Translators: Text in the progress dialog used during add-on update.
 		progress_callback(100, _("Analysis complete"))
 		return changes
 
+	def prepare_update(self, download_url, progress_callback, cancelled=None):
+		"""Downloads and reads the update, then returns the changes it makes (see analyze_changes)."""
+		zip_path = self.download_update(download_url, progress_callback, cancelled)
+		self.extract_update(zip_path, progress_callback)
+		return self.analyze_changes(progress_callback)
+
+	def _is_preserved(self, path):
+		return _eloquence_manifest.is_excluded(path.lower(), [p.lower() for p in self.PRESERVE])
+
 	def smart_merge(self, changes, decisions, merge_progress):
-		"""Applies the changes based on user decisions"""
+		"""Applies the changes based on user decisions, all or nothing.
+
+		Changed files are first unpacked into a staging folder and checked
+		against the release manifest.  They are then swapped in one by one,
+		with every file they replace or delete moved to a backup folder on
+		the same drive.  If any step fails, the backups are moved back and
+		the add-on is left as it was.
+		"""
 		total_steps = len(decisions)
 		if total_steps == 0:
 			# Translators: Text in the progress dialog used during add-on update.
 			merge_progress(100, _("No changes to apply"))
 			return
 
-		for i, (file_rel_path, action) in enumerate(decisions.items()):
-			src = os.path.join(self.extract_dir, file_rel_path)
-			dst = os.path.join(self.addon_dir, "../", file_rel_path)
-
-			percent = int((i + 1) * 100 / total_steps)
-			# Translators: Text in the progress dialog used during add-on update.
-			merge_progress(percent, _("Applying: {path}").format(path=file_rel_path))
-
-			try:
+		# Stage: unpack and verify every file before touching the install.
+		if os.path.exists(self.staging_dir):
+			shutil.rmtree(self.staging_dir)
+		os.makedirs(self.temp_dir, exist_ok=True)
+		with zipfile.ZipFile(self.update_zip, "r") as zip_ref:
+			for i, (file_rel_path, action) in enumerate(decisions.items()):
+				if action not in ("update", "add"):
+					continue
+				percent = int((i + 1) * 50 / total_steps)
+				# Translators: Text in the progress dialog used during add-on update.
+				merge_progress(percent, _("Preparing: {path}").format(path=file_rel_path))
+				staged = os.path.join(self.staging_dir, file_rel_path)
+				os.makedirs(os.path.dirname(staged), exist_ok=True)
+				digest = hashlib.sha256()
+				with zip_ref.open(self.update_prefix + file_rel_path) as src, open(staged, "wb") as dst:
+					for block in iter(lambda: src.read(1024 * 1024), b""):
+						digest.update(block)
+						dst.write(block)
+				if digest.hexdigest() != self.release_manifest[file_rel_path]["sha256"]:
+					raise Exception(f"{file_rel_path} does not match the update manifest")
+
+		# Swap: move each replaced or deleted file to the backup, then the staged file in.
+		journal = []
+		try:
+			for i, (file_rel_path, action) in enumerate(decisions.items()):
+				percent = 50 + int((i + 1) * 50 / total_steps)
+				# Translators: Text in the progress dialog used during add-on update.
+				merge_progress(percent, _("Applying: {path}").format(path=file_rel_path))
+				dst = os.path.join(self.root_dir, file_rel_path)
+				backup = os.path.join(self.backup_dir, file_rel_path)
+				had_original = os.path.exists(dst)
+				journal.append([file_rel_path, had_original])
+				self._write_journal(journal)
+				if had_original:
+					os.makedirs(os.path.dirname(backup), exist_ok=True)
+					os.replace(dst, backup)
 				if action in ("update", "add"):
-					if os.path.isdir(src):
-						if not os.path.exists(dst):
-							os.makedirs(dst)
-					else:
-						dst_dir = os.path.dirname(dst)
-						if not os.path.exists(dst_dir):
-							os.makedirs(dst_dir)
-						shutil.copy2(src, dst)
-				elif action == "delete":
-					if os.path.exists(dst):
-						if os.path.isdir(dst):
-							shutil.rmtree(dst)
-						else:
-							os.remove(dst)
-			except Exception as e:
-				log.error(f"Error applying change to {file_rel_path}: {e}")
+					os.makedirs(os.path.dirname(dst), exist_ok=True)
+					os.replace(os.path.join(self.staging_dir, file_rel_path), dst)
+		except Exception as e:
+			log.error(f"Error applying update, rolling back: {e}")
+			self._rollback(journal)
+			raise
+		os.remove(self.journal_path)
 
 		# Translators: Text in the progress dialog used during add-on update.
 		merge_progress(100, _("Update complete"))
 
+	def _write_journal(self, journal):
+		tmp_path = self.journal_path + ".tmp"
+		with open(tmp_path, "w", encoding="utf-8") as f:
+			json.dump(journal, f)
+		os.replace(tmp_path, self.journal_path)
+
+	def _rollback(self, journal):
+		for file_rel_path, had_original in reversed(journal):
+			dst = os.path.join(self.root_dir, file_rel_path)
+			backup = os.path.join(self.backup_dir, file_rel_path)
+			try:
+				if had_original:
+					if os.path.exists(backup):
+						os.replace(backup, dst)
+				elif os.path.exists(dst):
+					os.remove(dst)
+			except OSError as e:
+				log.error(f"Could not restore {file_rel_path}: {e}")
+		if os.path.exists(self.journal_path):
+			os.remove(self.journal_path)
+
+	def recover(self):
+		"""Rolls back an update that was interrupted while its files were being swapped."""
+		try:
+			with open(self.journal_path, "r", encoding="utf-8") as f:
+				journal = json.load(f)
+		except (OSError, ValueError):
+			return False
+		log.warning(f"Rolling back an interrupted add-on update ({len(journal)} files)")
+		self._rollback(journal)
+		return True
+
 	def cleanup(self):
 		"""Removes temporary files"""
 		if os.path.exists(self.temp_dir):
@@ -0,0 +1,345 @@
+"""User pronunciation substitutions applied before text reaches Eloquence.
+
+Entries are plain strings, not regexes, so any number of them can be matched
+in one left-to-right pass with an Aho-Corasick automaton.  Edits take effect
+on the next lookup without rebuilding the whole automaton.
+
+The lists are tab-separated files in NVDA's configuration directory:
+``eloquencePronunciation.tsv`` applies to every voice and
+``eloquencePronunciation.<lang>.tsv`` (``enu``, ``deu``, ...) to one language.
+Each line holds ``text<TAB>replacement`` and optionally a third column of
+flags: ``c`` to match case exactly, ``p`` to match inside words as well.
+Lines starting with ``#`` are comments.  Files are re-read as soon as they
+change on disk, without restarting the synthesizer.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+PRONUNCIATION_FILE = "eloquencePronunciation.tsv"
+# Seconds between checks of the files' modification times.
+RELOAD_CHECK_INTERVAL = 0.5
+
+
+class Entry(NamedTuple):
+	text: str
+	replacement: str
+	case_sensitive: bool = False
+	whole_word: bool = True
+
+
+def _fold(text: str) -> str:
+	"""Lower-case *text* without changing its length, so match offsets carry over."""
+	folded = text.lower()
+	if len(folded) == len(text):
+		return folded
+	return "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+def _is_word_char(char: str) -> bool:
+	return char.isalnum() or char == "_"
+
+
+class _Automaton:
+	"""Aho-Corasick automaton over a fixed set of case-folded entry texts.
+
+	Removing or replacing an entry only edits the entry lists at its node,
+	so the links stay valid; adding a new text needs a new automaton.
+	"""
+
+	def __init__(self, entries: Iterable[Entry]):
+		self._goto: List[Dict[str, int]] = [{}]
+		self._terminal: Dict[int, List[Entry]] = {}
+		self.size = 0
+		for entry in entries:
+			self._terminal.setdefault(self._insert(_fold(entry.text)), []).append(entry)
+			self.size += 1
+		self._link()
+
+	def _insert(self, key: str) -> int:
+		node = 0
+		goto = self._goto
+		for char in key:
+			child = goto[node].get(char)
+			if child is None:
+				child = len(goto)
+				goto[node][char] = child
+				goto.append({})
+			node = child
+		return node
+
+	def _link(self) -> None:
+		"""Compute failure and output links breadth first."""
+		goto, terminal = self._goto, self._terminal
+		self._fail = fail = [0] * len(goto)
+		# Nearest node on the failure chain that ends an entry (0 for none).
+		self._output = output = [0] * len(goto)
+		pending = deque(goto[0].values())
+		while pending:
+			node = pending.popleft()
+			for char, child in goto[node].items():
+				state = fail[node]
+				while state and char not in goto[state]:
+					state = fail[state]
+				target = goto[state].get(char, 0)
+				fail[child] = target
+				output[child] = target if target in terminal else output[target]
+				pending.append(child)
+
+	def entries_at(self, text: str) -> Optional[List[Entry]]:
+		"""The entry list of the node for *text*, if this automaton has one."""
+		node = 0
+		for char in _fold(text):
+			node = self._goto[node].get(char)
+			if node is None:
+				return None
+		return self._terminal.get(node)
+
+	def scan(self, text: str, matches: List[Tuple[int, int, int, str]]) -> None:
+		"""Append ``(start, end, rank, replacement)`` for every acceptable match in *text*."""
+		goto, fail, output, terminal = self._goto, self._fail, self._output, self._terminal
+		length = len(text)
+		node = 0
+		for end, char in enumerate(_fold(text), 1):
+			while node and char not in goto[node]:
+				node = fail[node]
+			node = goto[node].get(char, 0)
+			hit = node if node in terminal else output[node]
+			while hit:
+				for entry in terminal[hit]:
+					start = end - len(entry.text)
+					if entry.case_sensitive and text[start:end] != entry.text:
+						continue
+					if entry.whole_word and (
+						(start > 0 and _is_word_char(text[start - 1]) and _is_word_char(text[start]))
+						or (end < length and _is_word_char(text[end]) and _is_word_char(text[end - 1]))
+					):
+						continue
+					# A case-sensitive entry wins over a case-insensitive one for the same span.
+					matches.append((start, end, not entry.case_sensitive, entry.replacement))
+				hit = output[hit]
+
+
+class SubstitutionTable:
+	"""Whole-word (or partial) string substitutions matched with Aho-Corasick automata.
+
+	Matching runs on case-folded text; case-sensitive entries are checked
+	against the original text when they match.  Overlapping matches are
+	resolved leftmost first, then longest.
+
+	Texts added since the last full build go into a small second automaton,
+	rebuilt on the next lookup, so an edit costs time in proportion to the
+	recent additions rather than to the whole table.  Once that grows past
+	DELTA_LIMIT (or an eighth of the table) everything is rebuilt into one.
+	"""
+
+	DELTA_LIMIT = 256
+
+	def __init__(self, entries: Iterable[Entry] = ()):
+		self._lock = threading.Lock()
+		self._entries: Dict[Tuple[str, bool], Entry] = {}
+		for entry in entries:
+			self._entries[_entry_key(entry)] = entry
+		self._main = _Automaton(self._entries.values())
+		self._added: Dict[Tuple[str, bool], Entry] = {}
+		self._delta: Optional[_Automaton] = None
+		self._delta_stale = False
+
+	def __len__(self) -> int:
+		return len(self._entries)
+
+	def entries(self) -> List[Entry]:
+		with self._lock:
+			return list(self._entries.values())
+
+	def set(self, entry: Entry) -> None:
+		"""Add *entry*, or replace the entry for the same text and case sensitivity."""
+		if not entry.text:
+			raise ValueError("Empty pronunciation entry")
+		key = _entry_key(entry)
+		with self._lock:
+			old = self._entries.get(key)
+			self._entries[key] = entry
+			if old is not None and key not in self._added:
+				bucket = self._main.entries_at(old.text)
+				bucket[bucket.index(old)] = entry
+				return
+			self._added[key] = entry
+			self._delta_stale = True
+			if len(self._added) > max(self.DELTA_LIMIT, self._main.size // 8):
+				self._rebuild()
+
+	def remove(self, text: str, case_sensitive: bool = False) -> bool:
+		"""Drop the entry for *text*; False if there was none."""
+		key = (text if case_sensitive else _fold(text), case_sensitive)
+		with self._lock:
+			entry = self._entries.pop(key, None)
+			if entry is None:
+				return False
+			if self._added.pop(key, None) is not None:
+				self._delta_stale = True
+			else:
+				self._main.entries_at(entry.text).remove(entry)
+				self._main.size -= 1
+			return True
+
+	def update(self, entries: Iterable[Entry]) -> None:
+		"""Make the table hold exactly *entries*, touching only what changed."""
+		wanted = {_entry_key(entry): entry for entry in entries}
+		with self._lock:
+			changed = sum(1 for key, entry in wanted.items() if self._entries.get(key) != entry)
+			if changed > max(self.DELTA_LIMIT, self._main.size // 8):
+				self._entries = wanted
+				self._rebuild()
+				return
+			current = list(self._entries.items())
+		for key, entry in current:
+			if key not in wanted:
+				self.remove(entry.text, entry.case_sensitive)
+		for key, entry in wanted.items():
+			if self._entries.get(key) != entry:
+				self.set(entry)
+
+	def substitute(self, text: str) -> str:
+		"""Return *text* with every matching entry replaced."""
+		if not self._entries or not text:
+			return text
+		matches: List[Tuple[int, int, int, str]] = []
+		with self._lock:
+			if self._delta_stale:
+				self._delta = _Automaton(self._added.values()) if self._added else None
+				self._delta_stale = False
+			self._main.scan(text, matches)
+			if self._delta is not None:
+				self._delta.scan(text, matches)
+		if not matches:
+			return text
+		matches.sort(key=lambda match: (match[0], -match[1], match[2]))
+		pieces = []
+		pos = 0
+		for start, end, _rank, replacement in matches:
+			if start < pos:
+				continue
+			pieces.append(text[pos:start])
+			pieces.append(replacement)
+			pos = end
+		pieces.append(text[pos:])
+		return "".join(pieces)
+
+	def _rebuild(self) -> None:
+		self._main = _Automaton(self._entries.values())
+		self._added.clear()
+		self._delta = None
+		self._delta_stale = False
+
+
+def _entry_key(entry: Entry) -> Tuple[str, bool]:
+	return (entry.text if entry.case_sensitive else _fold(entry.text), entry.case_sensitive)
+
+
+def parse_entries(lines: Iterable[str]) -> List[Entry]:
+	"""Read ``text<TAB>replacement[<TAB>flags]`` lines; malformed lines are skipped."""
+	entries = []
+	for number, line in enumerate(lines, 1):
+		line = line.rstrip("\r\n")
+		if not line.strip() or line.startswith("#"):
+			continue
+		fields = line.split("\t")
+		if len(fields) < 2 or not fields[0]:
+			LOGGER.warning("Ignoring malformed pronunciation line %d: %r", number, line)
+			continue
+		flags = fields[2] if len(fields) > 2 else ""
+		entries.append(Entry(fields[0], fields[1], "c" in flags, "p" not in flags))
+	return entries
+
+
+class _UserFiles:
+	"""The substitution table for one language, kept in step with its files on disk."""
+
+	def __init__(self, paths: List[str]):
+		self._paths = paths
+		self._lock = threading.Lock()
+		self._mtimes: Optional[Tuple[Optional[float], ...]] = None
+		self._checked = 0.0
+		self.table = SubstitutionTable()
+
+	def refresh(self) -> SubstitutionTable:
+		now = time.monotonic()
+		if self._mtimes is not None and now - self._checked < RELOAD_CHECK_INTERVAL:
+			return self.table
+		with self._lock:
+			self._checked = now
+			mtimes = tuple(_mtime(path) for path in self._paths)
+			if mtimes == self._mtimes:
+				return self.table
+			self._mtimes = mtimes
+			entries: List[Entry] = []
+			for path, mtime in zip(self._paths, mtimes):
+				if mtime is not None:
+					entries.extend(_read_entries(path))
+			started = time.perf_counter()
+			self.table.update(entries)
+			LOGGER.debug(
+				"Loaded %d pronunciation entries from %s in %.1f ms",
+				len(self.table),
+				", ".join(self._paths),
+				(time.perf_counter() - started) * 1000,
+			)
+		return self.table
+
+
+def _mtime(path: str) -> Optional[float]:
+	try:
+		return os.stat(path).st_mtime
+	except OSError:
+		return None
+
+
+def _read_entries(path: str) -> List[Entry]:
+	try:
+		with open(path, "r", encoding="utf-8-sig") as f:
+			return parse_entries(f)
+	except (OSError, UnicodeDecodeError):
+		LOGGER.exception("Failed to read %s", path)
+		return []
+
+
+_user_files: Dict[Optional[str], _UserFiles] = {}
+_config_dir: Optional[str] = None
+
+
+def set_config_dir(path: Optional[str]) -> None:
+	"""Read pronunciation files from *path* (NVDA's configuration directory); None disables them."""
+	global _config_dir
+	if path != _config_dir:
+		_config_dir = path
+		_user_files.clear()
+
+
+def file_paths(lang: Optional[str]) -> List[str]:
+	"""The files that make up the substitutions for *lang*, general one first."""
+	if _config_dir is None:
+		return []
+	base, ext = os.path.splitext(PRONUNCIATION_FILE)
+	paths = [os.path.join(_config_dir, PRONUNCIATION_FILE)]
+	if lang:
+		paths.append(os.path.join(_config_dir, f"{base}.{lang}{ext}"))
+	return paths
+
+
+def substitute(text: str, lang: Optional[str]) -> str:
+	"""Apply the user's substitutions for *lang* to *text*."""
+	if _config_dir is None:
+		return text
+	files = _user_files.get(lang)
+	if files is None:
+		files = _user_files.setdefault(lang, _UserFiles(file_paths(lang)))
+	return files.refresh().substitute(text)
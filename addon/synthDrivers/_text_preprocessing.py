@@ -1,117 +1,120 @@
 """Text preprocessing and crash prevention for Eloquence synthesis.
 
-Contains regex-based crash prevention patterns ported from the IBMTTS NVDA
-add-on and text normalization utilities.  Provides a single public entry
+Applies the regex-based crash prevention rule packs (many ported from the
+IBMTTS NVDA add-on) and text normalization.  Provides a single public entry
 point -- ``preprocess()`` -- that applies the appropriate fixes for a given
 Eloquence voice.
 """
 
+import codecs
+import collections
 import ctypes
+import functools
+import json
+import logging
+import os
 import re
+import threading
+import time
 import unicodedata
 
+LOGGER = logging.getLogger(__name__)
+
 # ---------------------------------------------------------------------------
-# Crash prevention dictionaries
+# Crash prevention rule packs
 # ---------------------------------------------------------------------------
-# Each dictionary maps a compiled regex to a replacement string.  _resub()
-# applies them in insertion order, which matters for the date parser pair.
-
-english_fixes = {
-	re.compile(r"(\w+)\.([a-zA-Z]+)"): r"\1 dot \2",
-	re.compile(r"([a-zA-Z0-9_]+)@(\w+)"): r"\1 at \2",
-	# Mc prefix split crash (covers McName and McDONALD)
-	re.compile(r"\b(Mc)\s+([A-Z][a-z]|[A-Z][A-Z]+)"): r"\1\2",
-	# Date parser bug: "03 Marble" misread as "march ble" (abbreviated first)
-	re.compile(
-		r"\b(\d+) (Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)"
-		r"([a-z]+)"
-	): r"\1  \2\3",
-	# Undo double-space for actual full month names
-	re.compile(
-		r"\b(\d+)  (January|February|March|April|May|June|July|August"
-		r"|September|October|November|December)\b"
-	): r"\1 \2",
-	# caesure / cæsure crash
-	re.compile(r"c(ae|\xe6)sur(e)?", re.I): r"seizur",
-	# h' + r/v + e crash
-	re.compile(r"\b(|\d+|\W+)h'(r|v)[e]", re.I): r"\1h \2e",
-	# Consonant cluster + hhes + word continuation (variant 1)
-	re.compile(
-		r"\b(\w+[bdfhjlmnqrvz])(h[he]s)([abcdefghjklmnopqrstvwy]\w+)\b",
-		re.I,
-	): r"\1 \2\3",
-	# Consonant cluster + hhes + "iron" (variant 2)
-	re.compile(r"\b(\w+[bdfhjlmnqrvz])(h[he]s)(iron+[degins]?)", re.I): r"\1 \2\3",
-	# Apostrophe + consonant + hhes + word (variant 3, from IBMTTS)
-	re.compile(
-		r"\b(\w+'{1,}[bcdfghjklmnpqrstvwxyz])'*(h+[he]s)"
-		r"([abcdefghijklmnopqrstvwy]\w+)\b",
-		re.I,
-	): r"\1 \2\3",
-	# Consonant + apostrophe + hhes + word (variant 4, from IBMTTS)
-	re.compile(
-		r"\b(\w+[bcdfghjklmnpqrstvwxyz])('{1,}h+[he]s)"
-		r"([abcdefghijklmnopqrstvwy]\w+)\b",
-		re.I,
-	): r"\1 \2\3",
-	# Time-like + ordinal suffix (e.g. "2:30th")
-	re.compile(r"(\d):(\d\d[snrt][tdh])", re.I): r"\1 \2",
-	# Multiple apostrophe consonant clusters
-	re.compile(
-		r"\b([bcdfghjklmnpqrstvwxz]+)'([bcdefghjklmnpqrstvwxz']+)"
-		r"'([drtv][aeiou]?)",
-		re.I,
-	): r"\1 \2 \3",
-	# "you're'd" contractions
-	re.compile(r"\b(you+)'(re)+'([drv]e?)", re.I): r"\1 \2 \3",
-	# recosp / uncosp etc.
-	re.compile(r"(re|un|non|anti)cosp", re.I): r"\1kosp",
-	# EUR codes + digits
-	re.compile(r"(EUR[A-Z]+)(\d+)", re.I): r"\1 \2",
-	# tzsche (multi-group version from IBMTTS)
-	re.compile(
-		r"\b(\d+|\W+)?(\w+_+)?(_+)?([bcdfghjklmnpqrstvwxz]+)?(\d+)?"
-		r"t+z[s]che",
-		re.I,
-	): r"\1 \2 \3 \4 \5 tz sche",
-	# juar + long suffix
-	re.compile(r"(juar)([a-z']{9,})", re.I): r"\1 \2",
-}
+# The fixes live in rulepacks/<name>.json, one pack per language, each rule
+# with the test vectors it was written for.  rulepacks/index.json lists the
+# packs applied to each voice id.  A pack is read and compiled the first time
+# a voice that uses it speaks, into a dict mapping each compiled regex to its
+# replacement string; _resub() applies them in file order, which matters for
+# the date parser pair.
 
-french_fixes = {
-	re.compile(r"([a-zA-Z0-9_]+)@(\w+)"): r"\1 arobase \2",
-	# "tranquille" crash: anquill -> anqill
-	re.compile(r"(?<=anq)uil(?=l)", re.I): r"i",
-	# "quil" at word boundary crash
-	re.compile(r"quil(?=\W)", re.I): r"kil",
-}
+RULE_PACK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rulepacks")
+RULE_PACK_FORMAT = 1
+_RULE_FLAGS = {"i": re.IGNORECASE, "m": re.MULTILINE, "s": re.DOTALL, "x": re.VERBOSE}
 
-spanish_fixes = {
-	re.compile(r"([a-zA-Z0-9_]+)@(\w+)"): r"\1 arroba \2",
-	# Euro/dollar amounts with thousands separators
-	re.compile(r"([\u20ac$]\d{1,3})((\s\d{3})+\.\d{2})"): r"\1 \2",
-	# Ordinal feminine marker after long numbers
-	re.compile(r"(\d{12,}[123679])(\xaa)"): r"\1 \2",
-}
 
-german_fixes = {
-	re.compile(r"dane-ben", re.I): r"dane- ben",
-	re.compile(r"dage-gen", re.I): r"dage- gen",
-	# Compound word crash: audio/video-en... (space, not `0 — backticks stripped)
-	re.compile(r"(audio|video)(-)(en[bcdfghjklmnpqrsvwxz][a-z]+)", re.I): r"\1 \3",
-	# Compound word crash: macro-en...
-	re.compile(r"(macro)(-)(en[a-z]+)", re.I): r"\1 \3",
-}
+def _read_pack_file(filename):
+	path = os.path.join(RULE_PACK_DIR, filename)
+	try:
+		with open(path, "r", encoding="utf-8") as f:
+			data = json.load(f)
+	except (OSError, ValueError):
+		LOGGER.exception("Failed to read rule pack file %s", path)
+		return None
+	if data.get("format") != RULE_PACK_FORMAT:
+		LOGGER.warning("Ignoring %s: unsupported rule pack format %r", path, data.get("format"))
+		return None
+	return data
+
+
+@functools.lru_cache(maxsize=None)
+def _rule_pack_index():
+	data = _read_pack_file("index.json") or {}
+	return {int(voice_id): tuple(names) for voice_id, names in data.get("voices", {}).items()}
+
+
+def _compile_rule(rule):
+	flags = 0
+	for flag in rule.get("flags", ""):
+		flags |= _RULE_FLAGS[flag]
+	return re.compile(rule["pattern"], flags), rule["replacement"]
+
+
+@functools.lru_cache(maxsize=None)
+def load_rule_pack(name):
+	"""Return rule pack *name* compiled to ``{regex: replacement}``, in file order.
+
+	Compiled once and kept for the session.  A missing or unreadable pack
+	yields no rules, and a rule that does not compile is skipped, so a bad
+	data file costs a fix rather than speech.
+	"""
+	data = _read_pack_file(name + ".json")
+	fixes = {}
+	for number, rule in enumerate(data.get("rules", []) if data else []):
+		try:
+			pattern, replacement = _compile_rule(rule)
+		except (KeyError, TypeError, re.error):
+			LOGGER.warning("Skipping invalid rule %d in rule pack %s", number, name, exc_info=True)
+			continue
+		fixes[pattern] = replacement
+	return fixes
+
+
+def verify_rule_pack(name):
+	"""Run the test vectors of rule pack *name*; return a description of each failure."""
+	data = _read_pack_file(name + ".json")
+	if data is None:
+		return [f"{name}: cannot be read"]
+	failures = []
+	for number, rule in enumerate(data.get("rules", [])):
+		try:
+			pattern, replacement = _compile_rule(rule)
+		except (KeyError, TypeError, re.error) as e:
+			failures.append(f"{name} #{number}: invalid rule: {e}")
+			continue
+		if not rule.get("tests"):
+			failures.append(f"{name} #{number}: no test vectors")
+		for test in rule.get("tests", []):
+			output = pattern.sub(replacement, test["input"])
+			if output != test["output"]:
+				failures.append(
+					f"{name} #{number}: {test['input']!r} gave {output!r}, expected {test['output']!r}"
+				)
+	return failures
+
+
+def reload_rule_packs():
+	"""Forget the compiled packs so the next use reads them from disk again."""
+	_rule_pack_index.cache_clear()
+	load_rule_pack.cache_clear()
+	_fix_tables.cache_clear()
+
 
 # ---------------------------------------------------------------------------
 # Voice ID constants (from _eloquence.langs)
 # ---------------------------------------------------------------------------
-_ENGLISH_IDS = (65536, 65537)  # enu, eng
-_SPANISH_IDS = (131072, 131073)  # esp, esm
-_FRENCH_IDS = (196608, 196609)  # fra, frc
-_GERMAN_IDS = (262144,)  # deu
-_CHINESE_ID = (393216,)  # chs
-_KOREAN_ID = (655360,)  # kor
 _ASIAN_IDS = (393216, 524288, 655360)  # chs, jpn, kor
 
 
@@ -149,36 +152,190 @@ def _wchar_to_mbcs(text, code_page=0):
 	return buf.raw
 
 
-def _normalize_text(s):
-	"""Normalize text to fit the active MBCS code page.
+# ---------------------------------------------------------------------------
+# Best-fit code page tables
+# ---------------------------------------------------------------------------
+# Windows' best-fit mapping (Đ→D, ł→l) is captured once per code page into a
+# str.translate table, so normalizing and encoding text is a pure-Python pass
+# instead of a WideCharToMultiByte call per string (or per character).
 
-	Uses Windows best-fit character mapping via ``WideCharToMultiByte`` so
-	that characters like Đ and ł are mapped to their closest equivalents
-	(D, l) instead of being replaced with ``?``.
+_BEST_FIT_VERSION = 1
+_BEST_FIT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bestfit")
+# Code page assumed when not running on Windows.
+_DEFAULT_CODE_PAGE = 1252
+
+
+def active_code_page():
+	"""Return the ANSI code page the engine's text is encoded in (``mbcs``)."""
+	try:
+		return ctypes.windll.kernel32.GetACP()
+	except AttributeError:
+		return _DEFAULT_CODE_PAGE
+
+
+class BestFitTable(dict):
+	"""``str.translate`` table mapping text onto what *code_page* can encode.
+
+	Holds the best-fit replacements computed up front; every other character
+	is resolved on first lookup, to itself if the code page can encode it and
+	to ``?`` otherwise, and then remembered.
 	"""
-	encoded = _wchar_to_mbcs(s)
-	if encoded is not None:
+
+	def __init__(self, code_page, encoding, best_fit):
+		super().__init__(best_fit)
+		self.code_page = code_page
+		self.encoding = encoding
+
+	def __missing__(self, codepoint):
+		try:
+			chr(codepoint).encode(self.encoding)
+			value = codepoint
+		except UnicodeEncodeError:
+			value = "?"
+		self[codepoint] = value
+		return value
+
+	def normalize(self, text):
+		"""Return *text* with every character the code page lacks mapped or replaced."""
+		try:
+			text.encode(self.encoding)
+			return text
+		except UnicodeEncodeError:
+			return text.translate(self)
+
+	def encode(self, text):
+		"""Encode *text* for the engine in one pass, applying best-fit mapping as needed."""
+		try:
+			return text.encode(self.encoding)
+		except UnicodeEncodeError:
+			return text.translate(self).encode(self.encoding, errors="replace")
+
+
+def _codec_for(code_page):
+	try:
+		return codecs.lookup(f"cp{code_page}").name
+	except LookupError:
+		return "mbcs" if os.name == "nt" else "latin-1"
+
+
+def _unencodable_chars(encoding):
+	"""Every BMP character outside ASCII that *encoding* cannot represent."""
+	chars = []
+	for codepoint in range(0x80, 0x10000):
+		if 0xD800 <= codepoint <= 0xDFFF:
+			continue
+		char = chr(codepoint)
+		try:
+			char.encode(encoding)
+		except UnicodeEncodeError:
+			chars.append(char)
+	return chars
+
+
+def _best_fit_windows(code_page, encoding, chars):
+	"""Ask Windows for the best fit of each of *chars*; characters left as ``?`` are dropped."""
+	result = {}
+	text = "".join(chars)
+	converted = _wchar_to_mbcs(text, code_page)
+	if converted is not None and len(converted) == len(chars):
+		# Single-byte code page: one output byte per input character.
+		pieces = [converted[i : i + 1] for i in range(len(chars))]
+	else:
+		pieces = [_wchar_to_mbcs(char, code_page) for char in chars]
+	for char, piece in zip(chars, pieces):
+		if not piece:
+			continue
 		try:
-			return encoded.decode("mbcs")
+			mapped = piece.decode(encoding)
 		except UnicodeDecodeError:
-			pass
-	# Fallback: per-character approach (should rarely trigger)
-	result = []
-	for c in s:
-		char_bytes = _wchar_to_mbcs(c)
-		if char_bytes is not None:
+			continue
+		if mapped != "?" and mapped != char:
+			result[ord(char)] = mapped
+	return result
+
+
+# Letters whose best fit is not reachable by dropping combining marks.
+_BEST_FIT_LETTERS = {
+	"\u0110": "D",  # Đ
+	"\u0111": "d",  # đ
+	"\u0126": "H",  # Ħ
+	"\u0127": "h",  # ħ
+	"\u0131": "i",  # ı
+	"\u0141": "L",  # Ł
+	"\u0142": "l",  # ł
+	"\u0166": "T",  # Ŧ
+	"\u0167": "t",  # ŧ
+	"\u0180": "b",  # ƀ
+}
+
+
+def _best_fit_accents(encoding, chars):
+	"""Best fit by dropping combining marks, used where WideCharToMultiByte is unavailable."""
+	result = {}
+	for char in chars:
+		stripped = _BEST_FIT_LETTERS.get(char) or _strip_accents(char)
+		if stripped and stripped != char:
 			try:
-				result.append(char_bytes.decode("mbcs"))
+				stripped.encode(encoding)
+			except UnicodeEncodeError:
 				continue
-			except UnicodeDecodeError:
-				pass
-		cc = _strip_accents(c)
-		try:
-			cc.encode("mbcs")
-		except UnicodeEncodeError:
-			cc = "?"
-		result.append(cc)
-	return "".join(result)
+			result[ord(char)] = stripped
+	return result
+
+
+def _load_best_fit(path, code_page):
+	try:
+		with open(path, "r", encoding="utf-8") as f:
+			data = json.load(f)
+	except (OSError, ValueError):
+		return None
+	if data.get("version") != _BEST_FIT_VERSION or data.get("codePage") != code_page:
+		return None
+	return {int(codepoint): mapped for codepoint, mapped in data["map"].items()}
+
+
+def _save_best_fit(path, code_page, source, best_fit):
+	data = {"version": _BEST_FIT_VERSION, "codePage": code_page, "source": source, "map": best_fit}
+	tmp_path = path + ".tmp"
+	try:
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		with open(tmp_path, "w", encoding="utf-8") as f:
+			json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+		os.replace(tmp_path, path)
+	except OSError:
+		# Read-only installs (e.g. the secure-screen copy) just rebuild it per session.
+		pass
+
+
+@functools.lru_cache(maxsize=None)
+def best_fit_table(code_page=None):
+	"""Return the :class:`BestFitTable` for *code_page* (default: the active one).
+
+	Built once per code page and cached on disk next to the add-on.
+	"""
+	if code_page is None:
+		code_page = active_code_page()
+	encoding = _codec_for(code_page)
+	path = os.path.join(_BEST_FIT_CACHE_DIR, f"cp{code_page}.json")
+	best_fit = _load_best_fit(path, code_page)
+	if best_fit is None:
+		chars = _unencodable_chars(encoding)
+		if hasattr(ctypes, "windll"):
+			source, best_fit = "WideCharToMultiByte", _best_fit_windows(code_page, encoding, chars)
+		else:
+			source, best_fit = "strip-accents", _best_fit_accents(encoding, chars)
+		_save_best_fit(path, code_page, source, best_fit)
+	return BestFitTable(code_page, encoding, best_fit)
+
+
+def _normalize_text(s):
+	"""Normalize text to fit the active MBCS code page.
+
+	Uses the Windows best-fit mapping captured in :func:`best_fit_table` so
+	that characters like Đ and ł are mapped to their closest equivalents
+	(D, l) and anything without one becomes ``?``.
+	"""
+	return best_fit_table().normalize(s)
 
 
 def _resub(dct, s):
@@ -188,21 +345,252 @@ def _resub(dct, s):
 	return s
 
 
+# Crash and hang triggers learned from helper failures, by voice id, in the same
+# regex -> replacement form as the tables above.  Filled in by
+# _eloquence_quarantine; matched against normalized text.
+learned_fixes = {}
+
+
+def set_learned_fixes(fixes):
+	"""Replace the learned rule set with *fixes* (voice id -> {regex: replacement})."""
+	global learned_fixes
+	learned_fixes = fixes
+
+
+# ---------------------------------------------------------------------------
+# Rule profiling
+# ---------------------------------------------------------------------------
+# Opt-in: with ELOQUENCE_PROFILE_RULES set (or after enable_profiling()),
+# preprocess() records for every rule how often it ran, how often it matched
+# and how long it took, plus the distribution of input lengths.  When it is
+# off, preprocess() takes its usual path and pays nothing for it.
+
+PROFILE_ENV = "ELOQUENCE_PROFILE_RULES"
+
+
+class RuleProfile:
+	"""Per-rule hit counts and timings gathered by :func:`preprocess`.
+
+	Rules are keyed by table name and position, so the report follows the
+	order they are applied in.  Input lengths are bucketed by powers of two.
+	"""
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self.rules = {}  # (table, index) -> [pattern, runs, hits, substitutions, seconds]
+		self.lengths = collections.Counter()  # bit length of len(text) -> inputs
+		self.calls = 0
+		self.chars = 0
+		self.seconds = 0.0
+
+	def add(self, length, seconds, samples):
+		"""Fold one preprocess() call and its ``(table, index, pattern, subs, seconds)`` samples in."""
+		with self._lock:
+			self.calls += 1
+			self.chars += length
+			self.seconds += seconds
+			self.lengths[length.bit_length()] += 1
+			for table, index, pattern, subs, rule_seconds in samples:
+				entry = self.rules.get((table, index))
+				if entry is None:
+					entry = self.rules[(table, index)] = [pattern, 0, 0, 0, 0.0]
+				entry[1] += 1
+				entry[2] += bool(subs)
+				entry[3] += subs
+				entry[4] += rule_seconds
+
+	def merge(self, data):
+		"""Add the counts from a :meth:`to_dict` snapshot, e.g. one taken in another process."""
+		with self._lock:
+			self.calls += data["calls"]
+			self.chars += data["chars"]
+			self.seconds += data["seconds"]
+			for bits, count in data["lengths"].items():
+				self.lengths[int(bits)] += count
+			for rule in data["rules"]:
+				key = (rule["table"], rule["index"])
+				entry = self.rules.get(key)
+				if entry is None:
+					entry = self.rules[key] = [rule["pattern"], 0, 0, 0, 0.0]
+				entry[1] += rule["runs"]
+				entry[2] += rule["hits"]
+				entry[3] += rule["substitutions"]
+				entry[4] += rule["seconds"]
+
+	def to_dict(self):
+		"""JSON-serializable snapshot of the counts."""
+		with self._lock:
+			return {
+				"calls": self.calls,
+				"chars": self.chars,
+				"seconds": self.seconds,
+				"lengths": {str(bits): count for bits, count in sorted(self.lengths.items())},
+				"rules": [
+					{
+						"table": table,
+						"index": index,
+						"pattern": pattern,
+						"runs": runs,
+						"hits": hits,
+						"substitutions": subs,
+						"seconds": seconds,
+					}
+					for (table, index), (pattern, runs, hits, subs, seconds) in sorted(self.rules.items())
+				],
+			}
+
+
+_profile = RuleProfile() if os.environ.get(PROFILE_ENV) else None
+
+
+def enable_profiling():
+	"""Start recording rule statistics, if not already, and return the live profile."""
+	global _profile
+	if _profile is None:
+		_profile = RuleProfile()
+	return _profile
+
+
+def disable_profiling():
+	"""Stop recording and return what was gathered, or *None* if profiling was off."""
+	global _profile
+	profile, _profile = _profile, None
+	return profile
+
+
+def profile_stats():
+	"""Snapshot of the running profile (see :meth:`RuleProfile.to_dict`), or *None*."""
+	profile = _profile
+	return profile.to_dict() if profile is not None else None
+
+
+def format_profile(stats, sort="seconds"):
+	"""Render a :meth:`RuleProfile.to_dict` snapshot as a plain-text report.
+
+	Rules are listed most expensive first (or by *sort*: ``hits`` or
+	``order``), followed by the rules that never matched and the input
+	length distribution.
+	"""
+	calls = stats["calls"]
+	lines = [
+		f"{calls} inputs, {stats['chars']} chars, {stats['seconds'] * 1000:.1f} ms in preprocess"
+		+ (f" ({stats['seconds'] / calls * 1e6:.1f} us per input)" if calls else "")
+	]
+	rules = list(stats["rules"])
+	if sort == "hits":
+		rules.sort(key=lambda rule: rule["hits"], reverse=True)
+	elif sort != "order":
+		rules.sort(key=lambda rule: rule["seconds"], reverse=True)
+	lines.append(f"{'table':<10}{'#':>3}{'runs':>10}{'hits':>9}{'subs':>9}{'ms':>10}{'us/run':>8}  pattern")
+	for rule in rules:
+		per_run = rule["seconds"] / rule["runs"] * 1e6 if rule["runs"] else 0.0
+		pattern = rule["pattern"] if len(rule["pattern"]) <= 60 else rule["pattern"][:57] + "..."
+		lines.append(
+			f"{rule['table']:<10}{rule['index']:>3}{rule['runs']:>10}{rule['hits']:>9}"
+			f"{rule['substitutions']:>9}{rule['seconds'] * 1000:>10.2f}{per_run:>8.2f}  {pattern}"
+		)
+	dead = [
+		rule for rule in stats["rules"] if rule["runs"] and not rule["hits"] and rule["table"] != "normalize"
+	]
+	if dead:
+		lines.append(f"Never matched ({len(dead)}):")
+		lines.extend(f"  {rule['table']} #{rule['index']}: {rule['pattern']}" for rule in dead)
+	lines.append("Input lengths:")
+	for bits, count in sorted(stats["lengths"].items(), key=lambda item: int(item[0])):
+		bits = int(bits)
+		low = 1 << (bits - 1) if bits else 0
+		lines.append(f"  {low:>7}-{(1 << bits) - 1:<7} {count:>9}")
+	return "\n".join(lines)
+
+
+def _profiled_resub(name, dct, s, samples):
+	for index, (pattern, replacement) in enumerate(dct.items()):
+		start = time.perf_counter()
+		s, subs = pattern.subn(replacement, s)
+		samples.append((name, index, pattern.pattern, subs, time.perf_counter() - start))
+	return s
+
+
+def _preprocess_profiled(text, voice_id, profile):
+	"""preprocess() with every rule timed and its matches counted into *profile*."""
+	started = time.perf_counter()
+	length = len(text)
+	samples = []
+	for name, table in _fix_tables(voice_id):
+		text = _profiled_resub(name, table, text, samples)
+	if voice_id not in _ASIAN_IDS:
+		start = time.perf_counter()
+		normalized = _normalize_text(text)
+		samples.append(("normalize", 0, "best-fit", int(normalized != text), time.perf_counter() - start))
+		text = normalized
+	fixes = learned_fixes.get(voice_id)
+	if fixes:
+		text = _profiled_resub("learned", fixes, text, samples)
+	profile.add(length, time.perf_counter() - started, samples)
+	return text
+
+
 # ---------------------------------------------------------------------------
 # Public API
 # ---------------------------------------------------------------------------
+@functools.lru_cache(maxsize=None)
+def _fix_tables(voice_id):
+	"""The ``(name, table)`` pairs applied to *voice_id* before normalization, in order."""
+	return tuple((name, load_rule_pack(name)) for name in _rule_pack_index().get(voice_id, ()))
+
+
 def preprocess(text, voice_id):
 	"""Apply crash prevention fixes and text normalization for *voice_id*."""
-	# CHS and KOR get English fixes (they render embedded English text)
-	if voice_id in _ENGLISH_IDS + _CHINESE_ID + _KOREAN_ID:
-		text = _resub(english_fixes, text)
-	elif voice_id in _SPANISH_IDS:
-		text = _resub(spanish_fixes, text)
-	elif voice_id in _FRENCH_IDS:
-		text = _resub(french_fixes, text)
-	if voice_id in _GERMAN_IDS:
-		text = _resub(german_fixes, text)
+	profile = _profile
+	if profile is not None:
+		return _preprocess_profiled(text, voice_id, profile)
+	for _name, table in _fix_tables(voice_id):
+		text = _resub(table, text)
 	# Asian languages use multi-byte characters that would be corrupted
 	if voice_id not in _ASIAN_IDS:
 		text = _normalize_text(text)
+	fixes = learned_fixes.get(voice_id)
+	if fixes:
+		text = _resub(fixes, text)
 	return text
+
+
+# Break points for split_long_text, strongest first.  Each match ends where
+# the next segment should start; CJK punctuation needs no trailing space.
+_SENTENCE_BREAK = re.compile(r"[.!?]+[\"')\]]*\s+|[。！？]+|\n\s*")
+_CLAUSE_BREAK = re.compile(r"[,;:]\s+|[、，；]|\s+[-–—]+\s+")
+_SPACE_BREAK = re.compile(r"\s+")
+
+
+def _last_break(pattern, text, start, end):
+	"""Return the end of the last *pattern* match within ``text[start:end]``, or 0."""
+	cut = 0
+	for match in pattern.finditer(text, start, end):
+		cut = match.end()
+	return cut
+
+
+def split_long_text(text, max_chars):
+	"""Yield consecutive pieces of *text* no longer than *max_chars*.
+
+	Pieces end at a sentence boundary where one falls in the back three
+	quarters of the window, otherwise at a clause boundary, then at
+	whitespace, and only as a last resort mid-word.  Joining the pieces gives
+	back *text*.  Pieces are produced lazily, so the first is available
+	without scanning the rest of the string.
+	"""
+	pos = 0
+	length = len(text)
+	while length - pos > max_chars:
+		end = pos + max_chars
+		floor = pos + max_chars // 4
+		for pattern in (_SENTENCE_BREAK, _CLAUSE_BREAK, _SPACE_BREAK):
+			cut = _last_break(pattern, text, floor, end)
+			if cut:
+				break
+		else:
+			cut = end
+		yield text[pos:cut]
+		pos = cut
+	if pos < length:
+		yield text[pos:]
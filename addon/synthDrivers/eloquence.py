@@ -1,12 +1,8 @@
 # Copyright (C) 2009-2019 eloquence fans
 # synthDrivers/eci.py
 # todo: possibly add to this
-import gui
-import wx
-import ctypes
-import winsound
-import shutil  # Added for Copy Helper tool
-
+# NVDA imports synth drivers to enumerate them, so only speech dependencies are
+# imported here; the settings panel (GUI, updater) lives in _eloquence_settings.
 try:
 	from speech import (
 		IndexCommand,
@@ -39,6 +35,11 @@ except ImportError:
 		NumericDriverSetting,
 	)
 
+try:
+	from speech import sayAll
+except ImportError:
+	sayAll = None
+
 try:
 	from autoSettingsUtils.utils import StringParameterInfo
 except ImportError:
@@ -51,24 +52,26 @@ except ImportError:
 
 punctuation = ",.?:;)(?!"
 punctuation = [x for x in punctuation]
-from ctypes import *
-import ctypes.wintypes
+import functools
+import threading
 import synthDriverHandler
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import NamedTuple, Optional
 import os
 import config
+import globalVars
 import re
 import logging
 import core
-import globalVars
 from synthDriverHandler import (
 	SynthDriver,
 	synthIndexReached,
 	synthDoneSpeaking,
 )
 from . import _eloquence
+from . import _pronunciation
 from . import _text_preprocessing
-from collections import OrderedDict
-import unicodedata
+from collections import OrderedDict, deque
 import addonHandler
 
 addonHandler.initTranslation()
@@ -96,613 +99,248 @@ VOICE_BCP47 = {
 	"kor": "ko-KR",  # Korean
 }
 
-VOICE_CODE_TO_ID = {code: str(info[0]) for code, info in _eloquence.langs.items()}
-VOICE_ID_TO_BCP47 = {
-	voice_id: VOICE_BCP47.get(code) for code, voice_id in VOICE_CODE_TO_ID.items() if VOICE_BCP47.get(code)
-}
-LANGUAGE_TO_VOICE_ID = {
-	lang.lower(): VOICE_CODE_TO_ID[code] for code, lang in VOICE_BCP47.items() if code in VOICE_CODE_TO_ID
-}
-PRIMARY_LANGUAGE_TO_VOICE_IDS = {}
-for code, lang in VOICE_BCP47.items():
-	voice_id = VOICE_CODE_TO_ID.get(code)
-	if not voice_id:
-		continue
-	primary = lang.split("-", 1)[0].lower()
-	PRIMARY_LANGUAGE_TO_VOICE_IDS.setdefault(primary, []).append(voice_id)
 
-variants = {
-	1: "Reed",
-	2: "Shelley",
-	3: "Bobby",
-	4: "Rocko",
-	5: "Glen",
-	6: "Sandy",
-	7: "Grandma",
-	8: "Grandpa",
+class _VoiceTables(NamedTuple):
+	code_to_id: dict
+	id_to_code: dict
+	id_to_bcp47: dict
+	language_to_id: dict
+	primary_language_to_ids: dict
+
+
+# Module attributes kept for compatibility, resolved lazily through __getattr__.
+_VOICE_TABLE_NAMES = {
+	"VOICE_CODE_TO_ID": "code_to_id",
+	"VOICE_ID_TO_CODE": "id_to_code",
+	"VOICE_ID_TO_BCP47": "id_to_bcp47",
+	"LANGUAGE_TO_VOICE_ID": "language_to_id",
+	"PRIMARY_LANGUAGE_TO_VOICE_IDS": "primary_language_to_ids",
 }
 
 
-class EloquenceSettingsPanel(gui.settingsDialogs.SettingsPanel):
-	# Translators: Name of the category for this add-on in the settings dialog
-	title = _("Eloquence")
+@functools.lru_cache(maxsize=None)
+def _voice_tables():
+	"""Build the voice/language lookup tables on first use."""
+	code_to_id = {code: str(info[0]) for code, info in _eloquence.langs.items()}
+	primary_to_ids = {}
+	for code, lang in VOICE_BCP47.items():
+		voice_id = code_to_id.get(code)
+		if voice_id:
+			primary_to_ids.setdefault(lang.split("-", 1)[0].lower(), []).append(voice_id)
+	return _VoiceTables(
+		code_to_id=code_to_id,
+		id_to_code={voice_id: code for code, voice_id in code_to_id.items()},
+		id_to_bcp47={
+			voice_id: VOICE_BCP47[code] for code, voice_id in code_to_id.items() if code in VOICE_BCP47
+		},
+		language_to_id={
+			lang.lower(): code_to_id[code] for code, lang in VOICE_BCP47.items() if code in code_to_id
+		},
+		primary_language_to_ids=primary_to_ids,
+	)
 
-	def makeSettings(self, settings):
-		try:
-			sHelper = gui.guiHelper.BoxSizerHelper(self, sizer=settings)
-
-			self.dictionarySources = {
-				"https://github.com/mohamed00/AltIBMTTSDictionaries": "Alternative IBM TTS Dictionaries",
-				"https://github.com/eigencrow/IBMTTSDictionaries": "IBM TTS Dictionaries",
-			}
-
-			self.dictionaryChoice = sHelper.addLabeledControl(
-				# Translators: Label of a combobox in the Eloquence category of the settings dialog
-				_("Dictionary:"),
-				wx.Choice,
-				choices=list(self.dictionarySources.values()),
-			)
-			self.dictionaryChoice.SetStringSelection(
-				config.conf.get("eloquence", {}).get("dictionary_name", "Alternative IBM TTS Dictionaries")
+
+def __getattr__(name):
+	if name in _VOICE_TABLE_NAMES:
+		return getattr(_voice_tables(), _VOICE_TABLE_NAMES[name])
+	if name == "EloquenceSettingsPanel":
+		return _settings_panel()
+	raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class _TextOptions(NamedTuple):
+	"""Driver settings that shape a string, captured when speak() queues it."""
+
+	voice_id: int
+	backquote_tags: bool
+	volume: int
+	pause_mode: int
+	abbreviation_dict: bool
+	phrase_prediction: bool
+
+
+def prepare_text(text, options, should_pause=False):
+	"""Turn *text* into the annotated string Eloquence is given, using *options*.
+
+	Pure function of its arguments (and the user's pronunciation files) so it
+	can run on the preprocessing pool.
+	"""
+	text = _pronunciation.substitute(text, _voice_tables().id_to_code.get(str(options.voice_id)))
+	text = _text_preprocessing.preprocess(text, options.voice_id)
+	if not options.backquote_tags:
+		text = text.replace("`", " ")
+	text = "`vv%d %s" % (
+		options.volume,
+		text,
+	)  # no embedded commands
+
+	# IBMTTS Regex Injection Logic for dynamic pausing:
+	if options.pause_mode == 0:
+		# Mode 0 (Do not shorten) maps punctuation to p0 for legacy snappy performance.
+		text = pause_re.sub(r"\1 `p0\2\3\4", text)
+	elif options.pause_mode == 2:
+		# Mode 2 (Shorten all pauses) maps punctuation to p1 for consistent modern shortening.
+		text = pause_re.sub(r"\1 `p1\2\3\4", text)
+
+	text = time_re.sub(r"\1:\2 \3", text)
+	if options.abbreviation_dict:
+		text = "`da1 " + text
+	else:
+		text = "`da0 " + text
+	if options.phrase_prediction:
+		text = "`pp1 " + text
+	else:
+		text = "`pp0 " + text
+	# if two strings are sent separately, pause between them. This might fix some of the audio issues we're having.
+	if should_pause:
+		p_val = "0" if options.pause_mode == 0 else "1"
+		text = text + f" `p{p_val}."
+	return text
+
+
+def _prepare_and_encode(text, options):
+	"""Return ``(prepared text, engine bytes)``; *options* of None sends *text* as is."""
+	if options is None:
+		return text, _eloquence._encode_text(text)
+	lang = _voice_tables().id_to_code.get(str(options.voice_id))
+	text = prepare_text(text, options)
+	return text, _eloquence._encode_text(text, lang)
+
+
+# Preprocessing runs here rather than on NVDA's main thread; the synth worker
+# consumes the results in queue order, so completion order does not matter.
+PREPROCESS_WORKERS = 2
+_preprocess_pool: Optional[ThreadPoolExecutor] = None
+_preprocess_pool_lock = threading.Lock()
+
+
+def _submit_preprocess(text, options):
+	global _preprocess_pool
+	with _preprocess_pool_lock:
+		if _preprocess_pool is None:
+			_preprocess_pool = ThreadPoolExecutor(
+				max_workers=PREPROCESS_WORKERS, thread_name_prefix="EloquencePreprocess"
 			)
+		return _preprocess_pool.submit(_prepare_and_encode, text, options)
 
-			self.updateButton = sHelper.addItem(wx.Button(self, label=_("Check for updates")))
-			self.Bind(wx.EVT_BUTTON, self.onUpdate, self.updateButton)
-			# When NVDA is running in secure mode, one should not be able to save any setting to disk.
-			if globalVars.appArgs.secure:
-				self.updateButton.Disable()
 
-			# Tool to automate copying eloquence_host32.exe for 64-bit NVDA secure screens
-			self.copyHelperButton = sHelper.addItem(
-				# Translators: Label of a button in the Eloquence category of the settings dialog
-				wx.Button(self, label=_("Copy Helper to System Config (for Logon Screen)"))
-			)
-			self.Bind(wx.EVT_BUTTON, self.onCopyHelper, self.copyHelperButton)
-			# Copying helper from secure mode is not allowed, following "Use NVDA during sign-in" button behaviour in
-			# NVDA's General settings category.
-			if globalVars.appArgs.secure:
-				self.copyHelperButton.Disable()
-
-			# NEW: Auto-update addon button
-			# Translators: Label of a button in the Eloquence category of the settings dialog
-			self.addonUpdateButton = sHelper.addItem(wx.Button(self, label=_("Check for Add-on Updates")))
-			self.Bind(wx.EVT_BUTTON, self.onCheckAddonUpdate, self.addonUpdateButton)
-			# Add-on updates are not allowed in secure mode.
-			if globalVars.appArgs.secure:
-				self.addonUpdateButton.Disable()
-		except Exception as e:
-			log.error(f"Error creating Eloquence settings panel: {e}")
-			# Panel creation failed, but don't crash - synth will still work
-
-	def onCopyHelper(self, evt):
-		"""Copies eloquence_host32.exe with UAC elevation support and definitive feedback."""
-		source_file = os.path.normpath(os.path.join(os.path.dirname(__file__), "eloquence_host32.exe"))
-		prog_files = os.environ.get("ProgramFiles", "C:\\Program Files")
-		target_addon_dir = os.path.normpath(
-			os.path.join(prog_files, "NVDA", "systemConfig", "addons", "Eloquence")
-		)
+def _shutdown_preprocess_pool():
+	global _preprocess_pool
+	with _preprocess_pool_lock:
+		pool, _preprocess_pool = _preprocess_pool, None
+	if pool is not None:
+		pool.shutdown(wait=False, cancel_futures=True)
 
-		# Security check: Ensure the target addon directory exists in systemConfig
-		if not os.path.isdir(target_addon_dir):
-			wx.MessageBox(
-				_(
-					# Translators: Text of a message dialog when copying the helper to system config
-					"Eloquence folder not found in systemConfig.\n\nPlease go to NVDA Settings > General and click 'Use currently saved settings during sign-in' first to initialize folders."
-				),
-				# Translators: Title of a message dialog when copying the helper to system config
-				_("Folder Missing"),
-				wx.OK | wx.ICON_WARNING,
-			)
-			return
 
-		dest_dir = os.path.normpath(os.path.join(target_addon_dir, "synthDrivers"))
-		dest_file = os.path.normpath(os.path.join(dest_dir, "eloquence_host32.exe"))
+def _speak_prepared(prepared):
+	"""Synth worker step: send text prepared on the pool, waiting for it if needed."""
+	_eloquence.speak_encoded(prepared.result()[1])
 
-		if not os.path.exists(source_file):
-			wx.MessageBox(
-				# Translators: Text of a message dialog when copying the helper to system config
-				_("Source file not found at:\n{source_file}").format(source_file=source_file),
-				# Translators: Title of a message dialog when copying the helper to system config
-				_("Error"),
-				wx.OK | wx.ICON_ERROR,
-			)
-			return
 
-		# Prepare elevated command: ensure subdirectory exists and copy the helper
-		cmd_params = f'/c mkdir "{dest_dir}" 2>nul & copy /y "{source_file}" "{dest_file}"'
+def _speak_trailing_pause(prepared, p_val):
+	# Trailing Pause Logic from IBMTTS, decided once the last string is prepared.
+	text = prepared.result()[0].rstrip()
+	if text and text[-1] not in punctuation:
+		_eloquence.speak(f"`p{p_val} ")
 
-		try:
-			# Triggering UAC Elevation using ShellExecuteW's "runas" verb
-			ret = ctypes.windll.shell32.ShellExecuteW(None, "runas", "cmd.exe", cmd_params, None, 0)
-
-			if ret > 32:
-				# Play Windows Asterisk sound for confirmation of successful launch
-				winsound.MessageBeep(winsound.MB_ICONASTERISK)
-				wx.MessageBox(
-					_(
-						# Translators: text of a message dialog when copying the helper to system config
-						"Successfully copied eloquence_host32.exe to systemConfig!\n\nEloquence should now load normally on logon screen, start-up, and other secure screens."
-					),
-					# Translators: Title of a message dialog when copying the helper to system config
-					_("Success"),
-					wx.OK | wx.ICON_INFORMATION,
-				)
-			elif ret == 5:
-				# SE_ERR_ACCESSDENIED: Elevation prompt was declined
-				wx.MessageBox(
-					# Translators: Text of a message dialog when copying the helper to system config
-					_("Copy process was cancelled or permission was denied by the user."),
-					# Translators: Title of a message dialog when copying the helper to system config
-					_("Cancelled"),
-					wx.OK | wx.ICON_ERROR,
-				)
-			else:
-				wx.MessageBox(
-					# Translators: Text of a message dialog when copying the helper to system config
-					_("An error occurred while attempting to copy the file. (Error Code: {ret})").format(
-						ret=ret
-					),
-					# Translators: Title of a message dialog when copying the helper to system config
-					_("Error"),
-					wx.OK | wx.ICON_ERROR,
-				)
-		except Exception as e:
-			wx.MessageBox(
-				# Translators: Text of a message dialog when copying the helper to system config
-				_("An unexpected error occurred: {e}").format(e=str(e)),
-				# Translators: Title of a message dialog when copying the helper to system config
-				_("Error"),
-				wx.OK | wx.ICON_ERROR,
-			)
 
-	def onCheckAddonUpdate(self, evt):
-		"""Check for and apply addon updates from GitHub"""
-		import sys
-		import os
-
-		# Import the update manager
-		addon_dir = os.path.abspath(os.path.dirname(__file__))
-		update_manager_path = os.path.join(addon_dir, "_eloquence_updater.py")
-
-		# Check if updater exists
-		if not os.path.exists(update_manager_path):
-			wx.MessageBox(
-				# Translators: Text of a message dialog when updating the add-on
-				_("Update manager not found. Please reinstall the add-on."),
-				# Translators: Title of a message dialog when updating the add-on
-				_("Error"),
-				wx.OK | wx.ICON_ERROR,
-			)
-			return
+# Strings longer than STREAM_THRESHOLD characters are split into segments of at
+# most STREAM_SEGMENT_CHARS and fed to the helper one by one, so time to first
+# audio no longer grows with the size of the string.
+STREAM_THRESHOLD = 2000
+STREAM_SEGMENT_CHARS = 500
+# Segments prepared ahead of the one being rendered.
+STREAM_LOOKAHEAD = 2
 
-		# Import update manager
-		sys.path.insert(0, addon_dir)
-		try:
-			from _eloquence_updater import EloquenceUpdateManager, show_update_dialog
-		except ImportError as e:
-			wx.MessageBox(
-				# Translators: Text of a message dialog when updating the add-on
-				_("Failed to load update manager: {e}").format(e=e),
-				# Translators: Title of a message dialog when updating the add-on
-				_("Error"),
-				wx.OK | wx.ICON_ERROR,
-			)
-			return
-		finally:
-			if addon_dir in sys.path:
-				sys.path.remove(addon_dir)
-
-		# Create progress dialog
-		progress = wx.ProgressDialog(
-			# Translators: Title of a progress dialog when updating the add-on
-			_("Checking for Updates"),
-			# Translators: Message of a progress dialog when updating the add-on
-			_("Connecting to GitHub..."),
-			maximum=100,
-			parent=self,
-			style=wx.PD_APP_MODAL | wx.PD_AUTO_HIDE,
-		)
 
-		try:
-			# Initialize update manager
-			manager = EloquenceUpdateManager(addon_dir)
-
-			# Check for updates
-			# Translators: Message of a progress dialog when updating the add-on
-			progress.Update(10, _("Checking for updates..."))
-			(
-				has_update,
-				latest_version,
-				download_url,
-				changelog,
-			) = manager.check_for_updates()
-
-			if not has_update:
-				# Translators: Message of a progress dialog when updating the add-on
-				progress.Update(100, _("No updates available"))
-				progress.Destroy()
-				wx.MessageBox(
-					# Translators: Text of a message dialog when updating the add-on
-					_("You are using the latest version!"),
-					# Translators: Title of a message dialog when updating the add-on
-					_("Up to Date"),
-					wx.OK | wx.ICON_INFORMATION,
-				)
-				return
-
-			# Show changelog
-			# Translators: Text of a message dialog when updating the add-on
-			progress.Update(20, _("Update available!"))
-			progress.Destroy()
-
-			changelog_dialog = wx.MessageDialog(
-				self,
-				_(
-					# Translators: Text of a message dialog when updating the add-on
-					"New version available: {latest_version}\n\n"
-					"Current version: {currVersion}\n\n"
-					"Changelog:\n{changelog}\n\n"
-					"Would you like to download and review the update?"
-				).format(
-					latest_version=latest_version,
-					currVersion=manager.CURRENT_VERSION,
-					changelog=changelog[:500],
-				),
-				# Translators: Title of a message dialog when updating the add-on
-				_("Update Available"),
-				wx.YES_NO | wx.ICON_INFORMATION,
-			)
+def _prepared_segments(text, options, tail):
+	"""Yield engine bytes for each segment of *text*, preparing a few ahead on the pool.
 
-			if changelog_dialog.ShowModal() != wx.ID_YES:
-				return
-
-			# Download update
-			progress = wx.ProgressDialog(
-				# Translators: Text of a progress dialog when updating the add-on
-				_("Downloading Update"),
-				# Translators: Title of a progress dialog when updating the add-on
-				_("Downloading..."),
-				maximum=100,
-				parent=self,
-				style=wx.PD_APP_MODAL | wx.PD_CAN_ABORT,
-			)
+	*tail* is resolved with the last segment's ``(prepared text, bytes)`` once
+	iteration ends, for the trailing pause.
+	"""
+	window = deque()
+	prepared = ("", b"")
+	try:
+		for segment in _text_preprocessing.split_long_text(text, STREAM_SEGMENT_CHARS):
+			window.append(_submit_preprocess(segment, options))
+			if len(window) > STREAM_LOOKAHEAD:
+				prepared = window.popleft().result()
+				yield prepared[1]
+		while window:
+			prepared = window.popleft().result()
+			yield prepared[1]
+	finally:
+		for future in window:
+			future.cancel()
+		tail.set_result(prepared)
 
-			def download_progress(percent, message):
-				cont, skip = progress.Update(percent, message)
-				return cont
 
-			zip_path = manager.download_update(download_url, download_progress)
+def _speak_streamed(text, options, tail):
+	"""Synth worker step: stream a long string to the helper segment by segment."""
+	segments = _prepared_segments(text, options, tail)
+	try:
+		_eloquence.speak_stream(segments)
+	finally:
+		segments.close()
 
-			# Extract update
-			# Translators: Text of a progress dialog when updating the add-on
-			progress.Update(0, _("Extracting update..."))
-			manager.extract_update(zip_path, download_progress)
 
-			# Analyze changes
-			# Translators: Text of a progress dialog when updating the add-on
-			progress.Update(0, _("Analyzing changes..."))
-			changes = manager.analyze_changes(download_progress)
+# Utterances of at most this many characters (key echo, short announcements)
+# are interactive feedback and overtake other queued speech, say-all included.
+INTERACTIVE_MAX_CHARS = 40
 
-			progress.Destroy()
 
-			# Show update dialog with detailed changes
-			apply_update, decisions = show_update_dialog(self, changes, latest_version)
+def _say_all_running():
+	# Read at call time: NVDA sets sayAll.SayAllHandler once it has initialised
+	# speech, after this driver may have been imported.
+	try:
+		handler = sayAll.SayAllHandler if sayAll is not None else None
+		return handler is not None and handler.isRunning()
+	except Exception:
+		return False
 
-			if not apply_update:
-				manager.cleanup()
-				wx.MessageBox(
-					# Translators: Text of a message dialog when updating the add-on
-					_("Update cancelled."),
-					# Translators: Text of a message dialog when updating the add-on
-					_("Cancelled"),
-					wx.OK | wx.ICON_INFORMATION,
-				)
-				return
-
-			# Apply update with progress
-			progress = wx.ProgressDialog(
-				# Translators: Text of a progress dialog when updating the add-on
-				_("Applying Update"),
-				# Translators: Text of a progress dialog when updating the add-on
-				_("Please wait..."),
-				maximum=100,
-				parent=self,
-				style=wx.PD_APP_MODAL | wx.PD_AUTO_HIDE,
-			)
 
-			def merge_progress(percent, message):
-				progress.Update(percent, message)
+def _speech_priority(text_chars, streamed):
+	"""Scheduling class for an utterance of *text_chars* characters, from the utterance itself.
 
-			manager.smart_merge(changes, decisions, merge_progress)
+	Short utterances are interactive even while say-all reads, so feedback
+	such as a notification is not queued behind the text being read.  Longer
+	ones are bulk when streamed or spoken while say-all reads, else normal.
+	"""
+	if text_chars <= INTERACTIVE_MAX_CHARS and not streamed:
+		return _eloquence.PRIORITY_INTERACTIVE
+	if streamed or _say_all_running():
+		return _eloquence.PRIORITY_BULK
+	return _eloquence.PRIORITY_NORMAL
 
-			progress.Destroy()
 
-			# Success!
-			wx.MessageBox(
-				_(
-					# Translators: Text of a message dialog when updating the add-on
-					"Update to {latest_version} applied successfully!\n\n"
-					"Please restart NVDA for changes to take effect."
-				).format(latest_version=latest_version),
-				# Translators: Title of a message dialog when updating the add-on
-				_("Update Successful"),
-				wx.OK | wx.ICON_INFORMATION,
-			)
+def _settings_panel():
+	from ._eloquence_settings import EloquenceSettingsPanel
 
-			# Cleanup
-			manager.cleanup()
+	return EloquenceSettingsPanel
 
-		except Exception as e:
-			progress.Destroy()
-			log.error(f"Update failed: {e}")
-			wx.MessageBox(
-				_(
-					# Translators: Text of a message dialog when updating the add-on
-					"Update failed: {e}\n\nYour addon has not been modified."
-				).format(e=str(e)),
-				# Translators: Title of a message dialog when updating the add-on
-				_("Update Failed"),
-				wx.OK | wx.ICON_ERROR,
-			)
 
-	def onSave(self):
-		if "eloquence" not in config.conf:
-			config.conf["eloquence"] = {}
-		selection = self.dictionaryChoice.GetStringSelection()
-		for url, name in self.dictionarySources.items():
-			if name == selection:
-				config.conf["eloquence"]["dictionary_name"] = name
-				config.conf["eloquence"]["dictionary_url"] = url
-				break
-
-	def onUpdate(self, evt):
-		import urllib.request
-		import zipfile
-		import os
-
-		self.onSave()
-		dictionary_url = config.conf.get("eloquence", {}).get("dictionary_url")
-		if not dictionary_url:
-			wx.MessageBox(
-				# Translators: Text of a message dialog when updating a dictionary
-				_("Please select a dictionary first."),
-				# Translators: Title of a message dialog when updating a dictionary
-				_("Error"),
-				wx.OK | wx.ICON_ERROR,
-			)
-			return
+class _LazySettingsPanel:
+	"""Class attribute that imports the settings panel when it is first read."""
 
-		try:
-			# Add /archive/master.zip to the end of the URL to download the master branch
-			zip_url = dictionary_url + "/archive/master.zip"
-			zip_path, _unused = urllib.request.urlretrieve(zip_url)
-
-			addon_dir = os.path.abspath(os.path.dirname(__file__))
-			dest_folder = os.path.join(addon_dir, "eloquence")
-
-			if not os.path.exists(dest_folder):
-				os.makedirs(dest_folder)
-
-			with zipfile.ZipFile(zip_path, "r") as zip_ref:
-				zip_ref.extractall(addon_dir)
-				zip_contents = zip_ref.namelist()
-				extracted_root_name = zip_contents[0].split("/")[0]
-				extracted_folder_path = os.path.join(addon_dir, extracted_root_name)
-
-			updates_count = 0
-
-			# --- HELPER: Ensure CP1252 compatibility ---
-			def clean_key_text(text):
-				try:
-					text.encode("cp1252")
-					return text
-				except UnicodeEncodeError:
-					# If not CP1252, fallback to stripping accents
-					return "".join(
-						c for c in unicodedata.normalize("NFD", text) if unicodedata.category(c) != "Mn"
-					)
+	def __get__(self, obj, owner=None):
+		return _settings_panel()
 
-			# --- HELPER: Extract Key/Word only (Cleaned) ---
-			def get_key(line):
-				parts = line.strip().split(None, 1)
-				if parts:
-					raw_key = parts[0].lower()
-					return clean_key_text(raw_key)  # Return CP1252-safe key
-				return None
-
-			# --- HELPER: Normalize Format (Space to Tab + Clean ALL text) ---
-			def normalize_entry_format(line):
-				line = line.strip()
-				if " [" in line and "\t[" not in line:
-					parts = line.split(" [", 1)
-					if len(parts) == 2:
-						word_part = parts[0].strip()
-						pronunciation_part = parts[1]
-						# Clean BOTH the word and pronunciation to ensure CP1252 compatibility
-						clean_word = clean_key_text(word_part)
-						clean_pronunciation = clean_key_text(pronunciation_part)
-						return f"{clean_word}\t[{clean_pronunciation}"
-
-				# Even if it's already tabbed, ensure ALL text is CP1252-safe
-				if "\t[" in line:
-					parts = line.split("\t[", 1)
-					if len(parts) == 2:
-						word_part = parts[0].strip()
-						pronunciation_part = parts[1]
-						# Clean BOTH parts
-						clean_word = clean_key_text(word_part)
-						clean_pronunciation = clean_key_text(pronunciation_part)
-						return f"{clean_word}\t[{clean_pronunciation}"
-
-				# If no bracket format, just clean the whole line
-				return clean_key_text(line)
-
-			# --- MAIN LOGIC ---
-			if os.path.exists(extracted_folder_path):
-				candidates = []
-				for root, dirs, files in os.walk(extracted_folder_path):
-					for f in files:
-						if f.lower().endswith(".dic"):
-							full_path = os.path.join(root, f)
-							candidates.append((full_path, f))
-
-				processed_filenames = set()
-				encodings_to_try = ["utf-8", "cp1252", "iso-8859-1", "cp437"]
-
-				for source_path, filename in candidates:
-					dest_path = os.path.join(dest_folder, filename)
-
-					# Auto-create new dictionary files with CP1252-safe content
-					if not os.path.exists(dest_path):
-						try:
-							# Read source file with encoding detection
-							source_lines = []
-							read_success = False
-							for enc in encodings_to_try:
-								try:
-									with open(source_path, "r", encoding=enc) as f:
-										source_lines = f.readlines()
-										read_success = True
-										break
-								except UnicodeDecodeError:
-									continue
-
-							if not read_success:
-								with open(source_path, "r", encoding="iso-8859-1", errors="replace") as f:
-									source_lines = f.readlines()
-
-							# Process and strip accents from all lines
-							processed_lines = []
-							for line in source_lines:
-								normalized_line = normalize_entry_format(line)
-								if normalized_line.strip():  # Skip empty lines
-									processed_lines.append(normalized_line)
-
-							# Write as CP1252
-							with open(dest_path, "w", encoding="cp1252") as f:
-								for line in processed_lines:
-									f.write(f"{line}\n")
-
-							updates_count += len(processed_lines)
-							log.info(
-								f"Created new dictionary file: {filename} ({len(processed_lines)} entries, CP1252-safe)"
-							)
-						except Exception as e:
-							log.error(f"Failed to create new dictionary {filename}: {e}")
-						continue
-
-					if filename.lower() in processed_filenames:
-						continue
-					processed_filenames.add(filename.lower())
-
-					lines_to_append = []
-					try:
-						# 1. READ LOCAL: Extract CLEAN KEYS
-						existing_keys = set()
-
-						def load_local_keys(f_handle):
-							for line in f_handle:
-								key = get_key(line)
-								if key:
-									existing_keys.add(key)
-
-						try:
-							# Try CP1252 first as it is the standard for dictionaries
-							with open(dest_path, "r", encoding="cp1252") as f:
-								load_local_keys(f)
-						except UnicodeDecodeError:
-							# Fallback if it was previously written in a different encoding
-							try:
-								with open(dest_path, "r", encoding="utf-8") as f:
-									load_local_keys(f)
-							except UnicodeDecodeError:
-								with open(dest_path, "r", encoding="mbcs", errors="ignore") as f:
-									load_local_keys(f)
-
-						# 2. READ SOURCE WITH AUTO-DETECT
-						source_lines = []
-						read_success = False
-						for enc in encodings_to_try:
-							try:
-								with open(source_path, "r", encoding=enc) as f:
-									source_lines = f.readlines()
-									read_success = True
-									break
-							except UnicodeDecodeError:
-								continue
-
-						if not read_success:
-							with open(source_path, "r", encoding="iso-8859-1", errors="replace") as f:
-								source_lines = f.readlines()
-
-						# 3. FILTER, CLEAN, & FORMAT
-						for line in source_lines:
-							# This cleans the visual word and normalizes spaces while preserving CP1252 accents
-							normalized_line = normalize_entry_format(line)
-
-							# Extract the clean key for comparison
-							key = get_key(normalized_line)
-
-							if not key:
-								continue
-
-							# Check duplicates using the key
-							if key not in existing_keys:
-								lines_to_append.append(normalized_line)
-								existing_keys.add(key)
-
-						# 4. WRITE UPDATES (Strictly CP1252)
-						if lines_to_append:
-							with open(dest_path, "a", encoding="cp1252") as f:
-								f.write("\n")
-								for item in lines_to_append:
-									f.write(f"{item}\n")
-							updates_count += len(lines_to_append)
-
-					except Exception as e:
-						log.error(f"Failed to merge dictionary {filename}: {e}")
-
-				shutil.rmtree(extracted_folder_path)
-
-			os.remove(zip_path)
-
-			if updates_count > 0:
-				# Count how many were new files vs updated entries
-				new_files = sum(1 for f in os.listdir(dest_folder) if f.lower().endswith(".dic"))
-				wx.MessageBox(
-					_(
-						# Translators: Text of a message dialog when updating a dictionary
-						"Dictionary update successful!\n\n"
-						"• Total updates: {updates_count}\n"
-						"• Dictionary files: {new_files}\n\n"
-						"Note: CP1252 encoding enforced; some accents may have been stripped for compatibility."
-					).format(updates_count=updates_count, new_files=new_files),
-					# Translators: Title of a message dialog when updating a dictionary
-					_("Success"),
-					wx.OK | wx.ICON_INFORMATION,
-				)
-			else:
-				wx.MessageBox(
-					# Translators: Text of a message dialog when updating a dictionary
-					_("No new updates found. Your dictionaries are already up to date."),
-					# Translators: Title of a message dialog when updating a dictionary
-					_("Eloquence"),
-					wx.OK | wx.ICON_INFORMATION,
-				)
 
-		except Exception as e:
-			wx.MessageBox(
-				# Translators: Text of a message dialog when updating a dictionary
-				_("An error occurred while updating the dictionary: {e}").format(e=e),
-				# Translators: Title of a message dialog when updating a dictionary
-				_("Error"),
-				wx.OK | wx.ICON_ERROR,
-			)
-		pass
+variants = {
+	1: "Reed",
+	2: "Shelley",
+	3: "Bobby",
+	4: "Rocko",
+	5: "Glen",
+	6: "Sandy",
+	7: "Grandma",
+	8: "Grandpa",
+}
 
 
 class SynthDriver(synthDriverHandler.SynthDriver):
-	settingsPanel = EloquenceSettingsPanel
+	settingsPanel = _LazySettingsPanel()
 	supportedSettings = (
 		SynthDriver.VoiceSetting(),
 		SynthDriver.VariantSetting(),
@@ -764,15 +402,18 @@ class SynthDriver(synthDriverHandler.SynthDriver):
 			return False
 
 	def __init__(self):
-		# Safe settings panel registration - won't crash if API changes in different NVDA versions
+		# The settings panel is registered once the GUI is idle so that loading the synth
+		# does not wait for the panel and updater modules to be imported.
+		self._settingsPanelRegistered = False
+		self._terminated = False
+		self._updateCheck = None
+		_pronunciation.set_config_dir(globalVars.appArgs.configPath)
 		try:
-			if hasattr(gui.settingsDialogs, "NVDASettingsDialog"):
-				if hasattr(gui.settingsDialogs.NVDASettingsDialog, "categoryClasses"):
-					if EloquenceSettingsPanel not in gui.settingsDialogs.NVDASettingsDialog.categoryClasses:
-						gui.settingsDialogs.NVDASettingsDialog.categoryClasses.append(EloquenceSettingsPanel)
+			import wx
+
+			wx.CallAfter(self._registerSettingsPanel)
 		except Exception as e:
-			log.warning(f"Could not register Eloquence settings panel: {e}")
-			# Continue initialization - synth will work without settings panel
+			log.warning(f"Could not schedule Eloquence settings panel registration: {e}")
 
 		try:
 			log.info("Eloquence: Starting initialization")
@@ -806,6 +447,9 @@ class SynthDriver(synthDriverHandler.SynthDriver):
 			if eci_conf is not None and not eloquence_conf.get("ipc_migration_notice_shown", False):
 
 				def _show_migration_notice():
+					import gui
+					import wx
+
 					if "eloquence" not in config.conf:
 						config.conf["eloquence"] = {}
 					config.conf["eloquence"]["ipc_migration_notice_shown"] = True
@@ -828,17 +472,48 @@ class SynthDriver(synthDriverHandler.SynthDriver):
 		except Exception:
 			pass  # Never let a notice prevent the synth from working
 
-	def terminate(self):
-		_eloquence.close_audio()
-		# Safe settings panel removal - won't crash if it was never registered
+	def _registerSettingsPanel(self):
+		# Safe settings panel registration - won't crash if API changes in different NVDA versions
+		if self._terminated:
+			return
 		try:
+			import gui
+
 			if hasattr(gui.settingsDialogs, "NVDASettingsDialog"):
 				if hasattr(gui.settingsDialogs.NVDASettingsDialog, "categoryClasses"):
-					gui.settingsDialogs.NVDASettingsDialog.categoryClasses.remove(EloquenceSettingsPanel)
-		except (ValueError, AttributeError) as e:
-			log.debug(f"Settings panel already removed or never registered: {e}")
+					panel = _settings_panel()
+					if panel not in gui.settingsDialogs.NVDASettingsDialog.categoryClasses:
+						gui.settingsDialogs.NVDASettingsDialog.categoryClasses.append(panel)
+					self._settingsPanelRegistered = True
 		except Exception as e:
-			log.warning(f"Error removing Eloquence settings panel: {e}")
+			log.warning(f"Could not register Eloquence settings panel: {e}")
+			# Continue - synth will work without settings panel
+		try:
+			from ._eloquence_settings import start_update_check
+
+			self._updateCheck = start_update_check()
+		except Exception as e:
+			log.warning(f"Could not start the Eloquence update check: {e}")
+
+	def terminate(self):
+		self._terminated = True
+		_shutdown_preprocess_pool()
+		if self._updateCheck is not None:
+			self._updateCheck.stop()
+		stats = _text_preprocessing.profile_stats()
+		if stats is not None:
+			log.info("Eloquence preprocessing rule profile:\n%s", _text_preprocessing.format_profile(stats))
+		_eloquence.close_audio()
+		# Safe settings panel removal - won't crash if it was never registered
+		if self._settingsPanelRegistered:
+			try:
+				import gui
+
+				gui.settingsDialogs.NVDASettingsDialog.categoryClasses.remove(_settings_panel())
+			except (ValueError, AttributeError) as e:
+				log.debug(f"Settings panel already removed or never registered: {e}")
+			except Exception as e:
+				log.warning(f"Error removing Eloquence settings panel: {e}")
 
 		super(SynthDriver, self).terminate()
 
@@ -862,6 +537,8 @@ class SynthDriver(synthDriverHandler.SynthDriver):
 		outlist = []
 		pending_indexes = []
 		queued_speech = False
+		text_chars = 0
+		streamed = False
 
 		# Reset prosody to baseline at the start of each utterance to prevent
 		# state leaks from previous speech sequences (issue #59).
@@ -873,66 +550,25 @@ class SynthDriver(synthDriverHandler.SynthDriver):
 
 		for item in speechSequence:
 			if isinstance(item, str):
-				s = str(item)
-				s = self.xspeakText(s)
-				outlist.append((_eloquence.speak, (s,)))
-				last = s
+				text_chars += len(item)
+				last, is_streamed = self._queueText(str(item), outlist)
+				streamed = streamed or is_streamed
+				queued_speech = True
+			elif isinstance(item, PhonemeCommand):
+				prepared, chars = self._queuePhoneme(item, outlist)
+				if prepared is None:
+					continue
+				last = prepared
+				text_chars += chars
 				queued_speech = True
 			elif isinstance(item, IndexCommand):
 				pending_indexes.append(item.index)
 				outlist.append((_eloquence.index, (item.index,)))
 			elif isinstance(item, BreakCommand):
-				# Eloquence doesn't respect delay time in milliseconds.
-				# Therefor we need to adjust waiting time depending on curernt speech rate
-				# The following table of adjustments has been measured empirically
-				# Then we do linear approximation
-				coefficients = {
-					10: 1,
-					43: 2,
-					60: 3,
-					75: 4,
-					85: 5,
-				}
-				ck = sorted(coefficients.keys())
-				if self.rate <= ck[0]:
-					factor = coefficients[ck[0]]
-				elif self.rate >= ck[-1]:
-					factor = coefficients[ck[-1]]
-				elif self.rate in ck:
-					factor = coefficients[ck[0]]
-				else:
-					li = [index for index, r in enumerate(ck) if r < self.rate][-1]
-					ri = li + 1
-					ra = ck[li]
-					rb = ck[ri]
-					factor = 1.0 * coefficients[ra] + (coefficients[rb] - coefficients[ra]) * (
-						self.rate - ra
-					) / (rb - ra)
-				pFactor = factor * item.time
-				pFactor = int(pFactor)
-				outlist.append((_eloquence.speak, (f"`p{pFactor}.",)))
+				outlist.append((_eloquence.speak, (f"`p{self._breakPause(item.time)}.",)))
 				queued_speech = True
 			elif isinstance(item, LangChangeCommand):
-				voice_id = self._resolve_voice_for_language(item.lang)
-				if voice_id is None:
-					log.debug("No Eloquence voice mapped for language '%s'", item.lang)
-					continue
-				voice_str = str(voice_id)
-				if voice_str == self.curvoice:
-					if item.lang is None:
-						self._languageOverrideActive = False
-					continue
-				try:
-					queued_voice = int(voice_id)
-				except (TypeError, ValueError):
-					log.debug(
-						"Skipping language change for '%s': invalid voice id %r",
-						item.lang,
-						voice_id,
-					)
-					continue
-				outlist.append((_eloquence.set_voice, (queued_voice,)))
-				self._update_voice_state(queued_voice, update_default=item.lang is None)
+				self._queueLangChange(item, outlist)
 			elif type(item) in self.PROSODY_ATTRS:
 				pr = self.PROSODY_ATTRS[type(item)]
 				# Use the raw _offset/_multiplier values directly, NOT the
@@ -952,65 +588,131 @@ class SynthDriver(synthDriverHandler.SynthDriver):
 					)
 				)
 		if not queued_speech:
-			# No speech queued. Ensure any state changes apply and emit indexes immediately
-			# so sayAll can advance even when there's nothing to speak.
-			for func, args in outlist:
-				if func is _eloquence.index:
-					continue
-				try:
-					func(*args)
-				except Exception:
-					log.exception("Synthesis command failed")
-			for index in pending_indexes:
-				synthIndexReached.notify(synth=self, index=index)
-			synthDoneSpeaking.notify(synth=self)
+			self._applyWithoutSpeech(outlist, pending_indexes)
 			return
 
 		# Trailing Pause Logic from IBMTTS:
-		if last is not None and last.rstrip()[-1] not in punctuation:
+		if last is not None:
 			# Mode 0 uses p0 for legacy speed performance
 			# Mode 1 and 2 use p1 for standard modern speed
 			p_val = "0" if self._pause_mode == 0 else "1"
-			outlist.append((_eloquence.speak, (f"`p{p_val} ",)))
+			outlist.append((_speak_trailing_pause, (last, p_val)))
 
 		outlist.append((_eloquence.index, (0xFFFF,)))
 		outlist.append((_eloquence.synth, ()))
+		self._queueUtterance(outlist, text_chars, streamed, len(pending_indexes))
+
+	def _queueText(self, text, outlist):
+		"""Queue *text* for the synth worker; returns ``(future of its prepared text, streamed)``."""
+		if len(text) > STREAM_THRESHOLD:
+			last = Future()
+			outlist.append((_speak_streamed, (text, self._textOptions(), last)))
+			return last, True
+		last = _submit_preprocess(text, self._textOptions())
+		outlist.append((_speak_prepared, (last,)))
+		return last, False
+
+	def _queuePhoneme(self, item, outlist):
+		"""Queue a PhonemeCommand as an SPR annotation, or its text when there is no SPR for it.
+
+		Returns ``(future of the prepared text, characters of text spoken)``;
+		the future is None when there is nothing to speak.
+		"""
+		spr = _eloquence.ipa_to_spr(item.ipa, _voice_tables().id_to_code.get(self.curvoice))
+		if spr:
+			# SPR annotations need backquote input, so bypass xspeakText.
+			prepared, chars = _submit_preprocess(f" `[{spr}] ", None), 0
+		elif item.text:
+			prepared, chars = _submit_preprocess(item.text, self._textOptions()), len(item.text)
+		else:
+			return None, 0
+		outlist.append((_speak_prepared, (prepared,)))
+		return prepared, chars
+
+	def _breakPause(self, time_ms):
+		"""Length of the Eloquence pause (`pN) for a break of *time_ms* milliseconds."""
+		# Eloquence doesn't respect delay time in milliseconds.
+		# Therefor we need to adjust waiting time depending on curernt speech rate
+		# The following table of adjustments has been measured empirically
+		# Then we do linear approximation
+		coefficients = {
+			10: 1,
+			43: 2,
+			60: 3,
+			75: 4,
+			85: 5,
+		}
+		ck = sorted(coefficients.keys())
+		if self.rate <= ck[0]:
+			factor = coefficients[ck[0]]
+		elif self.rate >= ck[-1]:
+			factor = coefficients[ck[-1]]
+		elif self.rate in ck:
+			factor = coefficients[ck[0]]
+		else:
+			li = [index for index, r in enumerate(ck) if r < self.rate][-1]
+			ri = li + 1
+			ra = ck[li]
+			rb = ck[ri]
+			factor = 1.0 * coefficients[ra] + (coefficients[rb] - coefficients[ra]) * (self.rate - ra) / (
+				rb - ra
+			)
+		return int(factor * time_ms)
+
+	def _queueLangChange(self, item, outlist):
+		voice_id = self._resolve_voice_for_language(item.lang)
+		if voice_id is None:
+			log.debug("No Eloquence voice mapped for language '%s'", item.lang)
+			return
+		voice_str = str(voice_id)
+		if voice_str == self.curvoice:
+			if item.lang is None:
+				self._languageOverrideActive = False
+			return
+		try:
+			queued_voice = int(voice_id)
+		except (TypeError, ValueError):
+			log.debug(
+				"Skipping language change for '%s': invalid voice id %r",
+				item.lang,
+				voice_id,
+			)
+			return
+		outlist.append((_eloquence.set_voice, (queued_voice,)))
+		self._update_voice_state(queued_voice, update_default=item.lang is None)
+
+	def _applyWithoutSpeech(self, outlist, pending_indexes):
+		# No speech queued. Ensure any state changes apply and emit indexes immediately
+		# so sayAll can advance even when there's nothing to speak.
+		for func, args in outlist:
+			if func is _eloquence.index:
+				continue
+			try:
+				func(*args)
+			except Exception:
+				log.exception("Synthesis command failed")
+		for index in pending_indexes:
+			synthIndexReached.notify(synth=self, index=index)
+		synthDoneSpeaking.notify(synth=self)
+
+	def _queueUtterance(self, outlist, text_chars, streamed, indexes):
+		"""Hand a complete utterance carrying *indexes* NVDA indexes to the synth worker."""
 		seq = _eloquence._client._sequence
-		_eloquence.synth_queue.put((outlist, seq))
+		_eloquence.synth_queue.put((outlist, seq), _speech_priority(text_chars, streamed), indexes)
 		_eloquence.process()
 
+	def _textOptions(self):
+		return _TextOptions(
+			voice_id=_eloquence.params[9],
+			backquote_tags=self._backquoteVoiceTags,
+			volume=self.getVParam(_eloquence.vlm),
+			pause_mode=self._pause_mode,
+			abbreviation_dict=self._ABRDICT,
+			phrase_prediction=self._phrasePrediction,
+		)
+
 	def xspeakText(self, text, should_pause=False):
-		text = _text_preprocessing.preprocess(text, _eloquence.params[9])
-		if not self._backquoteVoiceTags:
-			text = text.replace("`", " ")
-		text = "`vv%d %s" % (
-			self.getVParam(_eloquence.vlm),
-			text,
-		)  # no embedded commands
-
-		# IBMTTS Regex Injection Logic for dynamic pausing:
-		if self._pause_mode == 0:
-			# Mode 0 (Do not shorten) maps punctuation to p0 for legacy snappy performance.
-			text = pause_re.sub(r"\1 `p0\2\3\4", text)
-		elif self._pause_mode == 2:
-			# Mode 2 (Shorten all pauses) maps punctuation to p1 for consistent modern shortening.
-			text = pause_re.sub(r"\1 `p1\2\3\4", text)
-
-		text = time_re.sub(r"\1:\2 \3", text)
-		if self._ABRDICT:
-			text = "`da1 " + text
-		else:
-			text = "`da0 " + text
-		if self._phrasePrediction:
-			text = "`pp1 " + text
-		else:
-			text = "`pp0 " + text
-		# if two strings are sent separately, pause between them. This might fix some of the audio issues we're having.
-		if should_pause:
-			p_val = "0" if self._pause_mode == 0 else "1"
-			text = text + f" `p{p_val}."
-		return text
-		#  _eloquence.speak(text, index)
+		return prepare_text(text, self._textOptions(), should_pause)
 
 	# def cancel(self):
 	#  self.dll.eciStop(self.handle)
@@ -1152,22 +854,22 @@ class SynthDriver(synthDriverHandler.SynthDriver):
 		if not language:
 			return getattr(self, "_defaultVoice", None)
 		normalized = language.lower().replace("_", "-")
-		voice_id = LANGUAGE_TO_VOICE_ID.get(normalized)
+		voice_id = _voice_tables().language_to_id.get(normalized)
 		if voice_id:
 			return voice_id
 		primary, _, region = normalized.partition("-")
 		default_voice = getattr(self, "_defaultVoice", None)
-		default_lang = VOICE_ID_TO_BCP47.get(default_voice) if default_voice else None
+		default_lang = _voice_tables().id_to_bcp47.get(default_voice) if default_voice else None
 		if default_lang:
 			default_primary, _, default_region = default_lang.lower().partition("-")
 			if default_primary == primary and (not region or default_region == region):
 				return default_voice
-		candidates = PRIMARY_LANGUAGE_TO_VOICE_IDS.get(primary, [])
+		candidates = _voice_tables().primary_language_to_ids.get(primary, [])
 		if not candidates:
 			return None
 		if region:
 			for candidate in candidates:
-				candidate_tag = VOICE_ID_TO_BCP47.get(candidate)
+				candidate_tag = _voice_tables().id_to_bcp47.get(candidate)
 				if not candidate_tag:
 					continue
 				cand_primary, _, cand_region = candidate_tag.lower().partition("-")
@@ -1175,7 +877,7 @@ class SynthDriver(synthDriverHandler.SynthDriver):
 					return candidate
 			if primary == "es":
 				for candidate in candidates:
-					candidate_tag = VOICE_ID_TO_BCP47.get(candidate)
+					candidate_tag = _voice_tables().id_to_bcp47.get(candidate)
 					if candidate_tag and candidate_tag.lower().endswith("-419"):
 						return candidate
 		if default_lang and default_lang.lower().partition("-")[0] == primary:
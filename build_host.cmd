@@ -1,3 +1,13 @@
 @echo off
+rem Usage: build_host.cmd [onedir]
+rem   onedir  build the helper as a folder; it starts faster than the default single exe.
+if /I "%~1"=="onedir" goto onedir
 py -3.13-32 -m PyInstaller --onefile --noconsole --name eloquence_host32 host_eloquence32.py
+if exist addon\synthDrivers\eloquence_host32 rmdir /S /Q addon\synthDrivers\eloquence_host32
 copy /Y dist\eloquence_host32.exe addon\synthDrivers\eloquence_host32.exe
+goto :eof
+
+:onedir
+py -3.13-32 -m PyInstaller --onedir --noconsole --noconfirm --name eloquence_host32 host_eloquence32.py
+if exist addon\synthDrivers\eloquence_host32.exe del /Q addon\synthDrivers\eloquence_host32.exe
+xcopy /E /I /Y /Q dist\eloquence_host32 addon\synthDrivers\eloquence_host32
@@ -5,23 +5,36 @@ These files are IBM proprietary and intentionally excluded from source control.
 This script extracts them from the same upstream release artifact that the old
 build system used.
 
+The artifact is checked against the SHA-256 pinned in fetch_eci.sha256, and
+nothing is downloaded while that file is missing.  To create it, a maintainer
+runs the script once with --pin, checks the recorded digest against a
+trusted copy of the artifact and commits the file.  --pin is refused in CI
+(when the CI environment variable is set), so CI never trusts what it
+happens to download.
+
 Usage:
     python fetch_eci.py          # downloads if files are missing
     python fetch_eci.py --force  # re-downloads even if files exist
+    python fetch_eci.py --pin    # records the digest when none is pinned
 """
 
 import os
 import sys
 import shutil
-import tempfile
-import urllib.request
 import zipfile
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "addon", "synthDrivers"))
+
+import _eloquence_download  # noqa: E402
+
 UPSTREAM_URL = (
 	"https://github.com/pumper42nickel/eloquence_threshold"
 	"/releases/download/v0.20210417.01/eloquence.nvda-addon"
 )
 
+# "<sha256>  <file name>" of the upstream artifact, as written by sha256sum.
+PIN_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fetch_eci.sha256")
+
 DEST_DIR = os.path.join("addon", "synthDrivers", "eloquence")
 
 # The proprietary files we need from the upstream addon zip.
@@ -46,24 +59,52 @@ def files_present():
 	return all(os.path.exists(os.path.join(DEST_DIR, fname)) for fname in PROPRIETARY_FILES.values())
 
 
-def fetch():
+def pinned_sha256():
+	"""The pinned digest of the upstream artifact, or None if none is pinned yet."""
+	try:
+		with open(PIN_FILE, "r", encoding="ascii") as f:
+			return f.read().split()[0].lower()
+	except (OSError, IndexError):
+		return None
+
+
+def pin_sha256(digest):
+	with open(PIN_FILE, "w", encoding="ascii", newline="\n") as f:
+		f.write(f"{digest}  {UPSTREAM_URL.rsplit('/', 1)[-1]}\n")
+
+
+def show_progress(received, total):
+	if total:
+		print(f"\r  {received * 100 // total}% of {total // 1024} KB", end="", flush=True)
+
+
+def fetch(pin=False):
+	expected = pinned_sha256()
+	if expected is None:
+		name = os.path.basename(PIN_FILE)
+		if os.environ.get("CI"):
+			sys.exit(f"No digest is pinned in {name}; commit it before building in CI.")
+		if not pin:
+			sys.exit(f"No digest is pinned in {name}. Run with --pin to record it, check it and commit it.")
 	os.makedirs(DEST_DIR, exist_ok=True)
 
 	print(f"Downloading upstream addon from:\n  {UPSTREAM_URL}")
-	tmpfd, tmppath = tempfile.mkstemp(suffix=".nvda-addon")
-	os.close(tmpfd)
-	try:
-		urllib.request.urlretrieve(UPSTREAM_URL, tmppath)
-		print("Extracting proprietary files...")
-		with zipfile.ZipFile(tmppath, "r") as zf:
-			for zip_path, dest_name in PROPRIETARY_FILES.items():
-				dest_path = os.path.join(DEST_DIR, dest_name)
-				with zf.open(zip_path) as src, open(dest_path, "wb") as dst:
-					shutil.copyfileobj(src, dst)
-				print(f"  {dest_name}")
-		print("Done.")
-	finally:
-		os.unlink(tmppath)
+	# Kept in the download cache: an interrupted download resumes, and --force
+	# only re-checks the file with a conditional request.
+	result = _eloquence_download.download(UPSTREAM_URL, sha256=expected, progress=show_progress)
+	print("\n  (cached copy is current)" if result.not_modified else "")
+	if expected is None:
+		pin_sha256(result.sha256)
+		print(f"Recorded {result.sha256} in {os.path.basename(PIN_FILE)}.")
+		print("Check it against a trusted copy and commit it.")
+	print("Extracting proprietary files...")
+	with zipfile.ZipFile(result.path, "r") as zf:
+		for zip_path, dest_name in PROPRIETARY_FILES.items():
+			dest_path = os.path.join(DEST_DIR, dest_name)
+			with zf.open(zip_path) as src, open(dest_path, "wb") as dst:
+				shutil.copyfileobj(src, dst)
+			print(f"  {dest_name}")
+	print("Done.")
 
 
 def main():
@@ -71,7 +112,7 @@ def main():
 	if not force and files_present():
 		print("All proprietary files already present. Use --force to re-download.")
 		return
-	fetch()
+	fetch(pin="--pin" in sys.argv)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,56 @@
+"""Helper side of the driver/helper connection set-up.
+
+The driver's half lives in ``addon/synthDrivers/_eloquence_ipc.py``; this
+module opens the helper's end of whichever transport it chose.  It is
+imported by ``host_eloquence32.py`` before it connects back, so it only uses
+modules the helper loads at that point anyway.  ``tools/bench_ipc.py``
+imports it too, so the benchmark connects exactly as the helper does.
+"""
+
+from __future__ import annotations
+
+import os
+import socket
+import struct
+from typing import Dict, List, Optional
+
+# Length prefix of the socket.share frames, as written by the driver.
+_HEADER_STRUCT = struct.Struct("!I")
+
+
+def open_connections(args: Dict[str, Optional[str]]) -> List[socket.socket]:
+	"""Return the main and control sockets for whichever transport the controller chose."""
+	if args.get("fds"):
+		return [socket.socket(fileno=int(fd)) for fd in args["fds"].split(",")]
+	if args.get("share_pipe"):
+		import msvcrt
+
+		share_handle, pid_handle = (int(handle) for handle in args["share_pipe"].split(","))
+		# The controller shares the sockets with this process, which under a
+		# --onefile build is not the one it started.
+		with os.fdopen(msvcrt.open_osfhandle(pid_handle, os.O_WRONLY), "wb") as pipe:
+			pipe.write(_HEADER_STRUCT.pack(os.getpid()))
+		with os.fdopen(msvcrt.open_osfhandle(share_handle, os.O_RDONLY), "rb") as pipe:
+			socks = []
+			for _ in range(2):
+				(length,) = _HEADER_STRUCT.unpack(pipe.read(_HEADER_STRUCT.size))
+				socks.append(socket.fromshare(pipe.read(length)))
+		for sock in socks:
+			# socket.socketpair() is a loopback TCP pair on Windows.
+			sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+		return socks
+	authkey = bytes.fromhex(args["authkey"])
+	return [_connect(args["address"], authkey) for _ in range(2)]
+
+
+def _connect(address: str, authkey: bytes) -> socket.socket:
+	if address.startswith("unix:"):
+		sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		sock.connect(address[5:])
+		sock.sendall(authkey)
+		return sock
+	host, port_str = address.rsplit(":", 1)
+	sock = socket.create_connection((host, int(port_str)))
+	sock.sendall(authkey)
+	sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+	return sock
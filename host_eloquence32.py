@@ -9,57 +9,219 @@ The helper deliberately avoids importing NVDA modules to keep the
 runtime self contained.  All configuration required to load the DLL,
 open dictionaries and select the initial voice is provided by the
 controller process as part of the `initialize` command.
+
+Start-up is on the critical path of NVDA start-up and secure-screen speech,
+so only the modules needed to connect back to the controller are imported
+up front.  Logging, pickle and the INI helpers are loaded once connected.
 """
 
 from __future__ import annotations
 
-import argparse
-import logging
-import os
-import pickle
-import socket
-import struct
-import sys
-import threading
+import time
+
+# Taken before anything else is imported so the start-up report includes import time.
+_PROCESS_START = time.perf_counter()
+
+import os  # noqa: E402
+import socket  # noqa: E402
+import struct  # noqa: E402
+import sys  # noqa: E402
+import threading  # noqa: E402
 
 sys.path.append(os.path.join(os.path.dirname(__file__), "eloquence"))
-from dataclasses import dataclass
-from io import BytesIO
-from typing import Dict, Optional
+from typing import Dict, List, NamedTuple, Optional, Tuple  # noqa: E402
 
-import ctypes
-from ctypes import (
+import ctypes  # noqa: E402
+import functools  # noqa: E402
+from ctypes import (  # noqa: E402
 	POINTER,
+	c_char_p,
 	c_int,
 	c_short,
 	c_void_p,
 	cast,
 )
 
+from host_connect import open_connections  # noqa: E402
 
 _HEADER_STRUCT = struct.Struct("!I")
 
 
+class StartupTimer:
+	"""Milliseconds from interpreter start to each start-up milestone."""
+
+	def __init__(self) -> None:
+		self.marks: Dict[str, float] = {}
+
+	def mark(self, name: str) -> None:
+		if name not in self.marks:
+			self.marks[name] = round((time.perf_counter() - _PROCESS_START) * 1000.0, 1)
+
+	def report(self) -> Dict[str, object]:
+		return {"layout": frozen_layout(), "processUptimeMs": _process_uptime_ms(), "marks": dict(self.marks)}
+
+
+STARTUP = StartupTimer()
+
+
+def frozen_layout() -> str:
+	"""Describe how the helper was packaged: ``onefile``, ``onedir`` or ``script``."""
+	if not getattr(sys, "frozen", False):
+		return "script"
+	bundle_dir = getattr(sys, "_MEIPASS", None)
+	exe_dir = os.path.dirname(os.path.abspath(sys.executable))
+	# --onefile unpacks into a temporary _MEIxxxx directory on every launch.
+	if bundle_dir and os.path.normcase(os.path.abspath(bundle_dir)).startswith(os.path.normcase(exe_dir)):
+		return "onedir"
+	return "onefile"
+
+
+def _process_uptime_ms() -> Optional[float]:
+	"""Milliseconds since Windows created this process, or None if unknown."""
+	try:
+		import ctypes
+
+		kernel32 = ctypes.windll.kernel32
+		creation, exited, kernel, user, now = (ctypes.c_ulonglong() for _ in range(5))
+		if not kernel32.GetProcessTimes(
+			kernel32.GetCurrentProcess(),
+			ctypes.byref(creation),
+			ctypes.byref(exited),
+			ctypes.byref(kernel),
+			ctypes.byref(user),
+		):
+			return None
+		kernel32.GetSystemTimeAsFileTime(ctypes.byref(now))
+		# FILETIME values count 100 ns intervals.
+		return round((now.value - creation.value) / 10000.0, 1)
+	except Exception:
+		return None
+
+
+class OutboundWriter:
+	"""Send messages for a connection from a dedicated writer thread.
+
+	:meth:`send` only frames the message and queues it, so the ECI callback
+	returns to the engine at once however slowly the controller reads.  The
+	writer drains everything queued into a single ``sendall``.
+	"""
+
+	def __init__(self, conn: IpcConnection):
+		self._conn = conn
+		self._cond = threading.Condition()
+		# (is_audio, framed bytes) in send order.
+		self._queue: List[tuple] = []
+		self._bytes = 0
+		self._closed = False
+		self._high_water_depth = 0
+		self._high_water_bytes = 0
+		self._sent_frames = 0
+		self._sent_batches = 0
+		self._discarded_frames = 0
+		self._thread = threading.Thread(target=self._run, name="EloquenceWriter", daemon=True)
+		self._thread.start()
+
+	def send(self, payload) -> None:
+		is_audio = payload.get("event") == "audio"
+		frames = self._conn.encode(payload)
+		with self._cond:
+			if self._closed:
+				return
+			self._queue.append((is_audio, frames))
+			self._bytes += len(frames)
+			self._high_water_depth = max(self._high_water_depth, len(self._queue))
+			self._high_water_bytes = max(self._high_water_bytes, self._bytes)
+			self._cond.notify()
+
+	def discard_audio(self) -> int:
+		"""Drop audio that has not reached the socket yet; returns the number of frames dropped."""
+		with self._cond:
+			kept = [item for item in self._queue if not item[0]]
+			dropped = len(self._queue) - len(kept)
+			self._queue = kept
+			self._bytes = sum(len(frames) for _, frames in kept)
+			self._discarded_frames += dropped
+		return dropped
+
+	def metrics(self) -> Dict[str, int]:
+		with self._cond:
+			return {
+				"depth": len(self._queue),
+				"bytes": self._bytes,
+				"highWaterDepth": self._high_water_depth,
+				"highWaterBytes": self._high_water_bytes,
+				"sentFrames": self._sent_frames,
+				"sentBatches": self._sent_batches,
+				"discardedFrames": self._discarded_frames,
+			}
+
+	def close(self, timeout: float = 2.0) -> None:
+		"""Flush what is queued, then stop the writer thread."""
+		with self._cond:
+			self._closed = True
+			self._cond.notify()
+		self._thread.join(timeout)
+
+	def _run(self) -> None:
+		while True:
+			with self._cond:
+				while not self._queue and not self._closed:
+					self._cond.wait()
+				if not self._queue:
+					return
+				batch = self._queue
+				self._queue = []
+				self._bytes = 0
+			try:
+				self._conn.send_bytes(b"".join(frames for _, frames in batch))
+			except OSError as exc:
+				LOGGER.info("Controller connection lost while sending: %s", exc)
+				with self._cond:
+					self._closed = True
+					self._queue = []
+				return
+			self._sent_frames += len(batch)
+			self._sent_batches += 1
+
+
+class _DeferredLogger:
+	"""Forward to the helper's logger, importing :mod:`logging` on first use."""
+
+	def __getattr__(self, name):
+		import logging
+
+		return getattr(logging.getLogger("eloquence.host"), name)
+
+
 class IpcConnection:
 	"""Simple length-prefixed message channel built on sockets."""
 
 	def __init__(self, sock: socket.socket):
+		import pickle
+
 		self._sock = sock
 		self._send_lock = threading.Lock()
+		self._dumps = pickle.dumps
+		self._loads = pickle.loads
 
 	def send(self, payload):
-		data = pickle.dumps(payload, protocol=4)
-		header = _HEADER_STRUCT.pack(len(data))
+		self.send_bytes(self.encode(payload))
+
+	def encode(self, payload) -> bytes:
+		"""Return the framed bytes for *payload*, ready for :meth:`send_bytes`."""
+		data = self._dumps(payload, protocol=4)
+		return _HEADER_STRUCT.pack(len(data)) + data
+
+	def send_bytes(self, frames: bytes) -> None:
 		with self._send_lock:
-			self._sock.sendall(header)
-			self._sock.sendall(data)
+			self._sock.sendall(frames)
 
 	def recv(self):
 		header = self._recv_exact(_HEADER_STRUCT.size)
 		if not header:
 			raise EOFError
 		(length,) = _HEADER_STRUCT.unpack(header)
-		return pickle.loads(self._recv_exact(length))
+		return self._loads(self._recv_exact(length))
 
 	def close(self):
 		try:
@@ -80,6 +242,7 @@ class IpcConnection:
 		return b"".join(chunks)
 
 
+@functools.lru_cache(maxsize=None)
 def get_short_path(path):
 	"""Returns the 8.3 short path version of a long path, or the original path if it fails."""
 	try:
@@ -98,6 +261,130 @@ def get_short_path(path):
 		return path
 
 
+# Voice data entries in ECI.INI, e.g. ``Path=C:\dummy\enu.syn`` or ``Path_Rom=...``.  The shipped
+# file uses C:\dummy\ as a placeholder for the add-on's eloquence directory.
+_INI_PATH_PATTERN = r"^(Path(?:_Rom)?=)(.*\\)?([^\\\r\n]+)$"
+
+# Temporary directories holding the DLL and a resolved INI when the add-on is read-only.
+TEMP_COPY_PREFIX = "eloquence-eci-"
+
+
+def resolve_ini(ini_content: str, eloquence_dir: str) -> str:
+	"""Return *ini_content* with every voice data path pointing into *eloquence_dir*.
+
+	Paths are rewritten whatever directory they currently name, so an INI that
+	was resolved for a different install location (for example a copy made for
+	the secure screen) is corrected as well.
+	"""
+	import re
+
+	return re.sub(
+		_INI_PATH_PATTERN,
+		lambda m: f"{m.group(1)}{eloquence_dir}\\{m.group(3)}",
+		ini_content,
+		flags=re.M | re.I,
+	)
+
+
+def prepare_eci(eci_path: str) -> str:
+	"""Make sure ECI.INI next to *eci_path* points at its voice data.
+
+	Returns the path of the DLL to load.  The INI is only written when its
+	paths actually need to change, through a temporary file and an atomic
+	rename so concurrent hosts never see a partial file.  When the add-on
+	directory is read-only (e.g. the secure-screen copy), the DLL and a
+	resolved INI are placed in a per-user temporary directory instead.
+	"""
+	ini_path = eci_path[:-3] + "ini"
+	eloquence_dir = os.path.dirname(eci_path)
+	with open(ini_path, "r", encoding="utf-8") as f:
+		ini_content = f.read()
+	# Use short path to avoid encoding issues with legacy DLLs and Python's default encoding
+	resolved = resolve_ini(ini_content, get_short_path(eloquence_dir))
+	if resolved == ini_content:
+		return eci_path
+	try:
+		_write_atomic(ini_path, resolved.encode("utf-8"))
+		return eci_path
+	except OSError as exc:
+		LOGGER.warning("Cannot update %s (%s); using a temporary copy", ini_path, exc)
+	return _temporary_copy(eci_path, resolved)
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+	import tempfile
+
+	directory, name = os.path.split(path)
+	fd, tmp_path = tempfile.mkstemp(prefix=name + "-", suffix=".tmp", dir=directory)
+	try:
+		with os.fdopen(fd, "wb") as f:
+			f.write(data)
+		os.replace(tmp_path, path)
+	except BaseException:
+		try:
+			os.remove(tmp_path)
+		except OSError:
+			pass
+		raise
+
+
+def _temporary_copy(eci_path: str, resolved: str) -> str:
+	"""Place *eci_path* and the *resolved* INI in a temporary directory and return the DLL there.
+
+	The directory is named after the DLL and INI contents, so every launch
+	with the same files reuses one copy rather than leaving a new one behind
+	(the DLL stays mapped until the host exits, so it cannot be removed on
+	the way out).  Copies left by other versions are removed when no host
+	has their DLL loaded any more.
+	"""
+	import hashlib
+	import tempfile
+
+	dll_name = os.path.basename(eci_path)
+	with open(eci_path, "rb") as f:
+		dll_data = f.read()
+	ini_data = resolved.encode("utf-8")
+	digest = hashlib.sha256(dll_data + b"\0" + ini_data).hexdigest()[:16]
+	temp_root = tempfile.gettempdir()
+	copy_dir = os.path.join(temp_root, TEMP_COPY_PREFIX + digest)
+	_remove_stale_copies(temp_root, dll_name, keep=copy_dir)
+	os.makedirs(copy_dir, exist_ok=True)
+	copy_dll = os.path.join(copy_dir, dll_name)
+	for path, data in ((copy_dll, dll_data), (copy_dll[:-3] + "ini", ini_data)):
+		try:
+			with open(path, "rb") as f:
+				if f.read() == data:
+					continue
+		except OSError:
+			pass
+		_write_atomic(path, data)
+	return copy_dll
+
+
+def _remove_stale_copies(temp_root: str, dll_name: str, keep: str) -> None:
+	"""Remove earlier temporary ECI copies except *keep*; copies still loaded by a host are skipped."""
+	import shutil
+
+	try:
+		names = os.listdir(temp_root)
+	except OSError:
+		return
+	for name in names:
+		# Older hosts used one randomly named "eloquence-*" directory per launch.
+		path = os.path.join(temp_root, name)
+		if not name.startswith("eloquence-") or path == keep:
+			continue
+		dll_path = os.path.join(path, dll_name)
+		if not os.path.isfile(dll_path):
+			continue
+		try:
+			# Fails while another host has the DLL mapped; its copy is left alone.
+			os.remove(dll_path)
+		except OSError:
+			continue
+		shutil.rmtree(path, ignore_errors=True)
+
+
 # Constants mirrored from the old in-process implementation.
 Callback = ctypes.WINFUNCTYPE(c_int, c_int, c_int, c_int, c_void_p)
 
@@ -117,6 +404,88 @@ ECI_SYNTH_MODE = 8  # 0=Sentence, 1=Manual
 # A sentinel index value used by Eloquence to mark the end of a chunk.
 FINAL_INDEX = 0xFFFF
 
+# ECI calls allowed longer than the controller's deadline before counting as
+# hung, in milliseconds.  Switching language loads a new language module.
+ECI_CALL_DEADLINES_MS = {
+	"eciSetParam": 5000.0,
+}
+
+
+class CallMonitor:
+	"""Track the ECI call in progress so the controller can spot a wedged engine.
+
+	Progress is any engine callback.  Time spent waiting for audio credit or
+	paused is the controller's doing and does not count as a stall.
+	"""
+
+	def __init__(self) -> None:
+		self.deadline_ms = 0.0
+		self._call: Optional[str] = None
+		self._since = 0.0
+		self._waiting = False
+		self._paused = False
+
+	def enter(self, name: str) -> None:
+		self._since = time.perf_counter()
+		self._call = name
+
+	def leave(self) -> None:
+		self._call = None
+
+	def progress(self) -> None:
+		self._since = time.perf_counter()
+
+	def set_waiting(self, waiting: bool) -> None:
+		self._waiting = waiting
+		self._since = time.perf_counter()
+
+	def set_paused(self, paused: bool) -> None:
+		# A paused engine makes no callbacks, even before it reaches the one that holds it.
+		self._paused = paused
+		self._since = time.perf_counter()
+
+	def status(self) -> Dict[str, object]:
+		call = self._call
+		if call is None or self._waiting or self._paused or not self.deadline_ms:
+			return {"call": call, "stalledMs": 0.0, "hung": False}
+		stalled = (time.perf_counter() - self._since) * 1000.0
+		deadline = max(self.deadline_ms, ECI_CALL_DEADLINES_MS.get(call, 0.0))
+		return {"call": call, "stalledMs": round(stalled, 1), "hung": stalled > deadline}
+
+
+# Callback message identifiers (ECIMessage).
+MSG_WAVEFORM_BUFFER = 0
+MSG_PHONEME_BUFFER = 1
+MSG_INDEX_REPLY = 2
+
+# Dictionary volumes (ECIDictVolume).
+DICT_MAIN = 0
+DICT_ROOT = 1
+DICT_ABBR = 2
+
+# File name candidates for each dictionary volume, in order of preference.
+DICTIONARY_FILES = {
+	DICT_MAIN: ("enumain.dic", "main.dic"),
+	DICT_ROOT: ("enuroot.dic", "root.dic"),
+	DICT_ABBR: ("enuabbr.dic", "abbr.dic"),
+}
+
+# ECIDictError names, indexed by value.
+DICT_ERRORS = (
+	"DictNoError",
+	"DictNoEntry",
+	"DictFileNotFound",
+	"DictOutOfMemory",
+	"DictInternalError",
+	"DictAccessError",
+	"DictErrLookUpKey",
+	"DictInvalidVolume",
+)
+
+# Size in bytes of the buffer handed to eciGeneratePhonemes.  Longer results
+# are delivered through repeated eciPhonemeBuffer callbacks.
+PHONEME_BUFFER_SIZE = 1024
+
 LANGS: Dict[str, int] = {
 	"esm": 131073,
 	"esp": 131072,
@@ -133,11 +502,13 @@ LANGS: Dict[str, int] = {
 	"kor": 655360,  # Korean (0x000A0000)
 }
 
-LOGGER = logging.getLogger("eloquence.host")
+LOGGER = _DeferredLogger()
 
 
 def configure_logging(log_dir: Optional[str]) -> None:
 	"""Initialise logging for the helper."""
+	import logging
+
 	log_file = None
 	if log_dir:
 		log_file = os.path.join(log_dir, "eloquence-host.log")
@@ -153,8 +524,7 @@ def configure_logging(log_dir: Optional[str]) -> None:
 	)
 
 
-@dataclass
-class HostConfig:
+class HostConfig(NamedTuple):
 	eci_path: str
 	data_directory: str
 	language_code: str
@@ -166,24 +536,54 @@ class HostConfig:
 class EloquenceRuntime:
 	"""Wraps access to the 32-bit Eloquence DLL."""
 
-	def __init__(self, conn: IpcConnection, config: HostConfig):
+	def __init__(self, conn: OutboundWriter, config: HostConfig):
 		self._conn = conn
 		self._config = config
 		self._dll = None  # type: ignore[assignment]
 		self._handle = None  # type: ignore[assignment]
 		self._dictionary_handle = None
+		# Dictionary sets created through the dictionary commands, by id.  Id 0
+		# always refers to the live set registered with eciSetDict.
+		self._dictionaries: Dict[int, int] = {}
+		self._next_dict_id = 1
 		self._callback = Callback(self._on_callback)
-		self._audio_buffer = BytesIO()
+		self._audio_buffer = bytearray()
+		# Index marks reached since the last audio event, as (sample offset, index).
+		# They ride on the next audio event instead of travelling on their own.
+		self._marks: List[Tuple[int, int]] = []
 		self._samples = 3300
 		# eciSetOutputBuffer expects a pointer to 16-bit PCM samples.  Using a
 		# c_short array keeps the data in the correct format and avoids the
 		# char* semantics of create_string_buffer which truncate at the first
 		# NUL byte when passed as c_char_p.
 		self._buffer = (c_short * self._samples)()
+		# Phonemes are generated on an instance of their own, created on first
+		# use, so speech input queued on the main one is never touched.
+		self._phoneme_handle = None
+		self._phoneme_dictionary = None
+		self._phoneme_callback = Callback(self._on_phoneme_callback)
+		self._phoneme_buffer = ctypes.create_string_buffer(PHONEME_BUFFER_SIZE)
+		self._phoneme_chunks: List[bytes] = []
 		self._params: Dict[int, int] = {}
 		self._voice_params: Dict[int, int] = {}
 		self._speaking = False
 		self._saw_final_index = False
+		self._startup_sent = False
+		# Credit-based flow control: the controller grants a window of audio bytes
+		# and the callback waits once it is used up.  A window of 0 disables it.
+		self._flow = threading.Condition()
+		self._window = 0
+		self._credit = 0
+		self._generation = 0
+		# Generation of the input being rendered, stamped on its audio.
+		self._render_generation = 0
+		# Generation of the input queued in the engine but not yet rendered.
+		self._input_generation = 0
+		self._stopped = False
+		self._paused = False
+		self._credit_waits = 0
+		self._credit_wait_ms = 0.0
+		self._monitor = CallMonitor()
 
 	# ------------------------------------------------------------------
 	# Communication helpers
@@ -206,22 +606,8 @@ class EloquenceRuntime:
 
 	def _load_dll(self) -> None:
 		LOGGER.info("Loading Eloquence library from %s", self._config.eci_path)
-		ini_path = self._config.eci_path[:-3] + "ini"
-		eloquence_dir = os.path.dirname(self._config.eci_path)
-
-		# Read the entire INI file
-		with open(ini_path, "r", encoding="utf-8") as f:
-			ini_content = f.read()
-
-		# Replace C:\dummy\ with the actual eloquence directory
-		# Use short path to avoid encoding issues with legacy DLLs and Python's default encoding
-		short_eloquence_dir = get_short_path(eloquence_dir)
-		updated_content = ini_content.replace("C:\\dummy\\", short_eloquence_dir + "\\")
-
-		# Write the updated content back
-		with open(ini_path, "w", encoding="utf-8") as f:
-			f.write(updated_content)
-		self._dll = ctypes.windll.LoadLibrary(self._config.eci_path)
+		dll_path = prepare_eci(self._config.eci_path)
+		self._dll = ctypes.windll.LoadLibrary(dll_path)
 		self._dll.eciRegisterCallback.argtypes = [c_void_p, Callback, c_void_p]
 		self._dll.eciRegisterCallback.restype = None
 		self._dll.eciSetOutputBuffer.argtypes = [c_void_p, c_int, POINTER(c_short)]
@@ -239,11 +625,25 @@ class EloquenceRuntime:
 		result = self._dll.eciSetOutputBuffer(handle, self._samples, self._buffer)
 		if not result:
 			raise RuntimeError("eciSetOutputBuffer failed")
+		self._dll.eciNewDict.argtypes = [c_void_p]
+		self._dll.eciNewDict.restype = c_void_p
+		self._dll.eciSetDict.argtypes = [c_void_p, c_void_p]
+		self._dll.eciDeleteDict.argtypes = [c_void_p, c_void_p]
+		self._dll.eciDeleteDict.restype = c_void_p
+		self._dll.eciLoadDict.argtypes = [c_void_p, c_void_p, c_int, c_char_p]
+		self._dll.eciSaveDict.argtypes = [c_void_p, c_void_p, c_int, c_char_p]
+		self._dll.eciUpdateDict.argtypes = [c_void_p, c_void_p, c_int, c_char_p, c_char_p]
+		self._dll.eciDictLookup.argtypes = [c_void_p, c_void_p, c_int, c_char_p]
+		self._dll.eciDictLookup.restype = c_char_p
 		self._dictionary_handle = self._dll.eciNewDict(handle)
 		self._dll.eciSetDict(handle, self._dictionary_handle)
 		# Allow annotated input so that backquote commands are interpreted instead of spoken.
 		self._dll.eciSetParam(handle, ECI_INPUT_TYPE, 1)
 		self._params[ECI_INPUT_TYPE] = 1
+		# Sentence mode lets the engine start on the first complete sentence of
+		# a segment instead of analysing the whole input buffer first.
+		self._dll.eciSetParam(handle, ECI_SYNTH_MODE, 0)
+		self._params[ECI_SYNTH_MODE] = 0
 		self._params[9] = self._dll.eciGetParam(handle, 9)
 		self._voice_params[RATE] = self._dll.eciGetVoiceParam(handle, 0, RATE)
 		self._voice_params[PITCH] = self._dll.eciGetVoiceParam(handle, 0, PITCH)
@@ -259,66 +659,356 @@ class EloquenceRuntime:
 			# LOGGER.debug("Enabling abbreviation dictionary")
 			self._dll.eciSetParam(handle, 41, 1)
 
-	def _load_dictionaries(self) -> None:
+	def _load_dictionaries(
+		self, dict_handle: Optional[int] = None, engine: Optional[int] = None
+	) -> Dict[int, str]:
+		"""Load the user dictionary files into *dict_handle* (default: the live set).
+
+		*engine* is the ECI instance owning the set, the speech one by default.
+		Returns the ECIDictError name for every volume that had a file.
+		"""
+		if dict_handle is None:
+			dict_handle = self._dictionary_handle
+		if engine is None:
+			engine = self._handle
 		dictionary_dir = get_short_path(self._config.data_directory)
 		# LOGGER.debug("Loading dictionaries from %s", dictionary_dir)
-		main_candidates = ["enumain.dic", "main.dic"]
-		root_candidates = ["enuroot.dic", "root.dic"]
-		abbr_candidates = ["enuabbr.dic", "abbr.dic"]
-
-		for index, candidates in enumerate((main_candidates, root_candidates, abbr_candidates)):
+		results: Dict[int, str] = {}
+		for volume, candidates in DICTIONARY_FILES.items():
 			for candidate in candidates:
 				path = os.path.join(dictionary_dir, candidate)
 				if os.path.exists(path):
-					# LOGGER.debug("Loading dictionary index=%s file=%s", index, path)
-					self._dll.eciLoadDict(self._handle, self._dictionary_handle, index, path.encode("mbcs"))
+					# LOGGER.debug("Loading dictionary index=%s file=%s", volume, path)
+					result = self._dll.eciLoadDict(engine, dict_handle, volume, path.encode("mbcs"))
+					results[volume] = _dict_error_name(result)
 					break
+		return results
+
+	# ------------------------------------------------------------------
+	# Dictionary management
+	def _resolve_dict(self, dict_id: int) -> int:
+		if dict_id == 0:
+			return self._dictionary_handle
+		try:
+			return self._dictionaries[dict_id]
+		except KeyError:
+			raise ValueError(f"Unknown dictionary id {dict_id}") from None
+
+	def new_dict(self) -> int:
+		handle = self._dll.eciNewDict(self._handle)
+		if not handle:
+			raise RuntimeError("eciNewDict failed")
+		dict_id = self._next_dict_id
+		self._next_dict_id += 1
+		self._dictionaries[dict_id] = handle
+		return dict_id
+
+	def load_dict(self, dict_id: int, volume: int, path: str) -> str:
+		result = self._dll.eciLoadDict(
+			self._handle, self._resolve_dict(dict_id), volume, get_short_path(path).encode("mbcs")
+		)
+		return _dict_error_name(result)
+
+	def load_dict_files(self, dict_id: int) -> Dict[int, str]:
+		return self._load_dictionaries(self._resolve_dict(dict_id))
+
+	def save_dict(self, dict_id: int, volume: int, path: str) -> str:
+		result = self._dll.eciSaveDict(self._handle, self._resolve_dict(dict_id), volume, path.encode("mbcs"))
+		return _dict_error_name(result)
+
+	def update_dict(self, dict_id: int, volume: int, entries: List[tuple]) -> Dict[bytes, str]:
+		"""Apply ``(key, translation)`` pairs; a translation of None deletes the key.
+
+		Returns the failing keys mapped to their ECIDictError name.
+		"""
+		handle = self._resolve_dict(dict_id)
+		failures: Dict[bytes, str] = {}
+		for key, translation in entries:
+			result = self._dll.eciUpdateDict(self._handle, handle, volume, key, translation)
+			if result:
+				failures[key] = _dict_error_name(result)
+		return failures
+
+	def lookup_dict(self, dict_id: int, volume: int, keys: List[bytes]) -> List[Optional[bytes]]:
+		handle = self._resolve_dict(dict_id)
+		return [self._dll.eciDictLookup(self._handle, handle, volume, key) for key in keys]
+
+	def activate_dict(self, dict_id: int) -> None:
+		"""Atomically make dictionary *dict_id* the live set and free the old one."""
+		if dict_id == 0:
+			return
+		handle = self._resolve_dict(dict_id)
+		result = self._dll.eciSetDict(self._handle, handle)
+		if result:
+			raise RuntimeError(f"eciSetDict failed: {_dict_error_name(result)}")
+		del self._dictionaries[dict_id]
+		previous, self._dictionary_handle = self._dictionary_handle, handle
+		if previous:
+			self._dll.eciDeleteDict(self._handle, previous)
+		# The phoneme instance loaded the old files; it is rebuilt on next use.
+		self._delete_phoneme_engine()
+
+	def delete_dict(self, dict_id: int) -> None:
+		if dict_id == 0:
+			raise ValueError("The live dictionary cannot be deleted; activate a replacement instead")
+		handle = self._resolve_dict(dict_id)
+		del self._dictionaries[dict_id]
+		self._dll.eciDeleteDict(self._handle, handle)
+
+	def reload_dictionaries(self) -> Dict[int, str]:
+		"""Rebuild the dictionary set from disk and swap it in."""
+		dict_id = self.new_dict()
+		try:
+			results = self.load_dict_files(dict_id)
+			self.activate_dict(dict_id)
+		except Exception:
+			if dict_id in self._dictionaries:
+				self.delete_dict(dict_id)
+			raise
+		return results
 
 	# ------------------------------------------------------------------
 	# Public API invoked from the controller
-	def add_text(self, text: bytes) -> None:
+	def _call_eci(self, name: str, *args, engine: Optional[int] = None):
+		"""Call ECI function *name* on *engine* (default: the speech instance) under the hang monitor."""
+		self._monitor.enter(name)
+		try:
+			return getattr(self._dll, name)(self._handle if engine is None else engine, *args)
+		finally:
+			self._monitor.leave()
+
+	def set_call_deadline(self, deadline_ms: float) -> None:
+		"""Report an ECI call without progress for *deadline_ms* as hung; 0 disables."""
+		self._monitor.deadline_ms = max(0.0, float(deadline_ms))
+
+	def call_status(self) -> Dict[str, object]:
+		return self._monitor.status()
+
+	def add_text(self, text: bytes, generation: Optional[int] = None) -> None:
 		# LOGGER.debug("Adding %d bytes of text", len(text))
-		self._dll.eciAddText(self._handle, text)
+		if self._accept_input(generation):
+			self._call_eci("eciAddText", text)
 
-	def insert_index(self, index: int) -> None:
+	def insert_index(self, index: int, generation: Optional[int] = None) -> None:
 		# LOGGER.debug("Inserting index %s", index)
-		self._dll.eciInsertIndex(self._handle, index)
-
-	def synthesize(self) -> None:
+		if self._accept_input(generation):
+			self._dll.eciInsertIndex(self._handle, index)
+
+	def _accept_input(self, generation: Optional[int]) -> bool:
+		"""Return False for input of a stopped utterance, clearing input a stop left behind.
+
+		stop() runs on the control thread and must not call into ECI, so input
+		queued for an utterance that was stopped before it was rendered is
+		only dropped here, when input for a later one arrives.
+		"""
+		with self._flow:
+			current = self._generation
+		if generation is None:
+			generation = current
+		if generation < current:
+			return False
+		if generation != self._input_generation:
+			self._dll.eciClearInput(self._handle)
+			self._input_generation = generation
+		return True
+
+	def synthesize(self, final: bool = True, generation: Optional[int] = None) -> None:
+		"""Render the queued input; *final* False for a segment of a longer utterance.
+
+		*generation* is the controller's utterance sequence the input belongs
+		to.  Input queued before a later stop is dropped unrendered, and the
+		audio of the rest is stamped with it so the controller can discard
+		anything that arrives after a stop.
+		"""
 		# LOGGER.debug("Starting synthesis")
-		self._speaking = True
+		with self._flow:
+			if generation is not None and generation < self._generation:
+				stale = True
+			else:
+				stale = False
+				self._render_generation = self._generation if generation is None else generation
+				self._speaking = True
+				self._stopped = False
+		if stale:
+			self._dll.eciClearInput(self._handle)
+			self._marks = []
+			return
 		self._saw_final_index = False
 		try:
-			self._dll.eciSynthesize(self._handle)
-			if not self._dll.eciSynchronize(self._handle):
+			self._call_eci("eciSynthesize")
+			if not self._call_eci("eciSynchronize"):
 				LOGGER.warning("eciSynchronize reported failure")
 		finally:
-			self._speaking = False
-			# Ensure any buffered audio is pushed even if the final index was not
-			# delivered (for example if the controller stops early).
-			self._flush_audio()
-			# If no final index was delivered, still emit a final marker so NVDA
-			# receives synthDoneSpeaking (e.g. when there is no text to speak).
-			if not self._saw_final_index:
-				self._send_event("audio", data=b"", index=None, final=True)
-
-	def stop(self) -> None:
+			with self._flow:
+				self._speaking = False
+				stopped, self._stopped = self._stopped, False
+			if stopped:
+				# stop() only made the callbacks abort; reset the engine here, on its own thread.
+				self._dll.eciStop(self._handle)
+				self._audio_buffer.clear()
+				self._marks = []
+			else:
+				# Push buffered audio and marks no audio followed, and emit a final
+				# marker if no final index was delivered so NVDA still receives
+				# synthDoneSpeaking (e.g. when there is no text to speak).  Segments
+				# fed ahead of the rest of an utterance must not end it.
+				self._flush_audio(final=final and not self._saw_final_index)
+
+	def generate_phonemes(self, words: List[bytes]) -> List[str]:
+		"""Return the SPR phoneme string generated for each entry of *words*.
+
+		The words are converted on a separate ECI instance in manual synthesis
+		mode, which eciGeneratePhonemes requires, so speech input already
+		queued on the speech instance is neither phonemized nor cleared.  An
+		empty string is returned for words the engine could not convert.
+		"""
+		handle = self._phoneme_engine()
+		results: List[str] = []
+		for word in words:
+			self._phoneme_chunks = []
+			if not self._call_eci("eciAddText", word, engine=handle):
+				self._dll.eciClearInput(handle)
+				results.append("")
+				continue
+			ok = self._call_eci(
+				"eciGeneratePhonemes", PHONEME_BUFFER_SIZE, self._phoneme_buffer, engine=handle
+			)
+			self._dll.eciClearInput(handle)
+			if not ok:
+				LOGGER.warning("eciGeneratePhonemes failed for %r", word)
+				results.append("")
+				continue
+			results.append(b"".join(self._phoneme_chunks).decode("latin-1").strip())
+		self._phoneme_chunks = []
+		return results
+
+	def _phoneme_engine(self) -> int:
+		"""Return the phoneme instance, creating it with the speech instance's settings."""
+		language = self._params.get(9, LANGS.get(self._config.language_code, LANGS["enu"]))
+		if self._phoneme_handle and self._dll.eciGetParam(self._phoneme_handle, 9) != language:
+			self._delete_phoneme_engine()
+		if self._phoneme_handle:
+			return self._phoneme_handle
+		handle = self._dll.eciNewEx(language)
+		if not handle:
+			raise RuntimeError("Failed to create Eloquence phoneme handle")
+		self._phoneme_handle = handle
+		self._dll.eciRegisterCallback(handle, self._phoneme_callback, None)
+		for param_id, value in self._params.items():
+			if param_id not in (9, ECI_SYNTH_MODE):
+				self._dll.eciSetParam(handle, param_id, value)
+		self._dll.eciSetParam(handle, ECI_SYNTH_MODE, 1)
+		self._phoneme_dictionary = self._dll.eciNewDict(handle)
+		if self._phoneme_dictionary:
+			self._load_dictionaries(self._phoneme_dictionary, engine=handle)
+			self._dll.eciSetDict(handle, self._phoneme_dictionary)
+		return handle
+
+	def _delete_phoneme_engine(self) -> None:
+		if not self._phoneme_handle:
+			return
+		if self._phoneme_dictionary:
+			self._dll.eciDeleteDict(self._phoneme_handle, self._phoneme_dictionary)
+			self._phoneme_dictionary = None
+		self._dll.eciDelete(self._phoneme_handle)
+		self._phoneme_handle = None
+
+	@property
+	def speaking(self) -> bool:
+		return self._speaking
+
+	def set_audio_window(self, window: int, generation: int = 0) -> None:
+		with self._flow:
+			self._window = max(0, int(window))
+			self._credit = self._window
+			self._generation = generation
+			self._flow.notify_all()
+
+	def grant_credit(self, size: int, generation: int) -> None:
+		with self._flow:
+			# Grants for audio of an utterance that was since stopped were already reset.
+			if generation != self._generation:
+				return
+			self._credit = min(self._window, self._credit + size)
+			self._flow.notify_all()
+
+	def flow_metrics(self) -> Dict[str, object]:
+		with self._flow:
+			return {
+				"window": self._window,
+				"credit": self._credit,
+				"inFlight": self._window - self._credit if self._window else 0,
+				"waits": self._credit_waits,
+				"waitedMs": round(self._credit_wait_ms, 1),
+			}
+
+	def _consume_credit(self, size: int) -> bool:
+		"""Charge *size* bytes against the window, waiting for credit if it is used up.
+
+		Runs in the ECI callback.  Blocking here holds the engine mid-render
+		(callbacks may not call eciPause), which is also how the engine is
+		paused.  Returns False if speech was stopped while waiting.
+		"""
+		with self._flow:
+			if self._must_wait():
+				throttled = not self._paused
+				started = time.perf_counter()
+				self._monitor.set_waiting(True)
+				while self._speaking and self._must_wait():
+					self._flow.wait()
+				self._monitor.set_waiting(False)
+				if throttled:
+					self._credit_waits += 1
+					self._credit_wait_ms += (time.perf_counter() - started) * 1000.0
+			if not self._speaking:
+				return False
+			if self._window:
+				self._credit -= size
+			return True
+
+	def _must_wait(self) -> bool:
+		return self._paused or (self._window > 0 and self._credit <= 0)
+
+	def stop(self, generation: Optional[int] = None) -> None:
 		# LOGGER.debug("Stopping synthesis")
-		self._dll.eciStop(self._handle)
-		self._audio_buffer.seek(0)
-		self._audio_buffer.truncate(0)
-		self._speaking = False
-		self._send_event("stopped")
+		# Called from the control thread while synthesize() sits in eciSynchronize.
+		# ECI is not thread-safe, so this only makes the next callback abort the
+		# render; synthesize() resets the engine once eciSynchronize returns.
+		with self._flow:
+			self._speaking = False
+			self._stopped = True
+			self._paused = False
+			self._monitor.set_paused(False)
+			# The controller drops everything it has buffered, so the full window is free again.
+			self._credit = self._window
+			if generation is not None:
+				self._generation = generation
+			self._flow.notify_all()
+		# Audio still waiting for the socket belongs to the utterance being stopped.
+		self._conn.discard_audio()
+		self._send_event("stopped", generation=self._generation)
+
+	def pause(self, switch: bool) -> None:
+		# Held in the next audio callback rather than through eciPause, which
+		# may only be called on the thread running the engine.
+		with self._flow:
+			self._paused = bool(switch)
+			self._monitor.set_paused(self._paused)
+			self._flow.notify_all()
 
 	def delete(self) -> None:
 		# LOGGER.debug("Deleting Eloquence handle")
+		self._delete_phoneme_engine()
 		if self._handle:
+			for handle in self._dictionaries.values():
+				self._dll.eciDeleteDict(self._handle, handle)
+			self._dictionaries.clear()
 			self._dll.eciDelete(self._handle)
 			self._handle = None
 
 	def set_param(self, param_id: int, value: int) -> None:
 		# LOGGER.debug("Setting param %s=%s", param_id, value)
-		self._dll.eciSetParam(self._handle, param_id, value)
+		self._call_eci("eciSetParam", param_id, value)
 		self._params[param_id] = value
 		# When changing voice (param 9), update all voice parameters
 		if param_id == 9:
@@ -343,42 +1033,77 @@ class EloquenceRuntime:
 
 	# ------------------------------------------------------------------
 	# Callbacks from Eloquence
+	def _on_phoneme_callback(self, handle, message, length, user_data):
+		self._monitor.progress()
+		if message == MSG_PHONEME_BUFFER:
+			self._phoneme_chunks.append(ctypes.string_at(self._phoneme_buffer, length).split(b"\0", 1)[0])
+		return 1
+
 	def _on_callback(self, handle, message, length, user_data):
+		self._monitor.progress()
 		if not self._speaking:
 			return 2
 		# LOGGER.debug("Callback message=%s length=%s", message, length)
-		if message == 0:
+		if message == MSG_WAVEFORM_BUFFER:
+			STARTUP.mark("firstAudio")
 			# Audio data callback - send immediately without buffering
 			data = ctypes.string_at(cast(self._buffer, c_void_p), length * ctypes.sizeof(c_short))
+			if not self._consume_credit(len(data)):
+				return 2
 			# Send this chunk immediately to minimize latency
-			self._send_event("audio", data=data, index=None, final=False)
-		elif message == 2:
-			# Index callback
-			is_final = length == FINAL_INDEX
-			index_value = length if not is_final else None
-			# Send empty chunk with index marker
-			self._send_event("audio", data=b"", index=index_value, final=is_final)
-			if is_final:
+			self._send_audio(data)
+		elif message == MSG_INDEX_REPLY:
+			if length == FINAL_INDEX:
+				self._flush_audio(final=True)
 				self._saw_final_index = True
 				self._speaking = False
+			else:
+				# The engine reports an index once the audio before it has been
+				# delivered, so it sits at the start of whatever audio comes next.
+				self._marks.append((0, length))
 		return 1
 
-	def _flush_audio(self, index: Optional[int] = None, force: bool = False, final: bool = False) -> None:
-		if self._audio_buffer.tell() == 0:
-			if force or final:
-				self._send_event("audio", data=b"", index=index, final=final)
+	def _send_audio(self, data: bytes, final: bool = False) -> None:
+		marks, self._marks = self._marks, []
+		extra = {}
+		if data and not self._startup_sent:
+			# The first audio completes the start-up report; it rides along with it.
+			self._startup_sent = True
+			extra["startup"] = STARTUP.report()
+		self._send_event(
+			"audio", data=data, marks=marks, final=final, generation=self._render_generation, **extra
+		)
+
+	def _flush_audio(self, final: bool = False) -> None:
+		"""Send buffered audio and pending marks; *final* ends the utterance."""
+		if not (self._audio_buffer or self._marks or final):
 			return
-		payload = self._audio_buffer.getvalue()
-		self._audio_buffer.seek(0)
-		self._audio_buffer.truncate(0)
-		self._send_event("audio", data=payload, index=index, final=final)
+		payload = bytes(self._audio_buffer)
+		self._audio_buffer.clear()
+		self._send_audio(payload, final=final)
+
+
+def _dict_error_name(result: int) -> str:
+	if 0 <= result < len(DICT_ERRORS):
+		return DICT_ERRORS[result]
+	return f"DictError{result}"
 
 
 class HostController:
-	def __init__(self, conn: IpcConnection):
+	def __init__(self, conn: IpcConnection, control: Optional[IpcConnection] = None):
 		self._conn = conn
+		# Everything sent on the main connection goes through the writer to keep it in order.
+		self._out = OutboundWriter(conn)
+		self._control = control
 		self._runtime: Optional[EloquenceRuntime] = None
 		self._should_exit = False
+		# Served on their own thread so they act immediately, even mid-synthesis.
+		self._control_handlers = {
+			"stop": self._handle_stop,
+			"pause": self._handle_pause,
+			"ping": self._handle_ping,
+			"grantCredit": self._handle_grant_credit,
+		}
 		self._handlers = {
 			"initialize": self._handle_initialize,
 			"addText": self._handle_add_text,
@@ -389,39 +1114,69 @@ class HostController:
 			"setParam": self._handle_set_param,
 			"setVoiceParam": self._handle_set_voice_param,
 			"copyVoice": self._handle_copy_voice,
+			"generatePhonemes": self._handle_generate_phonemes,
+			"newDict": self._handle_new_dict,
+			"loadDict": self._handle_load_dict,
+			"updateDict": self._handle_update_dict,
+			"dictLookup": self._handle_dict_lookup,
+			"saveDict": self._handle_save_dict,
+			"deleteDict": self._handle_delete_dict,
+			"activateDict": self._handle_activate_dict,
+			"reloadDictionaries": self._handle_reload_dictionaries,
 		}
 
 	def serve_forever(self) -> None:
 		LOGGER.info("Host controller waiting for commands")
+		if self._control is not None:
+			threading.Thread(target=self._serve_control, name="EloquenceControl", daemon=True).start()
 		while not self._should_exit:
 			try:
 				message = self._conn.recv()
 			except (EOFError, ConnectionError, OSError) as exc:
 				LOGGER.info("Connection closed, stopping host controller: %s", exc)
 				break
-			if not isinstance(message, dict):
-				LOGGER.warning("Unexpected message %r", message)
-				continue
-			msg_type = message.get("type")
-			if msg_type != "command":
-				LOGGER.warning("Unsupported message %s", msg_type)
-				continue
-			msg_id = message.get("id")
-			command = message.get("command")
-			handler = self._handlers.get(command)
-			if handler is None:
-				LOGGER.error("Unknown command %s", command)
-				self._conn.send({"type": "response", "id": msg_id, "error": "unknownCommand"})
-				continue
+			command = self._dispatch(self._out, message, self._handlers)
+			# Exit after sending response to delete command
+			if command == "delete" and self._should_exit:
+				break
+		self._out.close()
+
+	def _serve_control(self) -> None:
+		while not self._should_exit:
 			try:
-				payload = handler(**message.get("payload", {}))
-				self._conn.send({"type": "response", "id": msg_id, "payload": payload})
-				# Exit after sending response to delete command
-				if command == "delete" and self._should_exit:
-					break
-			except Exception as exc:
-				LOGGER.exception("Command %s failed", command)
-				self._conn.send({"type": "response", "id": msg_id, "error": str(exc)})
+				message = self._control.recv()
+			except (EOFError, ConnectionError, OSError) as exc:
+				LOGGER.info("Control connection closed: %s", exc)
+				break
+			self._dispatch(self._control, message, self._control_handlers)
+		# No more credit or resume can arrive; don't leave a callback waiting for it.
+		if self._runtime:
+			self._runtime.set_audio_window(0)
+			self._runtime.pause(False)
+
+	def _dispatch(self, conn, message, handlers) -> Optional[str]:
+		"""Run one command message and send its response through *conn*."""
+		if not isinstance(message, dict):
+			LOGGER.warning("Unexpected message %r", message)
+			return None
+		msg_type = message.get("type")
+		if msg_type != "command":
+			LOGGER.warning("Unsupported message %s", msg_type)
+			return None
+		msg_id = message.get("id")
+		command = message.get("command")
+		handler = handlers.get(command)
+		if handler is None:
+			LOGGER.error("Unknown command %s", command)
+			conn.send({"type": "response", "id": msg_id, "error": "unknownCommand"})
+			return command
+		try:
+			payload = handler(**message.get("payload", {}))
+			conn.send({"type": "response", "id": msg_id, "payload": payload})
+		except Exception as exc:
+			LOGGER.exception("Command %s failed", command)
+			conn.send({"type": "response", "id": msg_id, "error": str(exc)})
+		return command
 
 	# ------------------------------------------------------------------
 	# Command handlers
@@ -434,26 +1189,50 @@ class HostController:
 			enable_phrase_prediction=payload.get("enablePhrasePrediction", False),
 			voice_variant=payload.get("voiceVariant", 0),
 		)
-		self._runtime = EloquenceRuntime(self._conn, config)
+		self._runtime = EloquenceRuntime(self._out, config)
+		self._runtime.set_audio_window(payload.get("audioWindowBytes", 0), payload.get("generation", 0))
+		self._runtime.set_call_deadline(payload.get("eciDeadlineMs", 0))
 		self._runtime.start()
-		return self._runtime.get_state()
+		STARTUP.mark("initialized")
+		state = self._runtime.get_state()
+		state["startup"] = STARTUP.report()
+		return state
+
+	def _handle_add_text(self, text: bytes, generation: Optional[int] = None):
+		self._runtime.add_text(text, generation)
+		return {"status": "ok"}
+
+	def _handle_insert_index(self, value: int, generation: Optional[int] = None):
+		self._runtime.insert_index(value, generation)
+		return {"status": "ok"}
 
-	def _handle_add_text(self, text: bytes):
-		self._runtime.add_text(text)
+	def _handle_synthesize(self, final: bool = True, generation: Optional[int] = None):
+		self._runtime.synthesize(final, generation)
 		return {"status": "ok"}
 
-	def _handle_insert_index(self, value: int):
-		self._runtime.insert_index(value)
+	def _handle_stop(self, generation: Optional[int] = None):
+		if self._runtime:
+			self._runtime.stop(generation)
 		return {"status": "ok"}
 
-	def _handle_synthesize(self):
-		self._runtime.synthesize()
+	def _handle_grant_credit(self, size: int, generation: int):
+		if self._runtime:
+			self._runtime.grant_credit(size, generation)
 		return {"status": "ok"}
 
-	def _handle_stop(self):
-		self._runtime.stop()
+	def _handle_pause(self, switch: bool):
+		if self._runtime:
+			self._runtime.pause(switch)
 		return {"status": "ok"}
 
+	def _handle_ping(self):
+		return {
+			"speaking": bool(self._runtime and self._runtime.speaking),
+			"outbound": self._out.metrics(),
+			"flow": self._runtime.flow_metrics() if self._runtime else {},
+			"eci": self._runtime.call_status() if self._runtime else {},
+		}
+
 	def _handle_delete(self):
 		if self._runtime:
 			self._runtime.delete()
@@ -474,27 +1253,95 @@ class HostController:
 		self._runtime.copy_voice(variant)
 		return self._runtime.get_state()
 
+	def _handle_generate_phonemes(self, words: List[bytes]):
+		return {"phonemes": self._runtime.generate_phonemes(words)}
+
+	def _handle_new_dict(self, loadFiles: bool = False):
+		dict_id = self._runtime.new_dict()
+		results = self._runtime.load_dict_files(dict_id) if loadFiles else {}
+		return {"dictId": dict_id, "results": results}
+
+	def _handle_load_dict(self, volume: int, path: str, dictId: int = 0):
+		return {"result": self._runtime.load_dict(dictId, volume, path)}
+
+	def _handle_update_dict(self, volume: int, entries: List[tuple], dictId: int = 0):
+		return {"failures": self._runtime.update_dict(dictId, volume, entries)}
+
+	def _handle_dict_lookup(self, volume: int, keys: List[bytes], dictId: int = 0):
+		return {"translations": self._runtime.lookup_dict(dictId, volume, keys)}
+
+	def _handle_save_dict(self, volume: int, path: str, dictId: int = 0):
+		return {"result": self._runtime.save_dict(dictId, volume, path)}
+
+	def _handle_delete_dict(self, dictId: int):
+		self._runtime.delete_dict(dictId)
+		return {"status": "ok"}
+
+	def _handle_activate_dict(self, dictId: int):
+		self._runtime.activate_dict(dictId)
+		return {"status": "ok"}
+
+	def _handle_reload_dictionaries(self):
+		return {"results": self._runtime.reload_dictionaries()}
+
+
+_OPTIONS = ("--address", "--authkey", "--log-dir", "--fds", "--share-pipe")
+
+
+def parse_args(argv: List[str]) -> Dict[str, Optional[str]]:
+	"""Parse ``--option value`` pairs without paying for :mod:`argparse`.
+
+	Anything unexpected (``--help``, unknown or missing options) is handed to
+	argparse so users still get the usual usage message.
+	"""
+	args: Dict[str, Optional[str]] = {"log_dir": None}
+	items = iter(argv)
+	for item in items:
+		option, sep, value = item.partition("=")
+		if option not in _OPTIONS:
+			return _parse_args_fallback(argv)
+		if not sep:
+			value = next(items, None)
+			if value is None:
+				return _parse_args_fallback(argv)
+		args[option[2:].replace("-", "_")] = value
+	inherited = "fds" in args or "share_pipe" in args
+	if not inherited and ("address" not in args or "authkey" not in args):
+		return _parse_args_fallback(argv)
+	return args
+
+
+def _parse_args_fallback(argv: List[str]) -> Dict[str, Optional[str]]:
+	import argparse
 
-def main() -> None:
 	parser = argparse.ArgumentParser(description="Eloquence 32-bit helper")
-	parser.add_argument("--address", required=True)
-	parser.add_argument("--authkey", required=True)
+	parser.add_argument("--address", help="host:port or unix:path to connect back to")
+	parser.add_argument("--authkey")
+	parser.add_argument("--fds", help="inherited main,control socket descriptors (POSIX)")
+	parser.add_argument("--share-pipe", help="inherited pipe handle carrying socket.share data (Windows)")
 	parser.add_argument("--log-dir", default=None)
-	args = parser.parse_args()
-
-	configure_logging(args.log_dir)
-	LOGGER.info("Connecting to controller at %s", args.address)
-
-	host, port_str = args.address.split(":")
-	address = (host, int(port_str))
-	authkey = bytes.fromhex(args.authkey)
-	sock = socket.create_connection(address)
-	sock.sendall(authkey)
-	sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
-	conn = IpcConnection(sock)
-	controller = HostController(conn)
+	args = parser.parse_args(argv)
+	if not (args.fds or args.share_pipe or (args.address and args.authkey)):
+		parser.error("either --fds, --share-pipe or --address with --authkey is required")
+	return vars(args)
+
+
+def main() -> None:
+	args = parse_args(sys.argv[1:])
+
+	# Connect back first so the controller knows the helper is alive before
+	# the remaining modules are loaded.
+	# The second connection carries stop/pause/ping so they never queue behind other traffic.
+	sock, control_sock = open_connections(args)
+	STARTUP.mark("connected")
+
+	configure_logging(args["log_dir"])
+	LOGGER.info("Connected to controller (%s)", args.get("address") or "inherited sockets")
+	controller = HostController(IpcConnection(sock), IpcConnection(control_sock))
 	controller.serve_forever()
 
 
+STARTUP.mark("moduleLoaded")
+
 if __name__ == "__main__":
 	main()
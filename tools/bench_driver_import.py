@@ -0,0 +1,105 @@
+"""Measure how long NVDA takes to import the Eloquence synth driver.
+
+NVDA imports every synth driver to list it in the synthesizer dialog and calls
+``check()`` on it, so this import sits on the path of synth enumeration and
+switching.  The NVDA modules the driver needs are replaced with stubs; each
+run happens in a fresh interpreter so caches do not hide the cost.
+
+Usage: python tools/bench_driver_import.py [--runs N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ADDON_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "addon")
+
+# Runs inside the child interpreter.
+_CHILD = r"""
+import builtins, importlib.abc, importlib.machinery, json, sys, time, types
+
+STUBS = {
+	"addonHandler", "autoSettingsUtils", "autoSettingsUtils.driverSetting", "autoSettingsUtils.utils",
+	"buildVersion", "config", "core", "driverHandler", "globalVars", "gui", "nvwave", "speech",
+	"speech.commands", "synthDriverHandler", "winsound", "wx",
+}
+loaded = []
+
+
+class Stub:
+	def __init__(self, *args, **kwargs):
+		pass
+
+	def __getattr__(self, name):
+		return Stub()
+
+	def __call__(self, *args, **kwargs):
+		return Stub()
+
+
+class StubClassMeta(type):
+	def __getattr__(cls, name):
+		return Stub
+
+
+class StubClass(Stub, metaclass=StubClassMeta):
+	pass
+
+
+class StubFinder(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+	def find_spec(self, name, path, target=None):
+		if name in STUBS:
+			return importlib.machinery.ModuleSpec(name, self, is_package=True)
+		return None
+
+	def create_module(self, spec):
+		module = types.ModuleType(spec.name)
+		module.__path__ = []
+		module.__getattr__ = lambda attr: 2024 if attr == "version_year" else StubClass
+		return module
+
+	def exec_module(self, module):
+		loaded.append(module.__name__)
+
+
+sys.meta_path.insert(0, StubFinder())
+builtins._ = lambda text: text
+sys.path.insert(0, sys.argv[1])
+before = set(sys.modules)
+start = time.perf_counter()
+import synthDrivers.eloquence
+imported = time.perf_counter()
+own = sorted(m for m in set(sys.modules) - before if m.startswith("synthDrivers"))
+print(json.dumps({"importMs": (imported - start) * 1000.0, "stubs": sorted(loaded), "driverModules": own}))
+"""
+
+
+def run_once() -> dict:
+	output = subprocess.run(
+		[sys.executable, "-c", _CHILD, ADDON_DIR],
+		check=True,
+		capture_output=True,
+		text=True,
+	).stdout
+	return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--runs", type=int, default=20)
+	args = parser.parse_args()
+	results = [run_once() for _ in range(args.runs)]
+	times = sorted(result["importMs"] for result in results)
+	median = statistics.median(times)
+	print(f"driver import over {args.runs} runs: median {median:.1f} ms, min {times[0]:.1f} ms")
+	print("NVDA modules imported:", ", ".join(results[-1]["stubs"]))
+	print("add-on modules imported:", ", ".join(results[-1]["driverModules"]))
+
+
+if __name__ == "__main__":
+	main()
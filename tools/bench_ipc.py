@@ -0,0 +1,112 @@
+"""Compare the driver/helper IPC transports.
+
+For every transport available on this platform an echo child is spawned the
+way the driver spawns the helper.  Reported per transport: time from spawn
+to the first answered message, round-trip latency for small messages, and
+throughput for audio-sized (6600 byte) events.
+
+Usage: python tools/bench_ipc.py [--messages N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADDON_DIR = os.path.join(REPO_DIR, "addon")
+sys.path.insert(0, os.path.join(ADDON_DIR, "synthDrivers"))
+
+import _eloquence_ipc as ipc  # noqa: E402
+
+# Runs inside the child interpreter: connect as the helper does, then echo
+# every message back on the same connection.
+_CHILD = r"""
+import sys
+sys.path[:0] = sys.argv[1:3]
+import _eloquence_ipc as ipc
+from host_connect import open_connections
+argv = sys.argv[3:]
+options = {argv[i][2:].replace("-", "_"): argv[i + 1] for i in range(0, len(argv), 2)}
+main, control = (ipc.IpcConnection(sock) for sock in open_connections(options))
+while True:
+	try:
+		message = main.recv()
+	except EOFError:
+		break
+	main.send(message if message.get("echo", True) else {"ack": True})
+"""
+
+AUDIO_CHUNK = b"\0" * 6600
+
+
+def bench(name: str, messages: int) -> dict:
+	transport = ipc.create_transport(name)
+	args, popen_kwargs = transport.prepare()
+	started = time.perf_counter()
+	proc = subprocess.Popen(
+		[sys.executable, "-c", _CHILD, os.path.join(ADDON_DIR, "synthDrivers"), REPO_DIR, *args],
+		**popen_kwargs,
+	)
+	try:
+		conn, control = transport.connect(proc)
+		transport.close()
+		conn.send({"ping": True})
+		conn.recv()
+		ready_ms = (time.perf_counter() - started) * 1000.0
+
+		latencies = []
+		for i in range(messages):
+			sent = time.perf_counter()
+			conn.send({"id": i})
+			conn.recv()
+			latencies.append((time.perf_counter() - sent) * 1e6)
+
+		# Acks are read concurrently, as the driver's receiver thread would.
+		reader = threading.Thread(target=lambda: [conn.recv() for _ in range(messages)])
+		sent = time.perf_counter()
+		reader.start()
+		for i in range(messages):
+			conn.send({"event": "audio", "data": AUDIO_CHUNK, "echo": False})
+		reader.join()
+		elapsed = time.perf_counter() - sent
+		conn.close()
+		control.close()
+	finally:
+		proc.wait(timeout=5)
+	latencies.sort()
+	return {
+		"readyMs": ready_ms,
+		"rttMedianUs": statistics.median(latencies),
+		"rttP99Us": latencies[int(len(latencies) * 0.99) - 1],
+		"audioMsgPerSec": messages / elapsed,
+		"audioMBPerSec": messages * len(AUDIO_CHUNK) / elapsed / 1e6,
+	}
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--messages", type=int, default=5000)
+	args = parser.parse_args()
+	names = [name for name, cls in ipc.TRANSPORTS.items() if cls.available()]
+	header = ("transport", "ready ms", "rtt p50 us", "rtt p99 us", "audio msg/s", "MB/s")
+	print("{:<12}{:>10}{:>12}{:>12}{:>13}{:>8}".format(*header))
+	for name in names:
+		try:
+			r = bench(name, args.messages)
+		except Exception as exc:
+			print(f"{name:<12}failed: {exc}")
+			continue
+		print(
+			f"{name:<12}{r['readyMs']:>10.1f}{r['rttMedianUs']:>12.1f}{r['rttP99Us']:>12.1f}"
+			f"{r['audioMsgPerSec']:>13.0f}{r['audioMBPerSec']:>8.1f}"
+		)
+
+
+if __name__ == "__main__":
+	main()
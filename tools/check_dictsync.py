@@ -0,0 +1,116 @@
+"""Check the background dictionary sync against a local stand-in for GitHub.
+
+Runs the sync the settings panel starts, with the repository archive served
+from a loopback HTTP server (see ``standin_server.py``) and a temporary
+dictionary folder and download cache.  Covered: the first sync, an
+unchanged archive answered with 304, a changed archive merging only new
+entries, an interrupted merge finished by the next sync, and cancellation
+during the download.  Exits non-zero on any failure.
+
+Usage: python tools/check_dictsync.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import zipfile
+from typing import Optional
+
+ADDON_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "addon")
+sys.path.insert(0, ADDON_DIR)
+
+from standin_server import StandInServer  # noqa: E402
+from synthDrivers import _eloquence_dictsync as dictsync  # noqa: E402
+
+REPO = "/eloquence-dictionaries"
+ARCHIVE = REPO + "/archive/master.zip"
+FIRST = {"enumain.dic": "hello\t[h1Elo]\nworld [w1Rld]\n", "enuroot.dic": "ok\t[o1ke]\n"}
+# One changed pronunciation (kept local) and one new word (merged).
+SECOND = {"enumain.dic": "hello\t[h2Elo]\nnew\t[n1u]\n", "enuroot.dic": "ok\t[o1ke]\n"}
+# A new word in the second file, which a merge cancelled after the first file misses.
+THIRD = {"enumain.dic": SECOND["enumain.dic"], "enuroot.dic": "ok\t[o1ke]\nfresh\t[f1rES]\n"}
+LARGE = {"enumain.dic": "".join(f"word{i}\t[w1Rd]\n" for i in range(20000))}
+
+
+def _archive(files) -> bytes:
+	buffer = io.BytesIO()
+	with zipfile.ZipFile(buffer, "w") as zf:
+		for name, text in files.items():
+			zf.writestr(f"eloquence-dictionaries-master/{name}", text.encode("utf-8"))
+	return buffer.getvalue()
+
+
+def _sync(server: StandInServer, dest: str, cache: str, cancel_on: Optional[str] = None):
+	results = []
+	worker = None
+
+	def progress(percent, stage, detail):
+		if stage == cancel_on:
+			worker.cancel()
+
+	worker = dictsync.DictionarySync(server.url(REPO), dest, progress, results.append, cache_dir=cache)
+	worker.start()
+	worker.join(30)
+	return results[0] if results else None
+
+
+def _read(path: str) -> str:
+	with open(path, "r", encoding="cp1252") as f:
+		return f.read()
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.parse_args()
+	failures = []
+
+	def check(name, ok, detail=None):
+		print(f"{'ok  ' if ok else 'FAIL'} {name}" + ("" if ok else f": {detail}"))
+		if not ok:
+			failures.append(name)
+
+	with tempfile.TemporaryDirectory() as tmp, StandInServer() as server:
+		dest, cache = os.path.join(tmp, "dest"), os.path.join(tmp, "cache")
+		main_dic = os.path.join(dest, "enumain.dic")
+		server.publish(ARCHIVE, _archive(FIRST))
+		result = _sync(server, dest, cache)
+		check("first sync merges every file", result and (result.updates, result.files) == (3, 2), result)
+		check("first sync writes tab-separated entries", "world\t[w1Rld]" in _read(main_dic), _read(main_dic))
+
+		result = _sync(server, dest, cache)
+		statuses = server.statuses(ARCHIVE)
+		check("unchanged archive is not merged again", result and result.unchanged, result)
+		check("unchanged archive is answered with 304", statuses[-1] == 304, statuses)
+
+		server.publish(ARCHIVE, _archive(SECOND))
+		result = _sync(server, dest, cache)
+		statuses = server.statuses(ARCHIVE)
+		check("changed archive adds new words", result and (result.updates, result.files) == (1, 2), result)
+		check("changed archive is downloaded in full", statuses[-1] == 200, statuses)
+
+		root_dic = os.path.join(dest, "enuroot.dic")
+		server.publish(ARCHIVE, _archive(THIRD))
+		result = _sync(server, dest, cache, cancel_on=dictsync.STAGE_MERGING)
+		check("interrupted merge misses the second file", "fresh" not in _read(root_dic), _read(root_dic))
+		result = _sync(server, dest, cache)
+		statuses = server.statuses(ARCHIVE)
+		check("archive of an interrupted merge is answered with 304", statuses[-1] == 304, statuses)
+		check("interrupted merge is finished by the next sync", "fresh\t[f1rES]" in _read(root_dic), result)
+
+		before = _read(main_dic)
+		server.publish(ARCHIVE, _archive(LARGE))
+		server.slow(ARCHIVE, 0.01)
+		result = _sync(server, dest, cache, cancel_on=dictsync.STAGE_DOWNLOADING)
+		check("cancelled sync reports cancellation", result and result.cancelled, result)
+		check("cancelled sync leaves the dictionaries alone", _read(main_dic) == before)
+
+	print(f"{len(failures)} failures")
+	sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+	main()
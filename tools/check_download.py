@@ -0,0 +1,141 @@
+"""Check the shared download helper against a local stand-in server.
+
+Every download goes to a temporary cache from a loopback HTTP server (see
+``standin_server.py``).  The checks cover:
+
+- a verified first download;
+- a cache hit on the expected SHA-256 without any request;
+- a 304 revalidation;
+- resuming after dropped connections;
+- a hash mismatch;
+- cancellation and a later resume;
+- a file that changed before the resume;
+- server errors and rate limiting retried, other client errors not.
+
+Exits non-zero on any failure.
+
+Usage: python tools/check_download.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import urllib.error
+
+ADDON_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "addon")
+sys.path.insert(0, ADDON_DIR)
+
+from standin_server import StandInServer  # noqa: E402
+from synthDrivers import _eloquence_download as dl  # noqa: E402
+
+# Large enough for several reads of CHUNK_SIZE.
+DATA = os.urandom(3 * dl.CHUNK_SIZE + 1234)
+CHANGED = os.urandom(len(DATA))
+
+
+def _sha256(data: bytes) -> str:
+	return hashlib.sha256(data).hexdigest()
+
+
+def _read(path: str) -> bytes:
+	with open(path, "rb") as f:
+		return f.read()
+
+
+def _cancel_after_first_read():
+	reads = []
+	return (lambda received, total: reads.append(received)), (lambda: bool(reads))
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.parse_args()
+	# Dropped connections are retried at once rather than after a back-off.
+	dl.RETRY_DELAY = 0
+	failures = []
+
+	def check(name, ok, detail=None):
+		print(f"{'ok  ' if ok else 'FAIL'} {name}" + ("" if ok else f": {detail}"))
+		if not ok:
+			failures.append(name)
+
+	with tempfile.TemporaryDirectory() as cache, StandInServer() as server:
+		server.publish("/a", DATA)
+		url = server.url("/a")
+		result = dl.download(url, sha256=_sha256(DATA), cache_dir=cache)
+		complete = _read(result.path) == DATA and result.fetched == len(DATA)
+		check("first download is complete", complete, result)
+
+		requests = len(server.requests)
+		result = dl.download(url, sha256=_sha256(DATA), cache_dir=cache)
+		check("known hash is served from the cache", result.not_modified, result)
+		check("known hash makes no request", len(server.requests) == requests, server.requests[requests:])
+
+		result = dl.download(url, cache_dir=cache)
+		statuses = server.statuses("/a")
+		check("unchanged file is revalidated with 304", result.not_modified and statuses[-1] == 304, statuses)
+
+		server.publish("/b", DATA)
+		server.drop_after("/b", 100000, 200000)
+		result = dl.download(server.url("/b"), sha256=_sha256(DATA), cache_dir=cache)
+		statuses = server.statuses("/b")
+		check("dropped connections are resumed", statuses == [200, 206, 206], statuses)
+		check("resumed download is complete", result.resumed and _read(result.path) == DATA, result)
+
+		server.publish("/c", DATA)
+		try:
+			dl.download(server.url("/c"), sha256=_sha256(CHANGED), cache_dir=cache)
+			check("hash mismatch is an error", False, "no error")
+		except dl.DownloadError:
+			data_path, _meta_path = dl.cache_paths(server.url("/c"), cache)
+			leftovers = [path for path in (data_path, data_path + ".part") if os.path.exists(path)]
+			check("hash mismatch leaves nothing behind", not leftovers, leftovers)
+
+		server.publish("/d", DATA)
+		progress, cancelled = _cancel_after_first_read()
+		try:
+			dl.download(server.url("/d"), cache_dir=cache, progress=progress, cancelled=cancelled)
+			check("cancelled download stops", False, "not cancelled")
+		except dl.DownloadCancelled:
+			result = dl.download(server.url("/d"), sha256=_sha256(DATA), cache_dir=cache)
+			check("cancelled download resumes later", result.resumed and result.fetched < len(DATA), result)
+			check("resumed after cancel is complete", _read(result.path) == DATA)
+
+		server.publish("/e", DATA)
+		progress, cancelled = _cancel_after_first_read()
+		try:
+			dl.download(server.url("/e"), cache_dir=cache, progress=progress, cancelled=cancelled)
+		except dl.DownloadCancelled:
+			pass
+		server.publish("/e", CHANGED)
+		result = dl.download(server.url("/e"), cache_dir=cache)
+		statuses = server.statuses("/e")
+		check("changed file is fetched from the start", statuses[-1] == 200 and not result.resumed, statuses)
+		check("changed file is the new content", _read(result.path) == CHANGED)
+
+		server.publish("/f", DATA)
+		server.fail("/f", 503, 429)
+		result = dl.download(server.url("/f"), cache_dir=cache)
+		statuses = server.statuses("/f")
+		check("server errors are retried", statuses == [503, 429, 200], statuses)
+		check("retried download is complete", _read(result.path) == DATA)
+
+		server.publish("/g", DATA)
+		server.fail("/g", 403)
+		try:
+			dl.download(server.url("/g"), cache_dir=cache)
+			check("client error is an error", False, "no error")
+		except urllib.error.HTTPError as e:
+			statuses = server.statuses("/g")
+			check("client error is not retried", e.code == 403 and statuses == [403], statuses)
+
+	print(f"{len(failures)} failures")
+	sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,221 @@
+"""Check that an utterance longer than the audio window plays to the end.
+
+The driver runs against a stand-in helper: ``host_eloquence32.py`` with the
+Eloquence DLL replaced by one that renders one buffer of silence per word.
+NVDA's modules are replaced with stubs whose player takes as long to play
+audio as real speech would.  With flow control holding the helper to the
+audio window, ``synthesize`` is answered only shortly before the utterance
+has finished playing.  The check speaks more than 30 seconds of audio, the
+old deadline of that command, and requires that:
+
+- ``synthesize`` is answered, with nothing logged as an error;
+- the input is reported rendered, so no text is left in flight;
+- every index arrives in order and all audio is played;
+- the watchdog never restarts the helper.
+
+Exits non-zero on any failure.
+
+Usage: python tools/check_flow_control.py [--seconds N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import ctypes
+import logging
+import os
+import shlex
+import sys
+import threading
+import time
+import types
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADDON_DIR = os.path.join(REPO_DIR, "addon")
+# One buffer of the helper's default size per word: 0.3 s at 11025 Hz.
+SAMPLES_PER_WORD = 3300
+SAMPLE_RATE = 11025
+FINAL_INDEX = 0xFFFF
+
+
+def run_fake_host(argv) -> None:
+	"""Serve the driver as the helper does, with a DLL that renders silence."""
+	if not hasattr(ctypes, "WINFUNCTYPE"):
+		ctypes.WINFUNCTYPE = ctypes.CFUNCTYPE
+	sys.path.insert(0, REPO_DIR)
+	import host_eloquence32 as host
+
+	class SilentDll:
+		def __init__(self, runtime):
+			self._runtime = runtime
+			self._input = []
+
+		def eciAddText(self, handle, text):
+			self._input.append(("text", text))
+			return 1
+
+		def eciInsertIndex(self, handle, index):
+			self._input.append(("index", index))
+			return 1
+
+		def eciClearInput(self, handle):
+			self._input = []
+			return 1
+
+		def eciSynchronize(self, handle):
+			pending, self._input = self._input, []
+			for kind, value in pending:
+				if kind == "index":
+					self._runtime._on_callback(None, host.MSG_INDEX_REPLY, value, None)
+					continue
+				for _word in value.split():
+					result = self._runtime._on_callback(
+						None, host.MSG_WAVEFORM_BUFFER, SAMPLES_PER_WORD, None
+					)
+					if result == 2:
+						return 1
+			return 1
+
+		def __getattr__(self, name):
+			return lambda *args: 1
+
+	class SilentRuntime(host.EloquenceRuntime):
+		def start(self) -> None:
+			self._dll = SilentDll(self)
+			self._handle = 1
+
+	host.EloquenceRuntime = SilentRuntime
+	# Keep the helper's log out of the add-on folder.
+	if "--log-dir" in argv:
+		position = argv.index("--log-dir")
+		del argv[position : position + 2]
+	sys.argv = [sys.argv[0], *argv]
+	host.main()
+
+
+class RealTimePlayer:
+	"""Stands in for nvwave.WavePlayer; feed() blocks for as long as the audio lasts."""
+
+	MIN_BUFFER_MS = 0
+	played = 0
+
+	def __init__(self, *args, **kwargs):
+		pass
+
+	def feed(self, data, size=None, onDone=None):
+		time.sleep(len(data) / (2.0 * SAMPLE_RATE))
+		RealTimePlayer.played += len(data)
+		if onDone:
+			onDone()
+
+	def idle(self):
+		pass
+
+	def stop(self):
+		pass
+
+	def pause(self, switch):
+		pass
+
+	def close(self):
+		pass
+
+	def sync(self):
+		pass
+
+
+def _install_nvda_stubs() -> None:
+	config = types.ModuleType("config")
+	config.conf = {
+		"speech": {"outputDevice": None, "eci": {}},
+		"audio": {"outputDevice": None},
+		"eloquence": {},
+	}
+	nvwave = types.ModuleType("nvwave")
+	nvwave.WavePlayer = RealTimePlayer
+	build_version = types.ModuleType("buildVersion")
+	build_version.version_year = 2024
+	global_vars = types.ModuleType("globalVars")
+	# Secure mode keeps the quarantine list off the disk.
+	global_vars.appArgs = types.SimpleNamespace(secure=True, configPath=None)
+	sys.modules.update(
+		{"config": config, "nvwave": nvwave, "buildVersion": build_version, "globalVars": global_vars}
+	)
+
+
+class _Errors(logging.Handler):
+	def __init__(self):
+		super().__init__(logging.ERROR)
+		self.messages = []
+
+	def emit(self, record):
+		self.messages.append(record.getMessage())
+
+
+def main() -> None:
+	if sys.argv[1:2] == ["--fake-host"]:
+		run_fake_host(sys.argv[2:])
+		return
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--seconds", type=float, default=40.0, help="length of the utterance in seconds")
+	args = parser.parse_args()
+	command = [sys.executable, os.path.abspath(__file__), "--fake-host"]
+	os.environ["ELOQUENCE_HOST_COMMAND"] = " ".join(shlex.quote(part) for part in command)
+	_install_nvda_stubs()
+	sys.path.insert(0, ADDON_DIR)
+	from synthDrivers import _eloquence as E
+
+	errors = _Errors()
+	E.LOGGER.addHandler(errors)
+	failures = []
+
+	def check(name, ok, detail=None):
+		print(f"{'ok  ' if ok else 'FAIL'} {name}" + ("" if ok else f": {detail}"))
+		if not ok:
+			failures.append(name)
+
+	words = int(args.seconds * SAMPLE_RATE / SAMPLES_PER_WORD) + 1
+	indexes = []
+	done = threading.Event()
+
+	def on_index(index):
+		# None reports that the utterance has finished playing.
+		if index is None:
+			done.set()
+		else:
+			indexes.append(index)
+
+	E.initialize(on_index)
+	try:
+		utterance = [
+			(E.index, (1,)),
+			(E.speak, (" ".join(["word"] * words),)),
+			(E.index, (2,)),
+			(E.index, (FINAL_INDEX,)),
+			(E.synth, ()),
+		]
+		started = time.perf_counter()
+		E.synth_queue.put((utterance, E._client._sequence), E.PRIORITY_NORMAL)
+		E.process()
+		E.synth_queue.join()
+		answered = time.perf_counter() - started
+		ended = done.wait(args.seconds + 30)
+		finished = time.perf_counter() - started
+		played = RealTimePlayer.played / (2.0 * SAMPLE_RATE)
+		print(f"synthesize answered after {answered:.1f} s; playback ended after {finished:.1f} s")
+		check("synthesize is answered", not errors.messages, errors.messages)
+		check("rendered input is not left in flight", not E._client.take_inflight())
+		check("indexes arrive in order", indexes == [1, 2], indexes)
+		check("the end of the utterance is reported", ended)
+		check("all audio is played", played >= words * SAMPLES_PER_WORD / SAMPLE_RATE, f"{played:.1f} s")
+		restarts = E.watchdog_metrics().get("restarts", 0)
+		check("the helper is not restarted", not restarts, restarts)
+	finally:
+		E.terminate()
+
+	print(f"{len(failures)} failures")
+	sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,45 @@
+"""Check the crash-prevention rule packs against their test vectors.
+
+Every rule in ``addon/synthDrivers/rulepacks`` must compile and turn each of
+its test inputs into the expected output.  Packs named in ``index.json``
+must exist.  Exits non-zero on any failure, so it can gate a build.
+
+Usage: python tools/check_rule_packs.py [PACK...]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+
+ADDON_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "addon")
+sys.path.insert(0, os.path.join(ADDON_DIR, "synthDrivers"))
+
+import _text_preprocessing as tp  # noqa: E402
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("packs", nargs="*", help="pack names (default: every pack in the directory)")
+	args = parser.parse_args()
+	names = args.packs or sorted(
+		name[:-5] for name in os.listdir(tp.RULE_PACK_DIR) if name.endswith(".json") and name != "index.json"
+	)
+	failures = []
+	for names_for_voice in tp._rule_pack_index().values():
+		failures.extend(
+			f"index.json: unknown pack {name}"
+			for name in names_for_voice
+			if not os.path.exists(os.path.join(tp.RULE_PACK_DIR, name + ".json"))
+		)
+	for name in names:
+		failures.extend(tp.verify_rule_pack(name))
+	for failure in dict.fromkeys(failures):
+		print(failure)
+	print(f"{len(names)} packs checked, {len(failures)} failures")
+	sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+	main()
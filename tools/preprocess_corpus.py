@@ -0,0 +1,135 @@
+"""Replay text corpora through the crash-prevention preprocessor and profile its rules.
+
+``run`` feeds every line (or paragraph) of the given files and directories
+to ``_text_preprocessing.preprocess`` for one voice, spread over worker
+processes, and prints how often each rule matched and what it cost.
+``report`` prints saved results, merging several files into one report.
+
+Usage:
+	python tools/preprocess_corpus.py run CORPUS... [--voice enu] [--jobs N] [--unit line|paragraph]
+		[--output stats.json] [--sort seconds|hits|order]
+	python tools/preprocess_corpus.py report stats.json... [--sort seconds|hits|order]
+
+NVDA itself records the same statistics when ``ELOQUENCE_PROFILE_RULES`` is
+set, and writes the report to its log when the synthesizer is unloaded.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+from typing import Iterator, List
+
+ADDON_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "addon")
+sys.path.insert(0, os.path.join(ADDON_DIR, "synthDrivers"))
+
+import _text_preprocessing as tp  # noqa: E402
+
+# Mirrors _eloquence.langs, which cannot be imported outside NVDA.
+VOICES = {
+	"enu": 65536,
+	"eng": 65537,
+	"esp": 131072,
+	"esm": 131073,
+	"fra": 196608,
+	"frc": 196609,
+	"deu": 262144,
+	"ita": 327680,
+	"chs": 393216,
+	"ptb": 458752,
+	"jpn": 524288,
+	"fin": 589824,
+	"kor": 655360,
+}
+
+
+def corpus_files(paths: List[str]) -> List[str]:
+	files = []
+	for path in paths:
+		if os.path.isdir(path):
+			for root, _dirs, names in os.walk(path):
+				files.extend(os.path.join(root, name) for name in sorted(names) if name.endswith(".txt"))
+		else:
+			files.append(path)
+	return files
+
+
+def units(path: str, unit: str) -> Iterator[str]:
+	"""Yield the pieces of *path* the way NVDA would hand them to the synth."""
+	with open(path, "r", encoding="utf-8", errors="replace") as f:
+		if unit == "line":
+			for line in f:
+				line = line.strip()
+				if line:
+					yield line
+			return
+		paragraph: List[str] = []
+		for line in f:
+			if line.strip():
+				paragraph.append(line.strip())
+			elif paragraph:
+				yield " ".join(paragraph)
+				paragraph = []
+		if paragraph:
+			yield " ".join(paragraph)
+
+
+def profile_file(task: tuple) -> dict:
+	"""Worker: preprocess one file and return its rule statistics."""
+	path, voice_id, unit = task
+	profile = tp.enable_profiling()
+	for text in units(path, unit):
+		tp.preprocess(text, voice_id)
+	tp.disable_profiling()
+	return profile.to_dict()
+
+
+def run(args: argparse.Namespace) -> None:
+	voice_id = VOICES[args.voice] if args.voice in VOICES else int(args.voice)
+	files = corpus_files(args.corpus)
+	if not files:
+		sys.exit("No corpus files found")
+	# Build the best-fit table once so the workers read it from disk.
+	tp.best_fit_table()
+	total = tp.RuleProfile()
+	tasks = [(path, voice_id, args.unit) for path in files]
+	with multiprocessing.Pool(args.jobs) as pool:
+		for stats in pool.imap_unordered(profile_file, tasks):
+			total.merge(stats)
+	stats = total.to_dict()
+	if args.output:
+		with open(args.output, "w", encoding="utf-8") as f:
+			json.dump(stats, f, indent=1)
+	print(tp.format_profile(stats, args.sort))
+
+
+def report(args: argparse.Namespace) -> None:
+	total = tp.RuleProfile()
+	for path in args.stats:
+		with open(path, "r", encoding="utf-8") as f:
+			total.merge(json.load(f))
+	print(tp.format_profile(total.to_dict(), args.sort))
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	commands = parser.add_subparsers(dest="command", required=True)
+	run_parser = commands.add_parser("run", help="profile preprocess() over a corpus")
+	run_parser.add_argument("corpus", nargs="+", help="text files, or directories of .txt files")
+	run_parser.add_argument("--voice", default="enu", help="voice code (enu, fra, ...) or numeric id")
+	run_parser.add_argument("--jobs", type=int, default=os.cpu_count())
+	run_parser.add_argument("--unit", choices=("line", "paragraph"), default="line")
+	run_parser.add_argument("--output", help="also save the statistics as JSON")
+	report_parser = commands.add_parser("report", help="print saved statistics")
+	report_parser.add_argument("stats", nargs="+")
+	for sub in (run_parser, report_parser):
+		sub.add_argument("--sort", choices=("seconds", "hits", "order"), default="seconds")
+	args = parser.parse_args()
+	run(args) if args.command == "run" else report(args)
+
+
+if __name__ == "__main__":
+	main()
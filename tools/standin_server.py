@@ -0,0 +1,147 @@
+"""Local HTTP server standing in for GitHub in the download checks.
+
+Serves files held in memory on a loopback port.  Each file has an ETag and
+a Last-Modified date, so conditional requests are answered with 304 and
+``Range`` requests (honouring ``If-Range``) with 206.  A file can be set to
+drop the connection after a number of bytes, to be sent slowly, or to be
+answered with error statuses first, to exercise resume, cancellation and
+retries.  Every request is logged.
+
+Imported by the ``check_*.py`` scripts next to it; not a check itself.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import http.server
+import threading
+import time
+from email.utils import formatdate
+from typing import Dict, List, NamedTuple, Optional
+
+
+class LoggedRequest(NamedTuple):
+	path: str
+	status: int
+	headers: Dict[str, str]
+
+
+class _File:
+	def __init__(self, data: bytes):
+		self.data = data
+		self.etag = '"%s"' % hashlib.sha256(data).hexdigest()[:16]
+		self.last_modified = formatdate(time.time(), usegmt=True)
+		# Cut the next len(drops) responses short after that many bytes each.
+		self.drops: List[int] = []
+		# Statuses to answer the next len(errors) requests with instead of the file.
+		self.errors: List[int] = []
+		self.delay = 0.0
+
+
+class StandInServer:
+	"""Threaded loopback HTTP server; use as a context manager."""
+
+	def __init__(self) -> None:
+		self.files: Dict[str, _File] = {}
+		self.requests: List[LoggedRequest] = []
+		handler = type("Handler", (_Handler,), {"standin": self})
+		self._server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+		self._thread: Optional[threading.Thread] = None
+
+	def publish(self, path: str, data: bytes) -> None:
+		"""Serve *data* at *path*, replacing what was there with a new ETag."""
+		self.files[path] = _File(data)
+
+	def drop_after(self, path: str, *sizes: int) -> None:
+		"""Cut the next responses for *path* off after each of *sizes* bytes."""
+		self.files[path].drops.extend(sizes)
+
+	def fail(self, path: str, *statuses: int) -> None:
+		"""Answer the next requests for *path* with each of *statuses*."""
+		self.files[path].errors.extend(statuses)
+
+	def slow(self, path: str, delay: float) -> None:
+		"""Wait *delay* seconds before each 16 KB of *path*."""
+		self.files[path].delay = delay
+
+	def url(self, path: str) -> str:
+		host, port = self._server.server_address[:2]
+		return f"http://{host}:{port}{path}"
+
+	def statuses(self, path: str) -> List[int]:
+		return [request.status for request in self.requests if request.path == path]
+
+	def __enter__(self) -> "StandInServer":
+		self._thread = threading.Thread(target=self._server.serve_forever, name="StandInServer", daemon=True)
+		self._thread.start()
+		return self
+
+	def __exit__(self, *exc_info) -> None:
+		self._server.shutdown()
+		self._server.server_close()
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+	standin: StandInServer
+	protocol_version = "HTTP/1.1"
+
+	def log_message(self, format, *args) -> None:
+		pass
+
+	def do_GET(self) -> None:
+		entry = self.standin.files.get(self.path)
+		if entry is None:
+			self._reply(404)
+			return
+		if entry.errors:
+			self._reply(entry.errors.pop(0))
+			return
+		if self.headers.get("If-None-Match") == entry.etag:
+			self._reply(304, entry)
+			return
+		start = self._range_start(entry)
+		if start is not None and start >= len(entry.data):
+			self._reply(416, entry)
+			return
+		body = entry.data[start or 0 :]
+		extra = {}
+		if start is not None:
+			extra["Content-Range"] = f"bytes {start}-{len(entry.data) - 1}/{len(entry.data)}"
+		self._reply(200 if start is None else 206, entry, len(body), extra)
+		limit = entry.drops.pop(0) if entry.drops else None
+		self._send_body(body if limit is None else body[:limit], entry.delay)
+		if limit is not None:
+			# The client was promised more; closing now looks like a dropped connection.
+			self.close_connection = True
+
+	def _range_start(self, entry: _File) -> Optional[int]:
+		value = self.headers.get("Range", "")
+		if not value.startswith("bytes=") or not value.endswith("-"):
+			return None
+		if_range = self.headers.get("If-Range")
+		if if_range and if_range not in (entry.etag, entry.last_modified):
+			return None
+		return int(value[len("bytes=") : -1])
+
+	def _reply(self, status: int, entry: Optional[_File] = None, length: int = 0, extra=None) -> None:
+		logged = {name: value for name, value in self.headers.items() if name.lower() != "host"}
+		self.standin.requests.append(LoggedRequest(self.path, status, logged))
+		self.send_response(status)
+		if entry is not None:
+			self.send_header("ETag", entry.etag)
+			self.send_header("Last-Modified", entry.last_modified)
+			self.send_header("Accept-Ranges", "bytes")
+		for name, value in (extra or {}).items():
+			self.send_header(name, value)
+		if status != 304:
+			self.send_header("Content-Length", str(length))
+		self.end_headers()
+
+	def _send_body(self, body: bytes, delay: float) -> None:
+		for start in range(0, len(body), 16384):
+			if delay:
+				time.sleep(delay)
+			try:
+				self.wfile.write(body[start : start + 16384])
+			except OSError:
+				return